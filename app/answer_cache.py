@@ -0,0 +1,326 @@
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional
+
+import numpy as np
+
+from app.metrics import CACHE_LOOKUPS
+
+# Written by load_to_pinecone.py after every successful upsert; a change in
+# this file means the index was reloaded and cached answers may be stale.
+INDEX_VERSION_FILE = os.getenv("INDEX_VERSION_FILE", os.path.join("data", "index_version"))
+
+# Words that usually point back at an earlier turn ("what about its fees?")
+_FOLLOWUP_WORDS = {
+    'it', 'its', 'this', 'that', 'these', 'those', 'they', 'them', 'their', 'he', 'she', 'his', 'her',
+    'there', 'same', 'above', 'previous', 'earlier', 'more', 'also', 'else', 'again', 'another', 'other',
+    'te', 'ti', 'tya', 'tyacha', 'tyache', 'tyachi', 'hyacha', 'hyache', 'hyachi', 'ata', 'ajun',
+    'ते', 'ती', 'त्या', 'त्याचा', 'त्याचे', 'त्याची', 'हे', 'ही', 'याचा', 'याचे', 'याची', 'आणखी', 'अजून',
+}
+_WORD_RE = re.compile(r'\w+')
+
+
+def is_context_dependent(query: str, history: List[dict]) -> bool:
+    """Follow-ups that lean on earlier turns must not be answered from the cache."""
+    if not history:
+        return False
+    words = _WORD_RE.findall(query.lower())
+    if len(words) <= 3:
+        return True
+    return any(word in _FOLLOWUP_WORDS for word in words)
+
+
+class CachedAnswer:
+    __slots__ = ("language", "vector", "answer", "sources", "created_at")
+
+    def __init__(self, language: str, vector: np.ndarray, answer: str, sources: List[str]):
+        self.language = language
+        self.vector = vector
+        self.answer = answer
+        self.sources = sources
+        self.created_at = time.monotonic()
+
+
+class SemanticAnswerCache:
+    """
+    Answer cache keyed by query embedding. A lookup returns the stored answer
+    of the most similar earlier query in the same language if its cosine
+    similarity clears the threshold. Entries expire after ttl_seconds and the
+    least recently used ones are evicted beyond max_entries.
+    """
+
+    def __init__(self, threshold: float = 0.95, ttl_seconds: float = 3600, max_entries: int = 1000,
+                 enabled: bool = True, version_file: str = INDEX_VERSION_FILE, version_check_interval: float = 5.0):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self.version_file = version_file
+        self.version_check_interval = version_check_interval
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> CachedAnswer, in LRU order
+        self._next_key = 0
+        # Per-language search matrices, rebuilt lazily after inserts/evictions
+        self._index = {}
+        self._dirty = set()
+
+        self._index_version = self._read_index_version()
+        self._version_checked_at = time.monotonic()
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            threshold=float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95")),
+            ttl_seconds=float(os.getenv("ANSWER_CACHE_TTL", "3600")),
+            max_entries=int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000")),
+            enabled=os.getenv("ANSWER_CACHE_ENABLED", "1") not in {"0", "false", "False"},
+        )
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        vec = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def _read_index_version(self) -> Optional[int]:
+        try:
+            return os.stat(self.version_file).st_mtime_ns
+        except OSError:
+            return None
+
+    def _check_index_version(self) -> None:
+        now = time.monotonic()
+        if now - self._version_checked_at < self.version_check_interval:
+            return
+        self._version_checked_at = now
+        version = self._read_index_version()
+        if version != self._index_version:
+            self._index_version = version
+            self._clear()
+
+    def _clear(self) -> None:
+        self._entries.clear()
+        self._index.clear()
+        self._dirty.clear()
+        self.invalidations += 1
+
+    def _remove(self, key: int) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._dirty.add(entry.language)
+
+    def _language_index(self, language: str):
+        if language in self._dirty or language not in self._index:
+            keys = [k for k, e in self._entries.items() if e.language == language]
+            matrix = np.stack([self._entries[k].vector for k in keys]) if keys else None
+            self._index[language] = (keys, matrix)
+            self._dirty.discard(language)
+        return self._index[language]
+
+    def lookup(self, vector, language: str) -> Optional[CachedAnswer]:
+        if not self.enabled:
+            return None
+        query = self._normalize(vector)
+        with self._lock:
+            self._check_index_version()
+            keys, matrix = self._language_index(language)
+            if matrix is not None:
+                scores = matrix @ query
+                best = int(np.argmax(scores))
+                key = keys[best]
+                entry = self._entries.get(key)
+                if entry is not None and scores[best] >= self.threshold:
+                    if time.monotonic() - entry.created_at <= self.ttl_seconds:
+                        self._entries.move_to_end(key)
+                        self.hits += 1
+                        CACHE_LOOKUPS.inc("answer", "hit")
+                        return entry
+                    self._remove(key)
+            self.misses += 1
+            CACHE_LOOKUPS.inc("answer", "miss")
+            return None
+
+    def store(self, vector, language: str, answer: str, sources: List[str]) -> None:
+        if not self.enabled:
+            return
+        entry = CachedAnswer(language, self._normalize(vector), answer, list(sources))
+        with self._lock:
+            self._check_index_version()
+            self._entries[self._next_key] = entry
+            self._next_key += 1
+            self._dirty.add(language)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "invalidations": self.invalidations,
+            }
+
+
+class SQLiteAnswerCache(SemanticAnswerCache):
+    """
+    Answer cache shared by the workers on one host. Answers are written to a
+    SQLite table; each worker keeps the in-memory search index of the base
+    class and pulls rows added by the other workers (at most every
+    sync_interval seconds) before a lookup. Rows carry the index version
+    they were answered against, so answers from before a reindex never come back.
+    """
+
+    def __init__(self, url: str = None, sync_interval: float = 0.5, prune_every: int = 200, **kwargs):
+        from sqlalchemy import (Column, Float, Integer, LargeBinary, MetaData, String, Table, Text, create_engine,
+                                event)
+
+        super().__init__(**kwargs)
+        self.url = url or os.getenv("ANSWER_CACHE_DB_URL", "sqlite:///data/answer_cache.db")
+        self.sync_interval = sync_interval
+        self.prune_every = prune_every
+        self._synced_id = 0
+        self._synced_at = 0.0
+        self._sync_lock = threading.Lock()
+        self._writes = 0
+
+        if self.url.startswith("sqlite:///"):
+            directory = os.path.dirname(self.url[len("sqlite:///"):])
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        self.engine = create_engine(self.url, connect_args={"timeout": 30})
+
+        @event.listens_for(self.engine, "connect")
+        def _sqlite_pragmas(dbapi_connection, _):
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+            cursor.close()
+
+        metadata = MetaData()
+        self.rows = Table(
+            "answer_cache", metadata,
+            Column("id", Integer, primary_key=True, autoincrement=True),
+            Column("language", String(16), nullable=False),
+            Column("vector", LargeBinary, nullable=False),
+            Column("answer", Text, nullable=False),
+            Column("sources", Text, nullable=False),
+            Column("index_version", String(32), nullable=False),
+            Column("created_at", Float, nullable=False),
+        )
+        metadata.create_all(self.engine)
+
+    def _version_key(self) -> str:
+        return str(self._index_version or "")
+
+    def _sync(self) -> None:
+        """Load rows written since the last sync (by any worker) into the local index."""
+        from sqlalchemy import select
+
+        now = time.monotonic()
+        if now - self._synced_at < self.sync_interval or not self._sync_lock.acquire(blocking=False):
+            return
+        try:
+            self._synced_at = now
+            r = self.rows
+            with self.engine.connect() as conn:
+                rows = conn.execute(
+                    select(r).where(r.c.id > self._synced_id, r.c.index_version == self._version_key(),
+                                    r.c.created_at >= time.time() - self.ttl_seconds).order_by(r.c.id)
+                ).all()
+            if not rows:
+                return
+            wall_offset = time.time() - time.monotonic()
+            with self._lock:
+                for row in rows:
+                    entry = CachedAnswer(row.language, np.frombuffer(row.vector, dtype=np.float32), row.answer,
+                                         json.loads(row.sources))
+                    entry.created_at = row.created_at - wall_offset
+                    self._entries[self._next_key] = entry
+                    self._next_key += 1
+                    self._dirty.add(row.language)
+                while len(self._entries) > self.max_entries:
+                    self._remove(next(iter(self._entries)))
+            self._synced_id = rows[-1].id
+        except Exception as e:
+            print(f"⚠️ Answer cache sync failed: {e}")
+        finally:
+            self._sync_lock.release()
+
+    def lookup(self, vector, language: str) -> Optional[CachedAnswer]:
+        if self.enabled:
+            self._sync()
+        return super().lookup(vector, language)
+
+    def store(self, vector, language: str, answer: str, sources: List[str]) -> None:
+        # Written to the table only; every worker (this one included) picks it up on its next sync
+        if not self.enabled:
+            return
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(self.rows.insert().values(
+                    language=language, vector=self._normalize(vector).tobytes(), answer=answer,
+                    sources=json.dumps(list(sources)), index_version=self._version_key(), created_at=time.time()))
+        except Exception as e:
+            print(f"⚠️ Failed to store cached answer: {e}")
+            return
+        self._synced_at = 0.0
+        self._writes += 1
+        if self._writes % self.prune_every == 0:
+            self.prune()
+
+    def prune(self) -> None:
+        """Delete expired rows and rows answered against another index version."""
+        from sqlalchemy import delete, or_
+
+        r = self.rows
+        with self.engine.begin() as conn:
+            conn.execute(delete(r).where(or_(r.c.created_at < time.time() - self.ttl_seconds,
+                                             r.c.index_version != self._version_key())))
+
+    def invalidate(self) -> None:
+        from sqlalchemy import delete
+
+        super().invalidate()
+        with self.engine.begin() as conn:
+            conn.execute(delete(self.rows))
+
+
+def get_answer_cache(backend: str = None) -> SemanticAnswerCache:
+    """ANSWER_CACHE_BACKEND=memory (per process, default) or sqlite (shared by the workers on one host)."""
+    backend = (backend or os.getenv("ANSWER_CACHE_BACKEND", "memory")).lower()
+    if backend == "sqlite":
+        return SQLiteAnswerCache.from_env()
+    if backend == "memory":
+        return SemanticAnswerCache.from_env()
+    raise ValueError(f"Unknown answer cache backend: {backend}")
+
+
+def mark_index_reloaded(version_file: str = INDEX_VERSION_FILE) -> None:
+    """Signal running servers that the vector index changed (see SemanticAnswerCache)."""
+    directory = os.path.dirname(version_file)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(version_file, "w") as f:
+        f.write(f"{time.time()}\n")
+
+
+# Global instance
+answer_cache = get_answer_cache()
@@ -0,0 +1,165 @@
+import math
+import os
+import re
+import threading
+from functools import lru_cache
+from typing import Dict, List
+
+# Chunks are measured in the embedding model's own word pieces, not GPT tokens:
+# all-MiniLM-L6-v2 truncates its input at 256 of them (including [CLS]/[SEP]),
+# and Devanagari text costs several times more WordPiece than o200k tokens.
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "200"))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "40"))
+# Part of the ingestion fingerprint: chunks sized in another unit are re-chunked
+CHUNK_UNIT = "wordpiece"
+
+_SENTENCE_END = (".", "!", "?", "।", ":", ";")
+
+_PIECE = re.compile(r'[A-Za-z0-9]+|[^A-Za-z0-9\s]')
+
+_tokenizer = None
+_tokenizer_loaded = False
+_tokenizer_lock = threading.Lock()
+
+
+def _model_tokenizer():
+    """The embedding model's tokenizer (loads the model, which ingestion needs next anyway), or None."""
+    global _tokenizer, _tokenizer_loaded
+    if not _tokenizer_loaded:
+        with _tokenizer_lock:
+            if not _tokenizer_loaded:
+                from app.embeddings import embedding_service
+
+                try:
+                    _tokenizer = embedding_service.tokenizer
+                except Exception as e:
+                    print(f"⚠️ Embedding tokenizer unavailable ({e}); approximating word pieces")
+                    _tokenizer = None
+                _tokenizer_loaded = True
+    return _tokenizer
+
+
+def _approx_word_pieces(word: str) -> int:
+    # Without the tokenizer: err on the high side (one piece per non-ASCII character)
+    return max(1, sum(math.ceil(len(piece) / 3) for piece in _PIECE.findall(word)))
+
+
+@lru_cache(maxsize=65536)
+def word_pieces(word: str) -> int:
+    """
+    Word pieces of one whitespace-separated word. BERT-style tokenizers split
+    on whitespace first, so these add up to the count of the joined text.
+    """
+    tokenizer = _model_tokenizer()
+    if tokenizer is None:
+        return _approx_word_pieces(word)
+    return max(1, len(tokenizer.tokenize(word)))
+
+
+def chunk_id(page_id: str, index: int) -> str:
+    return f"{page_id}-{index}"
+
+
+def chunk_text(text: str, max_tokens: int = CHUNK_TOKENS, overlap: int = CHUNK_OVERLAP) -> List[str]:
+    """
+    Split text into chunks of at most max_tokens word pieces, each starting
+    `overlap` pieces before the previous one ended. Cuts prefer a sentence
+    end in the second half of the chunk over a mid-sentence word boundary.
+    """
+    words = text.split()
+    if not words:
+        return []
+    costs = [word_pieces(word) for word in words]
+
+    chunks = []
+    start = 0
+    while start < len(words):
+        end, total = start, 0
+        while end < len(words) and total + costs[end] <= max_tokens:
+            total += costs[end]
+            end += 1
+        end = max(end, start + 1)
+
+        if end < len(words):
+            for i in range(end, start + (end - start) // 2, -1):
+                if words[i - 1].endswith(_SENTENCE_END):
+                    end = i
+                    break
+
+        chunks.append(" ".join(words[start:end]))
+        if end >= len(words):
+            break
+
+        next_start, carried = end, 0
+        while next_start - 1 > start and carried + costs[next_start - 1] <= overlap:
+            next_start -= 1
+            carried += costs[next_start]
+        start = next_start
+    return chunks
+
+
+def chunk_document(doc: dict, max_tokens: int = CHUNK_TOKENS, overlap: int = CHUNK_OVERLAP) -> List[dict]:
+    """
+    One index document per chunk. Ids are "<page md5>-<n>"; every chunk
+    carries the parent page's metadata plus parent_id / chunk / chunks.
+    """
+    pieces = chunk_text(doc["text"], max_tokens, overlap)
+    chunks = []
+    for index, piece in enumerate(pieces):
+        metadata = dict(doc["metadata"])
+        metadata.update({"parent_id": doc["id"], "chunk": index, "chunks": len(pieces)})
+        chunks.append({"id": chunk_id(doc["id"], index), "text": piece, "metadata": metadata})
+    return chunks
+
+
+def _join_overlapping(first: str, second: str) -> str:
+    """Concatenate two consecutive chunks, dropping the words they share."""
+    a, b = first.split(), second.split()
+    for size in range(min(len(a), len(b), 256), 0, -1):
+        if a[-size:] == b[:size]:
+            return " ".join(a + b[size:])
+    return " ".join(a + b)
+
+
+def merge_adjacent_chunks(matches: List[Dict]) -> List[Dict]:
+    """
+    Group retrieved chunks by page: chunks of one page collapse into a single
+    match (at the rank of its best chunk) whose text joins runs of adjacent
+    chunks without repeating the overlap. Unchunked matches pass through.
+    """
+    pages = {}
+    order = []
+    for match in matches:
+        metadata = match.get("metadata") or {}
+        parent_id = metadata.get("parent_id")
+        if parent_id is None:
+            order.append(match)
+            continue
+        group = pages.get(parent_id)
+        if group is None:
+            group = pages[parent_id] = []
+            order.append(parent_id)
+        group.append(match)
+
+    merged = []
+    for item in order:
+        if isinstance(item, dict):
+            merged.append(item)
+            continue
+        group = sorted(pages[item], key=lambda m: m["metadata"].get("chunk", 0))
+        runs, previous = [], None
+        for match in group:
+            index = match["metadata"].get("chunk", 0)
+            text = match["metadata"].get("text", "")
+            if previous is not None and index == previous + 1:
+                runs[-1] = _join_overlapping(runs[-1], text)
+            else:
+                runs.append(text)
+            previous = index
+
+        best = pages[item][0]
+        metadata = dict(best["metadata"])
+        metadata["text"] = "\n…\n".join(runs)
+        metadata["chunk_ids"] = [m["id"] for m in group]
+        merged.append({**best, "id": item, "metadata": metadata})
+    return merged
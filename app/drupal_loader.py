@@ -1,8 +1,23 @@
-import requests
 import hashlib
+import html
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from html.entities import html5
+from html.parser import HTMLParser
 
 from bs4 import BeautifulSoup
 
+from app.fetcher import ConcurrentFetcher
+
+# Resolved links stored per document; the prompt shows at most 5 in total
+LINKS_PER_DOC = int(os.getenv("LINKS_PER_DOC", "8"))
+
+# HTML-to-text runs across this many processes at ingestion (1 = in-process);
+# smaller crawls are not worth the pool start-up and pickling
+EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", str(min(8, os.cpu_count() or 1))))
+EXTRACT_POOL_MIN_PAGES = int(os.getenv("EXTRACT_POOL_MIN_PAGES", "64"))
+
 def get_public_url(api_url: str) -> str:
     """
     Convert a PMC Drupal API URL to the corresponding public-facing URL using clean mappings.
@@ -23,14 +38,119 @@ def get_public_url(api_url: str) -> str:
     return api_url  # fallback: if it's not an API page, return as-is
 
 
+class _Unsupported(Exception):
+    pass
+
+
+# Entity names without their ";", as bs4's html.parser builder looks them up
+_ENTITIES = {name.rstrip(";"): character for name, character in html5.items()}
+_DECIMAL_CHARREF = re.compile("^([0-9]+)(.*)")
+_HEX_CHARREF = re.compile("^([0-9a-f]+)(.*)")
+
+
+def _numeric_charref(name):
+    """bs4's handling of "&#name;": (decoded character, trailing text that wasn't part of the reference)."""
+    base, pattern = (16, _HEX_CHARREF) if name[:1] in ("x", "X") else (10, _DECIMAL_CHARREF)
+    digits = name[1:] if base == 16 else name
+    extra = ""
+    try:
+        number = int(digits, base)
+    except ValueError:
+        match = pattern.search(digits)
+        if match is None:
+            return "", digits
+        number, extra = int(match.group(1), base), match.group(2)
+    # html.unescape applies the same HTML5 rules (windows-1252 remapping, U+FFFD for
+    # surrogates and out-of-range numbers) but drops control characters and
+    # noncharacters, which bs4 keeps
+    return html.unescape(f"&#{number};") or chr(number), extra
+
+
+class _TextCollector(HTMLParser):
+    """
+    Streaming equivalent of BeautifulSoup(html, "html.parser").get_text(" ", strip=True):
+    the same stdlib tokenizer (bs4's html.parser builder drives HTMLParser),
+    without building a tree. Text runs between tags are joined, stripped and
+    kept in order. Character references are decoded with bs4's rules: exact
+    entity names only ("&copy2024" and "&section=" in query strings stay as
+    they are) and HTML5 numeric references. Anything whose bs4 handling is
+    more involved (comments, declarations, CDATA, processing instructions and
+    the text of script/style/template/ruby tags) raises _Unsupported and the
+    block goes through BeautifulSoup instead.
+    """
+
+    _SKIPPED_TEXT_TAGS = frozenset({"script", "style", "template", "rt", "rp"})
+
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.strings = []
+        self._data = []
+
+    def _flush(self):
+        if self._data:
+            text = "".join(self._data).strip()
+            if text:
+                self.strings.append(text)
+            self._data = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self._SKIPPED_TEXT_TAGS:
+            raise _Unsupported(tag)
+        self._flush()
+
+    def handle_endtag(self, tag):
+        self._flush()
+
+    def handle_data(self, data):
+        self._data.append(data)
+
+    def handle_entityref(self, name):
+        character = _ENTITIES.get(name)
+        self._data.append(character if character is not None else "&%s" % name)
+
+    def handle_charref(self, name):
+        self._data.extend(_numeric_charref(name))
+
+    def handle_comment(self, data):
+        raise _Unsupported("comment")
+
+    def handle_decl(self, decl):
+        raise _Unsupported("decl")
+
+    def unknown_decl(self, data):
+        raise _Unsupported("decl")
+
+    def handle_pi(self, data):
+        raise _Unsupported("pi")
+
+    def close(self):
+        super().close()
+        self._flush()
+
+
+def clean_html(html_content):
+    """Visible text of an HTML block, as BeautifulSoup's get_text(separator=" ", strip=True) returns it."""
+    if isinstance(html_content, str):
+        collector = _TextCollector()
+        try:
+            collector.feed(html_content)
+            collector.close()
+            return " ".join(collector.strings)
+        except _Unsupported:
+            pass
+    return BeautifulSoup(html_content, "html.parser").get_text(separator=" ", strip=True)
+
+
 def extract_text_and_links(data):
     texts = []
-    links = set()
-
-    def clean_html(html_content):
-        return BeautifulSoup(html_content, "html.parser").get_text(separator=" ", strip=True)
+    # Ordered set: document order ranks the links and keeps content hashes stable across runs
+    links = {}
 
-    def recurse(obj):
+    # Depth-first over an explicit stack (children pushed in reverse), same
+    # visiting order as the old recursive walk without its per-node call overhead
+    stack = [data]
+    while stack:
+        obj = stack.pop()
         if isinstance(obj, dict):
             for key in ['title', 'detail_summary', 'sub_summary']:
                 if key in obj and obj[key]:
@@ -48,58 +168,125 @@ def extract_text_and_links(data):
             for link_key in ['internal_link', 'external_link', 'file_url', 'paragraph_file_url', 'node_file_url']:
                 url = obj.get(link_key)
                 if url:
-                    links.add(url)
+                    links.setdefault(url)
 
             if 'pdf_files' in obj:
                 for pdf in obj['pdf_files']:
                     if 'file_url' in pdf:
-                        links.add(pdf['file_url'])
+                        links.setdefault(pdf['file_url'])
                     if 'pdf_title' in pdf:
                         texts.append(pdf['pdf_title'])
 
-            for v in obj.values():
-                recurse(v)
+            stack.extend(reversed(list(obj.values())))
 
         elif isinstance(obj, list):
-            for item in obj:
-                recurse(item)
+            stack.extend(reversed(obj))
 
-    recurse(data)
     return " ".join(texts), list(links)
 
 
+def _extract_page(item):
+    """Pool task: (url, data) -> (url, (text, links) or None, error message or None)."""
+    url, data = item
+    try:
+        return url, extract_text_and_links(data), None
+    except Exception as e:
+        return url, None, str(e)
+
+
+def extract_pages(pages, workers: int = None):
+    """
+    extract_text_and_links for every fetched page, across a process pool
+    when there are enough pages to pay for it. Returns ({url: (text, links)},
+    {url: error}), in the order of `pages`.
+    """
+    workers = EXTRACT_WORKERS if workers is None else workers
+    items = list(pages.items())
+    if workers > 1 and len(items) >= EXTRACT_POOL_MIN_PAGES:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_extract_page, items, chunksize=max(1, len(items) // (workers * 4))))
+    else:
+        results = [_extract_page(item) for item in items]
+
+    extracted, failures = {}, {}
+    for url, result, error in results:
+        if error is None:
+            extracted[url] = result
+        else:
+            failures[url] = error
+    return extracted, failures
+
+
+def fetch_json(url):
+    pages, failures = ConcurrentFetcher().fetch_all_sync([url])
+    if url in failures:
+        raise RuntimeError(failures[url])
+    return pages[url]
+
+
+def build_drupal_doc(url, data, extracted=None):
+    """
+    Turn one fetched Drupal JSON response into a page document (or None if it
+    has no text). The full text is kept; app.chunking splits it for indexing.
+    Links are resolved to frontend URLs, deduplicated and ranked here once,
+    so the request path only merges the per-page lists. `extracted` is the
+    page's (text, links) when extract_pages already produced it.
+    """
+    from app.url_mapper import url_mapper
+
+    text, found_links = extracted if extracted is not None else extract_text_and_links(data)
+    if not text:
+        return None
+    return {
+        "id": hashlib.md5(url.encode()).hexdigest(),
+        "text": text,
+        "metadata": {
+            "source": get_public_url(url),
+            "links": url_mapper.resolve_links(found_links, LINKS_PER_DOC)
+        }
+    }
+
+
 def fetch_json_and_extract_text(url):
     try:
-        res = requests.get(url, timeout=10, verify=False)
-        res.raise_for_status()
-        data = res.json()
+        data = fetch_json(url)
         text, found_links = extract_text_and_links(data)
-        return text[:2000], url, found_links
+        return text, url, found_links
     except Exception as e:
         print(f"❌ Failed to fetch or parse JSON from {url}: {e}")
         return None, None, []
 
-def load_all_links():
-    with open("data/urls.txt") as f:
-        urls = [line.strip() for line in f.readlines()]
+def load_urls(path="data/urls.txt"):
+    with open(path) as f:
+        return [line.strip() for line in f.readlines() if line.strip()]
+
+def load_all_links(fetcher=None):
+    urls = load_urls()
+
+    # Pooled, concurrent fetch (served from the on-disk cache when unchanged)
+    pages, failures = (fetcher or ConcurrentFetcher()).fetch_all_sync(urls)
+    for url, error in failures.items():
+        print(f"❌ Failed to fetch or parse JSON from {url}: {error}")
 
     docs = []
     total_links_found = 0
 
-    for url in urls:
-        content, link, found_links = fetch_json_and_extract_text(url)
-        if content:
-            uid = hashlib.md5(link.encode()).hexdigest()
-            total_links_found += len(found_links)
-            docs.append({
-                "id": uid,
-                "text": content,
-                "metadata": {
-                    "source": get_public_url(link),
-                    "related_links": found_links
-                }
-            })
+    extracted, extract_failures = extract_pages(pages)
+    for url, error in extract_failures.items():
+        print(f"❌ Failed to fetch or parse JSON from {url}: {error}")
+
+    for url, data in pages.items():
+        if url not in extracted:
+            continue
+        try:
+            doc = build_drupal_doc(url, data, extracted[url])
+        except Exception as e:
+            print(f"❌ Failed to fetch or parse JSON from {url}: {e}")
+            continue
+        if doc:
+            total_links_found += len(doc["metadata"]["links"])
+            docs.append(doc)
 
     print(f"✅ Loaded {len(docs)} JSON documents from {len(urls)} URLs.")
-    print(f"🔗 Extracted a total of {total_links_found} related links from all docs.")
+    print(f"🔗 Kept a total of {total_links_found} resolved links across all docs.")
     return docs
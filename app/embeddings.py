@@ -1,6 +1,254 @@
-from sentence_transformers import SentenceTransformer
+import asyncio
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import List, Optional
 
-model = SentenceTransformer("all-MiniLM-L6-v2")
+from app.metrics import CACHE_LOOKUPS
+
+# Hub files for EMBED_BACKEND=onnx-int8 (all-MiniLM-L6-v2 ships several
+# quantized exports; avx2 runs on any x86-64 server CPU of the last decade)
+DEFAULT_INT8_FILE = "onnx/model_quint8_avx2.onnx"
+
+
+def normalize_query(text: str) -> str:
+    """Cache key for a query. all-MiniLM-L6-v2 is uncased, so case and spacing don't change the embedding."""
+    return " ".join(text.split()).lower()
+
+
+class EmbeddingService:
+    """
+    Query/document embeddings with:
+    - an LRU cache of query embeddings keyed on normalize_query(text)
+    - micro-batching: concurrent embed() calls are queued and a worker
+      encodes everything waiting in one call (optionally lingering up to
+      `batch_wait` seconds for more; 0 by default so a lone query never waits)
+    - a choice of backend: torch (default), onnx, or onnx-int8 (quantized)
+    - lazy model loading; warm_up() loads it in the background so workers
+      answer health checks before the model is ready
+    """
+
+    def __init__(self, model_name: str = None, backend: str = None, cache_size: int = None,
+                 max_batch: int = None, batch_wait: float = None, workers: int = None):
+        self.model_name = model_name or os.getenv("EMBED_MODEL", "all-MiniLM-L6-v2")
+        self.backend = (backend or os.getenv("EMBED_BACKEND", "torch")).lower()
+        self.cache_size = cache_size if cache_size is not None else int(os.getenv("EMBED_CACHE_SIZE", "4096"))
+        self.max_batch = max_batch or int(os.getenv("EMBED_MAX_BATCH", "32"))
+        self.batch_wait = batch_wait if batch_wait is not None else float(
+            os.getenv("EMBED_BATCH_WAIT_MS", "0")) / 1000
+        self.workers = workers or int(os.getenv("EMBED_WORKERS", "2"))
+
+        self._model = None
+        self._model_lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._threads = []
+        self._threads_lock = threading.Lock()
+
+        self.load_seconds = None
+        self.hits = 0
+        self.misses = 0
+        self.batches = 0
+        self.batched_texts = 0
+
+    # -- model -----------------------------------------------------------------
+
+    def _load_model(self):
+        from sentence_transformers import SentenceTransformer
+
+        if self.backend == "torch":
+            return SentenceTransformer(self.model_name)
+        if self.backend == "onnx":
+            return SentenceTransformer(self.model_name, backend="onnx")
+        if self.backend == "onnx-int8":
+            file_name = os.getenv("EMBED_ONNX_FILE", DEFAULT_INT8_FILE)
+            return SentenceTransformer(self.model_name, backend="onnx", model_kwargs={"file_name": file_name})
+        raise ValueError(f"Unknown embedding backend: {self.backend}")
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    start = time.perf_counter()
+                    self._model = self._load_model()
+                    self.load_seconds = time.perf_counter() - start
+                    print(f"🧠 Loaded embedding model {self.model_name} ({self.backend}) in {self.load_seconds:.1f}s")
+        return self._model
+
+    @property
+    def ready(self) -> bool:
+        return self._model is not None
+
+    @property
+    def tokenizer(self):
+        """The model's own (Hugging Face) tokenizer, or None when the model doesn't expose one."""
+        return getattr(self.model, "tokenizer", None)
+
+    def warm_up(self, background: bool = True) -> Optional[threading.Thread]:
+        """Load the model and run one encode, in a daemon thread unless background=False."""
+        def run():
+            try:
+                self.model.encode(["warm up"])
+            except Exception as e:
+                print(f"⚠️ Embedding warm-up failed: {e}")
+
+        if not background:
+            run()
+            return None
+        thread = threading.Thread(target=run, name="embed-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    # -- cache -----------------------------------------------------------------
+
+    def _cache_get(self, key: str) -> Optional[tuple]:
+        with self._cache_lock:
+            vector = self._cache.get(key)
+            if vector is None:
+                self.misses += 1
+                CACHE_LOOKUPS.inc("embedding", "miss")
+                return None
+            self._cache.move_to_end(key)
+            self.hits += 1
+            CACHE_LOOKUPS.inc("embedding", "hit")
+            return vector
+
+    def _cache_put(self, key: str, vector: tuple) -> None:
+        if self.cache_size <= 0:
+            return
+        with self._cache_lock:
+            self._cache[key] = vector
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    # -- micro-batching --------------------------------------------------------
+
+    def _ensure_workers(self) -> None:
+        if self._threads:
+            return
+        with self._threads_lock:
+            if not self._threads:
+                for i in range(self.workers):
+                    thread = threading.Thread(target=self._worker, name=f"embed-{i}", daemon=True)
+                    thread.start()
+                    self._threads.append(thread)
+
+    def _worker(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.batch_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._encode_batch(batch)
+
+    def _encode_batch(self, batch) -> None:
+        # Identical queries in one batch are encoded once
+        pending = {}
+        for key, future in batch:
+            pending.setdefault(key, []).append(future)
+        keys = list(pending)
+        try:
+            vectors = self.model.encode(keys, batch_size=self.max_batch)
+        except Exception as e:
+            for futures in pending.values():
+                for future in futures:
+                    future.set_exception(e)
+            return
+        self.batches += 1
+        self.batched_texts += len(keys)
+        for key, vector in zip(keys, vectors):
+            vector = tuple(vector.tolist())
+            self._cache_put(key, vector)
+            for future in pending[key]:
+                future.set_result(vector)
+
+    def submit(self, text: str) -> Future:
+        """Future resolving to the embedding (as a tuple) of one query."""
+        key = normalize_query(text)
+        future = Future()
+        cached = self._cache_get(key)
+        if cached is not None:
+            future.set_result(cached)
+            return future
+        self._ensure_workers()
+        self._queue.put((key, future))
+        return future
+
+    # -- public API ------------------------------------------------------------
+
+    def embed(self, text: str) -> List[float]:
+        return list(self.submit(text).result())
+
+    async def aembed(self, text: str) -> List[float]:
+        return list(await asyncio.wrap_future(self.submit(text)))
+
+    def embed_queries(self, texts) -> List[List[float]]:
+        """
+        Many queries at once (batch API): cached ones from the cache, the rest
+        in a single encode call instead of one queued job each.
+        """
+        keys = [normalize_query(text) for text in texts]
+        vectors = {}
+        for key in dict.fromkeys(keys):
+            cached = self._cache_get(key)
+            if cached is not None:
+                vectors[key] = cached
+        missing = [key for key in dict.fromkeys(keys) if key not in vectors]
+        if missing:
+            for key, vector in zip(missing, self.model.encode(missing, batch_size=self.max_batch)):
+                vectors[key] = tuple(vector.tolist())
+                self._cache_put(key, vectors[key])
+            self.batches += 1
+            self.batched_texts += len(missing)
+        return [list(vectors[key]) for key in keys]
+
+    async def aembed_queries(self, texts) -> List[List[float]]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.embed_queries, list(texts))
+
+    def embed_many(self, texts, batch_size: int = 32) -> List[List[float]]:
+        """Encode documents directly (ingestion); bypasses the query cache and queue."""
+        if not texts:
+            return []
+        return self.model.encode(list(texts), batch_size=batch_size).tolist()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.backend,
+            "ready": self.ready,
+            "load_seconds": round(self.load_seconds, 3) if self.load_seconds is not None else None,
+            "cache_size": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "batches": self.batches,
+            "avg_batch": round(self.batched_texts / self.batches, 2) if self.batches else 0.0,
+        }
+
+
+# Global instance; the model loads on first use or via warm_up()
+embedding_service = EmbeddingService()
 
 def embed_text(text: str):
-    return model.encode(text).tolist()
+    return embedding_service.embed(text)
+
+async def aembed_text(text: str):
+    return await embedding_service.aembed(text)
+
+async def aembed_queries(texts):
+    return await embedding_service.aembed_queries(texts)
+
+def embed_texts(texts, batch_size: int = 32):
+    """Encode many texts with SentenceTransformer's own batching."""
+    return embedding_service.embed_many(texts, batch_size=batch_size)
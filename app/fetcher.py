@@ -0,0 +1,184 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import time
+from urllib.parse import urlsplit
+
+import httpx
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+                  "AppleWebKit/537.36 (KHTML, like Gecko) "
+                  "Chrome/115.0.0.0 Safari/537.36"
+}
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class ResponseCache:
+    """
+    Raw JSON responses on disk, one body + one meta file per URL. The meta
+    keeps ETag / Last-Modified so the next crawl can send conditional requests.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory or os.getenv("HTTP_CACHE_DIR", os.path.join("data", "http_cache"))
+
+    def _paths(self, url):
+        key = hashlib.md5(url.encode()).hexdigest()
+        return os.path.join(self.directory, f"{key}.body"), os.path.join(self.directory, f"{key}.meta.json")
+
+    def get(self, url):
+        """Returns (meta, body bytes) or None."""
+        body_path, meta_path = self._paths(url)
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(body_path, "rb") as f:
+                return meta, f.read()
+        except (OSError, ValueError):
+            return None
+
+    def put(self, url, body: bytes, etag=None, last_modified=None):
+        os.makedirs(self.directory, exist_ok=True)
+        body_path, meta_path = self._paths(url)
+        meta = {"url": url, "etag": etag, "last_modified": last_modified, "fetched_at": time.time()}
+        for path, data, mode in ((body_path, body, "wb"), (meta_path, json.dumps(meta).encode("utf-8"), "wb")):
+            tmp_path = path + ".tmp"
+            with open(tmp_path, mode) as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+
+
+class HostThrottle:
+    """Spaces out request starts per host to at most `rate` per second."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self._next_at = {}
+
+    async def wait(self, url):
+        if not self.interval:
+            return
+        host = urlsplit(url).netloc
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        start_at = max(now, self._next_at.get(host, now))
+        self._next_at[host] = start_at + self.interval
+        if start_at > now:
+            await asyncio.sleep(start_at - now)
+
+
+class FetchStats:
+    def __init__(self):
+        self.downloaded = 0
+        self.not_modified = 0
+        self.from_cache = 0
+        self.retries = 0
+        self.failed = 0
+        self.bytes = 0
+
+    def as_dict(self):
+        return dict(self.__dict__)
+
+
+class ConcurrentFetcher:
+    """
+    Fetches JSON documents over a pooled httpx client with bounded concurrency,
+    per-host rate limiting, retries with backoff and conditional requests
+    against an on-disk cache. With offline=True only the cache is used.
+    """
+
+    def __init__(self, cache=None, max_concurrency=None, per_host_rate=None, retries=3, backoff=0.5,
+                 timeout=10.0, offline=False, verify=False, headers=None):
+        self.cache = cache if cache is not None else ResponseCache()
+        self.max_concurrency = max_concurrency or int(os.getenv("CRAWL_CONCURRENCY", "16"))
+        self.per_host_rate = per_host_rate if per_host_rate is not None else float(os.getenv("CRAWL_HOST_RATE", "10"))
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.offline = offline
+        self.verify = verify
+        self.headers = headers or DEFAULT_HEADERS
+        self.stats = FetchStats()
+
+    def _client(self):
+        limits = httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency)
+        return httpx.AsyncClient(headers=self.headers, limits=limits, timeout=self.timeout,
+                                 verify=self.verify, follow_redirects=True)
+
+    def _retry_delay(self, attempt, response=None):
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                return float(retry_after)
+        return self.backoff * (2 ** attempt) * (0.5 + random.random())
+
+    async def _fetch_one(self, client, semaphore, throttle, url, headers=None):
+        cached = self.cache.get(url)
+        if self.offline:
+            if cached is None:
+                raise LookupError(f"{url} is not in the offline cache")
+            self.stats.from_cache += 1
+            return json.loads(cached[1])
+
+        request_headers = dict(headers or {})
+        if cached:
+            meta = cached[0]
+            if meta.get("etag"):
+                request_headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                request_headers["If-Modified-Since"] = meta["last_modified"]
+
+        async with semaphore:
+            for attempt in range(self.retries + 1):
+                await throttle.wait(url)
+                response = None
+                try:
+                    response = await client.get(url, headers=request_headers)
+                    if response.status_code == 304 and cached:
+                        self.stats.not_modified += 1
+                        return json.loads(cached[1])
+                    if response.status_code not in RETRY_STATUSES:
+                        response.raise_for_status()
+                        data = response.json()
+                        self.stats.downloaded += 1
+                        self.stats.bytes += len(response.content)
+                        self.cache.put(url, response.content, response.headers.get("ETag"),
+                                       response.headers.get("Last-Modified"))
+                        return data
+                    error = httpx.HTTPStatusError(f"HTTP {response.status_code}", request=response.request,
+                                                  response=response)
+                except (httpx.TransportError, httpx.TimeoutException) as e:
+                    error = e
+                if attempt == self.retries:
+                    raise error
+                self.stats.retries += 1
+                await asyncio.sleep(self._retry_delay(attempt, response))
+
+    async def fetch_all(self, urls, headers=None):
+        """Returns ({url: json}, {url: error message}) preserving the input order."""
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        throttle = HostThrottle(self.per_host_rate)
+        results, failures = {}, {}
+
+        async with self._client() as client:
+            async def run(url):
+                try:
+                    return url, await self._fetch_one(client, semaphore, throttle, url, headers), None
+                except Exception as e:
+                    return url, None, e
+
+            unique_urls = list(dict.fromkeys(urls))
+            for url, data, error in await asyncio.gather(*(run(url) for url in unique_urls)):
+                if error is None:
+                    results[url] = data
+                else:
+                    self.stats.failed += 1
+                    failures[url] = str(error) or type(error).__name__
+        return results, failures
+
+    def fetch_all_sync(self, urls, headers=None):
+        return asyncio.run(self.fetch_all(urls, headers))
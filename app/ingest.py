@@ -0,0 +1,345 @@
+import hashlib
+import json
+import os
+import random
+import time
+
+from app.drupal_loader import load_urls, build_drupal_doc, extract_pages
+from app.menu_loader import PMC_MENU_API, menu_docs_from_json
+from app.fetcher import ConcurrentFetcher
+from app.embeddings import embed_texts
+from app.lexical_index import BM25Index, load_documents
+from app.chunking import CHUNK_OVERLAP, CHUNK_TOKENS, CHUNK_UNIT, chunk_document
+
+
+class PipelineReport:
+    """Per-stage wall time and item counts, printed at the end of a run."""
+
+    def __init__(self):
+        self.stages = []
+        self.counters = {}
+
+    def record(self, stage: str, seconds: float, items: int):
+        self.stages.append((stage, seconds, items))
+
+    def count(self, name: str, value: int):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def print(self):
+        print("\n📊 Ingestion report")
+        print(f"  {'stage':<10}{'seconds':>10}{'items':>8}{'items/s':>10}")
+        total = 0.0
+        for stage, seconds, items in self.stages:
+            total += seconds
+            rate = f"{items / seconds:.1f}" if seconds > 0 and items else "-"
+            print(f"  {stage:<10}{seconds:>10.2f}{items:>8}{rate:>10}")
+        print(f"  {'total':<10}{total:>10.2f}")
+        for name, value in self.counters.items():
+            print(f"  {name}: {value}")
+
+
+class _Timer:
+    def __init__(self, report: PipelineReport, stage: str):
+        self.report = report
+        self.stage = stage
+        self.items = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.report.record(self.stage, time.perf_counter() - self.start, self.items)
+        return False
+
+
+# ---------------------------------------------------------------------------
+# Manifest: doc id -> content hash of what is currently in the index
+# ---------------------------------------------------------------------------
+
+def load_manifest(path: str) -> dict:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f).get("docs", {})
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(path: str, docs: dict) -> None:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"version": 1, "docs": docs}, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def content_hash(doc: dict) -> str:
+    # Chunking settings are part of the hash so changing them re-chunks every page
+    payload = json.dumps({"text": doc["text"], "metadata": doc["metadata"],
+                          "chunking": [CHUNK_TOKENS, CHUNK_OVERLAP, CHUNK_UNIT]}, sort_keys=True, ensure_ascii=False)
+    return hashlib.md5(payload.encode("utf-8")).hexdigest()
+
+
+# ---------------------------------------------------------------------------
+# Stages
+# ---------------------------------------------------------------------------
+
+def fetch_stage(urls, fetcher: ConcurrentFetcher):
+    """Returns ({url: json}, [failed urls], menu json or None)."""
+    pages, failures = fetcher.fetch_all_sync(list(urls) + [PMC_MENU_API])
+    for url, error in failures.items():
+        print(f"❌ Failed to fetch JSON from {url}: {error}")
+
+    menu_json = pages.pop(PMC_MENU_API, None)
+    failed = [url for url in failures if url != PMC_MENU_API]
+    return pages, failed, menu_json
+
+
+def extract_stage(pages, menu_json, workers: int = None):
+    docs = []
+    # HTML-to-text across a process pool; link resolution stays here (it needs the URL mappings)
+    extracted, failures = extract_pages(pages, workers)
+    for url, error in failures.items():
+        print(f"❌ Failed to parse JSON from {url}: {error}")
+    for url, data in pages.items():
+        if url not in extracted:
+            continue
+        try:
+            doc = build_drupal_doc(url, data, extracted[url])
+        except Exception as e:
+            print(f"❌ Failed to parse JSON from {url}: {e}")
+            continue
+        if doc:
+            doc["kind"] = "drupal"
+            docs.append(doc)
+
+    if menu_json is not None:
+        for doc in menu_docs_from_json(menu_json):
+            doc["kind"] = "menu"
+            docs.append(doc)
+
+    # Same page listed twice in urls.txt -> keep one copy
+    unique = {}
+    for doc in docs:
+        unique[doc["id"]] = doc
+    return list(unique.values())
+
+
+def plan_changes(docs, manifest, failed_ids, menu_fetched, full=False):
+    """
+    Split docs into (changed, unchanged) and work out which indexed ids are
+    gone. Pages that merely failed to fetch this run are not treated as deleted.
+    """
+    changed, unchanged = [], []
+    for doc in docs:
+        doc["hash"] = content_hash(doc)
+        entry = manifest.get(doc["id"])
+        if not full and entry and entry.get("hash") == doc["hash"]:
+            unchanged.append(doc)
+        else:
+            changed.append(doc)
+
+    current_ids = {doc["id"] for doc in docs}
+    deleted = []
+    for doc_id, entry in manifest.items():
+        if doc_id in current_ids or doc_id in failed_ids:
+            continue
+        if entry.get("kind") == "menu" and not menu_fetched:
+            continue
+        deleted.append(doc_id)
+    return changed, unchanged, deleted
+
+
+def chunk_stage(docs):
+    """{page id: [chunk docs]}. Drupal pages are split; menu items are one short line and stay whole."""
+    chunks = {}
+    for doc in docs:
+        chunks[doc["id"]] = chunk_document(doc) if doc["kind"] == "drupal" else [doc]
+    return chunks
+
+
+def indexed_ids(doc_id: str, entry: dict):
+    """Vector ids a manifest entry put in the index (pre-chunking entries are the page id itself)."""
+    return entry.get("chunks", [doc_id])
+
+
+def embed_stage(docs, batch_size: int):
+    """Returns [(id, embedding, metadata_with_text)], failing docs are skipped."""
+    payload = []
+    failed = 0
+    for start in range(0, len(docs), batch_size):
+        batch = docs[start:start + batch_size]
+        try:
+            embeddings = embed_texts([doc["text"] for doc in batch], batch_size=batch_size)
+        except Exception as e:
+            print(f"⚠️ Failed to embed batch starting at {batch[0]['id']}: {e}")
+            failed += len(batch)
+            continue
+        for doc, embedding in zip(batch, embeddings):
+            # Add the text content to metadata so it can be retrieved during RAG
+            metadata_with_text = doc["metadata"].copy()
+            metadata_with_text["text"] = doc["text"]
+            payload.append((doc["id"], embedding, metadata_with_text))
+    return payload, failed
+
+
+def _vector_size(item) -> int:
+    """Rough JSON request size of one vector (floats + metadata)."""
+    _, embedding, metadata = item
+    return len(embedding) * 12 + len(json.dumps(metadata, ensure_ascii=False).encode("utf-8"))
+
+
+def chunk_vectors(payload, max_vectors=None, max_bytes=None):
+    """Split the payload into upsert requests bounded by count and approximate bytes."""
+    chunk, chunk_bytes = [], 0
+    for item in payload:
+        size = _vector_size(item) if max_bytes else 0
+        if chunk and ((max_vectors and len(chunk) >= max_vectors) or
+                      (max_bytes and chunk_bytes + size > max_bytes)):
+            yield chunk
+            chunk, chunk_bytes = [], 0
+        chunk.append(item)
+        chunk_bytes += size
+    if chunk:
+        yield chunk
+
+
+def with_retries(fn, retries: int = 3, base_delay: float = 1.0, description: str = "request"):
+    """Call fn(), retrying with exponential backoff + jitter."""
+    for attempt in range(retries + 1):
+        try:
+            return fn()
+        except Exception as e:
+            if attempt == retries:
+                raise
+            delay = base_delay * (2 ** attempt) * (0.5 + random.random())
+            print(f"⚠️ {description} failed ({e}), retrying in {delay:.1f}s...")
+            time.sleep(delay)
+
+
+def upsert_stage(store, payload, max_vectors=None, max_bytes=None, retries: int = 3):
+    """Upsert in bounded chunks. Returns the ids that made it into the index."""
+    upserted = []
+    for chunk in chunk_vectors(payload, max_vectors, max_bytes):
+        try:
+            with_retries(lambda: store.upsert(chunk), retries, description=f"Upsert of {len(chunk)} vectors")
+            upserted.extend(item[0] for item in chunk)
+        except Exception as e:
+            print(f"❌ Failed to upsert {len(chunk)} vectors: {e}")
+    return upserted
+
+
+def delete_stage(store, ids, chunk_size: int = 1000, retries: int = 3):
+    deleted = []
+    for start in range(0, len(ids), chunk_size):
+        chunk = ids[start:start + chunk_size]
+        try:
+            with_retries(lambda: store.delete(chunk), retries, description=f"Delete of {len(chunk)} vectors")
+            deleted.extend(chunk)
+        except Exception as e:
+            print(f"❌ Failed to delete {len(chunk)} vectors: {e}")
+    return deleted
+
+
+# ---------------------------------------------------------------------------
+# Pipeline
+# ---------------------------------------------------------------------------
+
+def lexical_stage(chunks, manifest, page_ids, lexical_path: str = None) -> int:
+    """
+    Rebuild the BM25 index from this run's chunks. Pages that failed to
+    fetch but are still indexed (still in the manifest) keep their old entries.
+    """
+    index = BM25Index(path=lexical_path)
+    carried = []
+    for doc in load_documents(index.path):
+        page_id = doc["metadata"].get("parent_id", doc["id"])
+        if page_id not in page_ids and page_id in manifest:
+            carried.append(doc)
+    index.build(list(chunks) + carried)
+    index.save()
+    return len(index)
+
+
+def run_pipeline(store, manifest_path: str, urls=None, batch_size: int = 32, max_vectors=None,
+                 max_bytes=None, retries: int = 3, full: bool = False, fetcher: ConcurrentFetcher = None,
+                 lexical_path: str = None):
+    """
+    fetch -> extract -> diff against manifest -> embed (batched) -> upsert
+    (chunked, retried) -> delete removed docs -> save manifest -> rebuild
+    the BM25 index. Returns (PipelineReport, whether the index changed).
+    """
+    report = PipelineReport()
+    manifest = load_manifest(manifest_path)
+    urls = urls if urls is not None else load_urls()
+    fetcher = fetcher or ConcurrentFetcher()
+
+    if max_vectors is None:
+        max_vectors = getattr(store, "MAX_UPSERT_VECTORS", None)
+    if max_bytes is None:
+        max_bytes = getattr(store, "MAX_UPSERT_BYTES", None)
+
+    with _Timer(report, "fetch") as t:
+        pages, failed_urls, menu_json = fetch_stage(urls, fetcher)
+        t.items = len(pages) + (1 if menu_json is not None else 0)
+    report.count("fetch failures", len(failed_urls))
+    for name, value in fetcher.stats.as_dict().items():
+        report.count(f"http {name}", value)
+
+    with _Timer(report, "extract") as t:
+        docs = extract_stage(pages, menu_json)
+        t.items = len(docs)
+
+    failed_ids = {hashlib.md5(url.encode()).hexdigest() for url in failed_urls}
+    changed, unchanged, deleted_ids = plan_changes(docs, manifest, failed_ids, menu_json is not None, full)
+    report.count("unchanged (skipped)", len(unchanged))
+    report.count("new/changed", len(changed))
+    print(f"📄 {len(docs)} documents: {len(changed)} new/changed, {len(unchanged)} unchanged, "
+          f"{len(deleted_ids)} removed.")
+
+    with _Timer(report, "chunk") as t:
+        chunks = chunk_stage(docs)
+        t.items = sum(len(c) for c in chunks.values())
+    changed_chunks = [chunk for doc in changed for chunk in chunks[doc["id"]]]
+
+    with _Timer(report, "embed") as t:
+        payload, embed_failures = embed_stage(changed_chunks, batch_size)
+        t.items = len(payload)
+    report.count("embed failures", embed_failures)
+
+    with _Timer(report, "upsert") as t:
+        upserted = set(upsert_stage(store, payload, max_vectors, max_bytes, retries))
+        t.items = len(upserted)
+
+    # Chunks a changed page no longer has, plus every chunk of removed pages
+    stale = []
+    for doc in changed:
+        entry = manifest.get(doc["id"])
+        if entry and all(chunk["id"] in upserted for chunk in chunks[doc["id"]]):
+            new_ids = {chunk["id"] for chunk in chunks[doc["id"]]}
+            stale.extend(i for i in indexed_ids(doc["id"], entry) if i not in new_ids)
+    for doc_id in deleted_ids:
+        stale.extend(indexed_ids(doc_id, manifest[doc_id]))
+
+    with _Timer(report, "delete") as t:
+        deleted = set(delete_stage(store, stale, retries=retries)) if stale else set()
+        t.items = len(deleted)
+
+    # Only record what actually reached the index so failures are retried next run
+    for doc in changed:
+        chunk_ids = [chunk["id"] for chunk in chunks[doc["id"]]]
+        if chunk_ids and all(i in upserted for i in chunk_ids):
+            manifest[doc["id"]] = {"hash": doc["hash"], "kind": doc["kind"], "source": doc["metadata"].get("source"),
+                                   "chunks": chunk_ids}
+    for doc_id in deleted_ids:
+        if all(i in deleted for i in indexed_ids(doc_id, manifest[doc_id])):
+            manifest.pop(doc_id, None)
+    save_manifest(manifest_path, manifest)
+
+    with _Timer(report, "lexical") as t:
+        all_chunks = [chunk for page_chunks in chunks.values() for chunk in page_chunks]
+        t.items = lexical_stage(all_chunks, manifest, set(chunks), lexical_path)
+
+    return report, bool(upserted or deleted)
@@ -0,0 +1,143 @@
+import math
+import os
+import re
+import time
+from collections import Counter
+from typing import Dict, Iterable, Optional, Tuple
+
+from app.metrics import LANGUAGE_DETECTIONS, LANGUAGE_SECONDS
+
+# Devanagari Unicode range: 0x0900-0x097F
+_DEVANAGARI = re.compile(r'[\u0900-\u097F]')
+_LATIN = re.compile(r'[A-Za-z]')
+_WORD = re.compile(r'[a-z0-9]+')
+
+# Strong Romanized-Marathi words (interrogatives, verb forms, civic nouns)
+MARATHI_INDICATORS = frozenset({
+    'kasa', 'kase', 'kay', 'kaay', 'kuthe', 'kadhi', 'kiti', 'konala', 'kona',
+    'milwaycha', 'milwayche', 'milwaychi', 'karaycha', 'karayche', 'karaychi',
+    'ghaycha', 'ghayche', 'ghaychi', 'deyacha', 'deyache', 'deyachi',
+    'bharaycha', 'bharayche', 'bharaychi', 'mahnaycha', 'mahnayche', 'mahnaychi',
+    'sangaycha', 'sangayche', 'sangaychi', 'hotay', 'hoti', 'hota', 'hotat',
+    'aadhaar', 'mahapalika', 'palika',
+    # Verb forms and postpositions (from the training samples). Short words that are
+    # also English or Pune names ('ka', 'ani', 'mala', 'maza', 'karu', ...) are
+    # left to the classifier, as is the place-name suffix 'nagar'
+    'aahe', 'aahet', 'ahe', 'nahi', 'kuthla', 'milel', 'hoil', 'pahije', 'mahiti', 'baddal', 'karava',
+})
+
+_INTERROGATIVES = r'(kasa|kase|kay|kaay|kuthe|kadhi|kiti|konala|kona)'
+MARATHI_PATTERNS = tuple(re.compile(p) for p in (
+    rf'\b{_INTERROGATIVES}\s+\w+',
+    r'\w+\s+(cha|che|chi|ne|la|na|ta|te|ti|sa|se|si)\b',
+    r'\b(milwaycha|milwayche|milwaychi|karaycha|karayche|karaychi)\b',
+    r'\b(ghaycha|ghayche|ghaychi|deyacha|deyache|deyachi)\b',
+    r'\b(bharaycha|bharayche|bharaychi|mahnaycha|mahnayche|mahnaychi)\b',
+    rf'\w+\s+{_INTERROGATIVES}\s+\w+',
+))
+
+SAMPLES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "language_samples.tsv")
+
+
+class NgramLanguageClassifier:
+    """
+    Multinomial naive Bayes over character n-grams. Small enough to train at
+    import from the bundled sample file; used to settle queries the rules
+    can't decide (one Marathi indicator word and nothing else).
+    """
+
+    def __init__(self, n_min: int = 1, n_max: int = 4, alpha: float = 0.5):
+        self.n_min = n_min
+        self.n_max = n_max
+        self.alpha = alpha
+        self.log_priors = {}
+        self.log_probs = {}
+        self.log_unseen = {}
+
+    def _features(self, text: str) -> Counter:
+        padded = " " + " ".join(_WORD.findall(text.lower())) + " "
+        grams = Counter()
+        for n in range(self.n_min, self.n_max + 1):
+            for i in range(len(padded) - n + 1):
+                grams[padded[i:i + n]] += 1
+        return grams
+
+    def fit(self, samples: Iterable[Tuple[str, str]]) -> "NgramLanguageClassifier":
+        counts, docs = {}, Counter()
+        for label, text in samples:
+            counts.setdefault(label, Counter()).update(self._features(text))
+            docs[label] += 1
+        vocab = set()
+        for label_counts in counts.values():
+            vocab.update(label_counts)
+        total_docs = sum(docs.values())
+        for label, label_counts in counts.items():
+            denominator = sum(label_counts.values()) + self.alpha * len(vocab)
+            self.log_priors[label] = math.log(docs[label] / total_docs)
+            self.log_probs[label] = {g: math.log((c + self.alpha) / denominator) for g, c in label_counts.items()}
+            self.log_unseen[label] = math.log(self.alpha / denominator)
+        return self
+
+    def scores(self, text: str) -> Dict[str, float]:
+        grams = self._features(text)
+        result = {}
+        for label, log_probs in self.log_probs.items():
+            unseen = self.log_unseen[label]
+            result[label] = self.log_priors[label] + sum(
+                count * log_probs.get(gram, unseen) for gram, count in grams.items()
+            )
+        return result
+
+    def predict(self, text: str) -> str:
+        scores = self.scores(text)
+        return max(scores, key=scores.get)
+
+    @classmethod
+    def from_file(cls, path: str = SAMPLES_PATH) -> "NgramLanguageClassifier":
+        samples = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if "\t" in line:
+                    label, text = line.rstrip("\n").split("\t", 1)
+                    samples.append((label, text))
+        return cls().fit(samples)
+
+
+def rule_based_language(query: str) -> Optional[str]:
+    """
+    Script and keyword rules. Returns 'english' or 'marathi', or None when the
+    query is ambiguous (exactly one indicator word and no Marathi pattern).
+    """
+    # If more Devanagari characters than Latin ones, it's definitely Marathi
+    if len(_DEVANAGARI.findall(query)) > len(_LATIN.findall(query)):
+        return 'marathi'
+
+    query_lower = query.lower()
+    indicator_count = sum(1 for word in _WORD.findall(query_lower) if word in MARATHI_INDICATORS)
+    pattern_matches = sum(1 for pattern in MARATHI_PATTERNS if pattern.search(query_lower))
+
+    if indicator_count == 0 and pattern_matches == 0:
+        return 'english'
+    if indicator_count >= 2 or pattern_matches > 0:
+        return 'marathi'
+    return None
+
+
+classifier = NgramLanguageClassifier.from_file()
+
+
+def detect_language(query: str) -> str:
+    """
+    Detect if the query is in English or Marathi. Returns 'english' or 'marathi'.
+    The rules decide whenever they can; only the ambiguous case (a single
+    indicator word, no Marathi pattern), where an LLM call used to break the
+    tie, goes to the local n-gram classifier. No network calls.
+    """
+    start = time.perf_counter()
+    language, method = rule_based_language(query), 'rules'
+    if language is None:
+        # Trained on ~150 short samples: only trusted for the tie-break, not to overrule the rules
+        language, method = classifier.predict(query), 'classifier'
+    LANGUAGE_SECONDS.observe(time.perf_counter() - start)
+    LANGUAGE_DETECTIONS.inc(language, method)
+    return language
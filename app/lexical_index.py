@@ -0,0 +1,164 @@
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+_TOKEN = re.compile(r'[a-z0-9]+|[\u0900-\u097F]+')
+
+STOP_WORDS = frozenset({
+    'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by',
+    'is', 'are', 'was', 'were', 'be', 'been', 'being', 'have', 'has', 'had', 'do', 'does', 'did',
+    'will', 'would', 'could', 'should', 'may', 'might', 'can', 'this', 'that', 'these', 'those',
+    'i', 'you', 'he', 'she', 'it', 'we', 'they', 'me', 'him', 'her', 'us', 'them', 'my', 'our',
+    'what', 'when', 'where', 'why', 'how', 'who', 'which', 'whose', 'whom',
+    # URL noise
+    'https', 'http', 'www', 'gov', 'api', 'lang', 'en', 'mr', 'basic', 'page', 'detail',
+})
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN.findall(text.lower()) if t not in STOP_WORDS]
+
+
+def document_tokens(doc: dict) -> List[str]:
+    """Body text plus the words of the source URL (slug, listing name), so URL keywords still match."""
+    metadata = doc.get("metadata") or {}
+    return tokenize(doc.get("text") or metadata.get("text") or "") + tokenize(metadata.get("source") or "")
+
+
+class BM25Index:
+    """
+    Okapi BM25 over the ingested documents, kept as an inverted index with
+    the per-posting term weight precomputed, so a query is one dict lookup
+    and a few additions per query term.
+
+    Built by the ingestion pipeline and saved as JSON; servers load it lazily
+    and pick up a rebuilt file by mtime, like LocalStore.
+    """
+
+    def __init__(self, path: str = None, k1: float = 1.2, b: float = 0.75, reload_interval: float = 5.0):
+        self.path = path or os.getenv("LEXICAL_INDEX_PATH", os.path.join("data", "lexical_index.json"))
+        self.k1 = k1
+        self.b = b
+        self.reload_interval = reload_interval
+        self._snapshot = ([], {})
+        self._lock = threading.Lock()
+        self._loaded_mtime = None
+        self._checked_at = 0.0
+
+    # -- building --------------------------------------------------------------
+
+    def build(self, docs) -> "BM25Index":
+        """docs: [{"id", "text", "metadata"}] as produced by the loaders."""
+        entries = []
+        counts = []
+        # Same page listed twice -> one entry, like the vector store's upsert
+        docs = list({doc["id"]: doc for doc in docs}.values())
+        for doc in docs:
+            metadata = dict(doc.get("metadata") or {})
+            metadata.setdefault("text", doc.get("text", ""))
+            entries.append({"id": doc["id"], "metadata": metadata})
+            counts.append(Counter(document_tokens(doc)))
+
+        n = len(counts)
+        avg_len = (sum(sum(c.values()) for c in counts) / n) if n else 0.0
+        df = Counter()
+        for c in counts:
+            df.update(c.keys())
+
+        postings = {}
+        for position, c in enumerate(counts):
+            length_norm = self.k1 * (1 - self.b + self.b * sum(c.values()) / avg_len) if avg_len else self.k1
+            for term, tf in c.items():
+                idf = math.log(1 + (n - df[term] + 0.5) / (df[term] + 0.5))
+                weight = idf * tf * (self.k1 + 1) / (tf + length_norm)
+                postings.setdefault(term, []).append((position, round(weight, 5)))
+        self._snapshot = (entries, postings)
+        return self
+
+    @property
+    def docs(self) -> List[dict]:
+        return self._snapshot[0]
+
+    @property
+    def postings(self) -> Dict[str, list]:
+        return self._snapshot[1]
+
+    def save(self, path: str = None) -> None:
+        path = path or self.path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "k1": self.k1, "b": self.b, "docs": self.docs, "postings": self.postings},
+                      f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    # -- loading ---------------------------------------------------------------
+
+    def _mtime(self) -> Optional[int]:
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _maybe_reload(self) -> None:
+        """Re-read the file when its mtime changes (checked every reload_interval s; < 0 disables)."""
+        now = time.monotonic()
+        if self.reload_interval < 0 or (self._checked_at and now - self._checked_at < self.reload_interval):
+            return
+        with self._lock:
+            self._checked_at = now
+            mtime = self._mtime()
+            if mtime is None or mtime == self._loaded_mtime:
+                return
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Failed to load lexical index {self.path}: {e}")
+                return
+            # One swap, so a concurrent search never mixes two versions
+            self._snapshot = (data["docs"], {
+                term: [tuple(p) for p in plist] for term, plist in data["postings"].items()
+            })
+            self.k1, self.b = data.get("k1", self.k1), data.get("b", self.b)
+            self._loaded_mtime = mtime
+            print(f"🔤 Loaded lexical index ({len(self.docs)} docs, {len(self.postings)} terms)")
+
+    # -- querying --------------------------------------------------------------
+
+    def search(self, query: str, top_k: int = 10) -> List[Dict]:
+        """Top-k matches in the vector store's shape: [{"id", "score", "metadata"}]."""
+        self._maybe_reload()
+        docs, postings = self._snapshot
+        scores = {}
+        for term in set(tokenize(query)):
+            for position, weight in postings.get(term, ()):
+                scores[position] = scores.get(position, 0.0) + weight
+        if not scores:
+            return []
+        best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+        return [{"id": docs[p]["id"], "score": score, "metadata": docs[p]["metadata"]} for p, score in best]
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+
+def load_documents(path: str) -> List[dict]:
+    """Documents stored in an existing index file (used to carry over pages that failed to fetch)."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            return [{"id": d["id"], "text": d["metadata"].get("text", ""), "metadata": d["metadata"]}
+                    for d in json.load(f).get("docs", [])]
+    except (OSError, ValueError, KeyError):
+        return []
+
+
+# Global instance
+lexical_index = BM25Index()
@@ -1,8 +1,24 @@
-from fastapi import FastAPI
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from pydantic import BaseModel
-from app.rag import generate_answer, detect_language
+from typing import List
+from app.rag import agenerate_answer, agenerate_answers, astream_answer
+from app.language import detect_language
+from app.request_log import request_logger
+from app.embeddings import embedding_service
+from app.lexical_index import lexical_index
+from app.session_memory import session_store
+from app.answer_cache import answer_cache
+from app.url_mapper import url_mapper
+from app.tokens import get_encoding
+from app.metrics import metrics, HTTP_SECONDS
+from app.static_assets import static_assets
+from app import providers
+import threading
+import time
+import json
 import uuid
 import os
 from dotenv import load_dotenv
@@ -12,6 +28,36 @@ load_dotenv()  # ✅ this will load the .env file before anything else
 
 app = FastAPI()
 
+class MetricsMiddleware:
+    """Request time per route (endpoint name, so labels stay bounded), including the whole SSE stream."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not metrics.enabled:
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Mounted apps (StaticFiles) are endpoints too, but have no __name__
+            route = getattr(scope.get("endpoint"), "__name__", None)
+            if route is None:
+                route = "static" if scope["path"].startswith("/static/") else "other"
+            HTTP_SECONDS.observe(time.perf_counter() - start, route, scope["method"], str(status))
+
+app.add_middleware(MetricsMiddleware)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -21,31 +67,189 @@ app.add_middleware(
     allow_headers=["*"],  # Allows all headers
 )
 
-# Mount static folder at /static
+# gzip for JSON / text responses above this size (answers with sources are a
+# few KB). SSE streams, images and the precompressed static files are skipped.
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1000"))
+app.add_middleware(GZipMiddleware, minimum_size=COMPRESS_MIN_BYTES,
+                   compresslevel=int(os.getenv("COMPRESS_LEVEL", "6")))
+
+# WARMUP (formerly EMBED_WARMUP) = background | eager | lazy, see warm_up_resources
+WARMUP = os.getenv("WARMUP", os.getenv("EMBED_WARMUP", "background")).lower()
+
+# Set once shutdown starts, so load balancers stop routing here while requests drain
+_draining = False
+
+def preload():
+    """
+    Load the read-only data (model weights, lexical index) in the gunicorn
+    master before it forks, so all workers share those pages copy-on-write.
+    Nothing here may start threads or open connections.
+    """
+    embedding_service.model
+    lexical_index._maybe_reload()
+    url_mapper.warm_up()
+    static_assets.warm_up()
+    providers.preload()
+    get_encoding()
+
+def after_fork():
+    """Per-worker reset after fork: SQLite connections must not be shared with the parent."""
+    for component in (session_store, answer_cache):
+        engine = getattr(component, "engine", None)
+        if engine is not None:
+            engine.dispose(close=False)
+    providers.reset_after_fork()
+
+def warm_up():
+    """Everything but the model that the first request would otherwise pay for."""
+    start = time.perf_counter()
+    url_mapper.warm_up()
+    static_assets.warm_up()
+    lexical_index._maybe_reload()
+    get_encoding()
+    providers.warm_up()
+    print(f"🔥 Warm-up done in {time.perf_counter() - start:.1f}s")
+
+@app.on_event("startup")
+def warm_up_resources():
+    # Nothing heavy happens at import. WARMUP=background (default) builds the
+    # model, API clients, vector store and mappings without holding up startup
+    # (/livez answers at once, /readyz once they are loaded), eager blocks
+    # until they are ready, lazy leaves each to its first use.
+    if WARMUP == "lazy":
+        return
+    embedding_service.warm_up(background=(WARMUP != "eager"))
+    if WARMUP == "eager":
+        warm_up()
+    else:
+        threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+
+@app.on_event("startup")
+def start_metrics():
+    metrics.start()
+
+# Shared SQLite history is the same for every worker; in-memory sessions add up
+metrics.gauge("pmcbot_active_sessions", "Sessions with history in the session store.",
+              function=lambda: {(): session_store.count()},
+              multiprocess="max" if getattr(session_store, "engine", None) is not None else "sum")
+
+@app.on_event("shutdown")
+def flush_request_log():
+    global _draining
+    _draining = True
+    # Write out whatever the background logger still has queued
+    request_logger.close()
+
+@app.get("/metrics")
+def prometheus_metrics():
+    """Prometheus text exposition; 404 when METRICS_ENABLED=0."""
+    if not metrics.enabled:
+        raise HTTPException(status_code=404)
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/livez")
+def livez():
+    """Liveness: the worker process is up and serving its event loop."""
+    return {"status": "ok", "pid": os.getpid()}
+
+@app.get("/readyz")
+def readyz():
+    """Readiness: model loaded, URL mappings loaded, session store reachable, not shutting down."""
+    checks = {
+        "embedding_model": embedding_service.ready or WARMUP == "lazy",
+        "url_mappings": url_mapper.ready or WARMUP == "lazy",
+        "accepting_requests": not _draining,
+    }
+    try:
+        session_store.count()
+        checks["session_store"] = True
+    except Exception as e:
+        print(f"⚠️ Session store not reachable: {e}")
+        checks["session_store"] = False
+    ready = all(checks.values())
+    return JSONResponse({"status": "ready" if ready else "not ready", "checks": checks,
+                         "providers": providers.status(), "pid": os.getpid()},
+                        status_code=200 if ready else 503)
+
+# Content-hashed copies (see app.static_assets), cached for a year; must come before the /static mount
+@app.api_route("/static/dist/{name:path}", methods=["GET", "HEAD"])
+def serve_asset(name: str, request: Request):
+    response = static_assets.asset_response(name, request.headers)
+    if response is None:
+        raise HTTPException(status_code=404)
+    return response
+
+# Mount static folder at /static (unhashed names, for old bookmarks and cached pages)
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
-# Serve index.html at root
-@app.get("/")
-def serve_index():
-    return FileResponse(os.path.join("static", "index.html"))
+# Serve index.html at root: precompressed, revalidated by ETag
+@app.api_route("/", methods=["GET", "HEAD"])
+def serve_index(request: Request):
+    response = static_assets.index_response(request.headers)
+    return response if response is not None else FileResponse(os.path.join("static", "index.html"))
 
 class ChatInput(BaseModel):
     session_id: str = None
     query: str
 
 @app.post("/chat")
-def chat(input: ChatInput):
+async def chat(input: ChatInput):
     session_id = input.session_id or str(uuid.uuid4())
     
-    # Detect language of the query
+    # Detect language once and pass it through to the answer pipeline
     detected_language = detect_language(input.query)
-    
-    # Generate answer
-    answer, sources = generate_answer(input.query, session_id)
+    answer, sources = await agenerate_answer(input.query, session_id, detected_language)
     
     return {
         "session_id": session_id, 
         "answer": answer, 
         "sources": sources,
         "detected_language": detected_language
-    }
\ No newline at end of file
+    }
+
+# Upper bound on the number of messages in one /chat/batch request
+CHAT_BATCH_MAX_ITEMS = int(os.getenv("CHAT_BATCH_MAX_ITEMS", "32"))
+
+class BatchInput(BaseModel):
+    items: List[ChatInput]
+
+@app.post("/chat/batch")
+async def chat_batch(input: BatchInput):
+    """
+    Many /chat messages in one request (e.g. a WhatsApp gateway flushing its
+    queue). Embedding and retrieval run once for the whole batch; results come
+    back in input order, with a per-item error instead of failing the batch.
+    """
+    if not input.items:
+        raise HTTPException(status_code=400, detail="items must not be empty")
+    if len(input.items) > CHAT_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"at most {CHAT_BATCH_MAX_ITEMS} items per batch")
+
+    items = [(item.query, item.session_id or str(uuid.uuid4()), detect_language(item.query))
+             for item in input.items]
+    results = await agenerate_answers(items)
+    return {"results": [
+        {
+            "session_id": r.session_id,
+            "answer": r.answer,
+            "sources": r.sources,
+            "detected_language": r.detected_language,
+            "error": r.error,
+        }
+        for r in results
+    ]}
+
+@app.post("/chat/stream")
+async def chat_stream(input: ChatInput):
+    """Server-Sent Events version of /chat: meta event, then tokens as they arrive."""
+    session_id = input.session_id or str(uuid.uuid4())
+
+    async def event_source():
+        async for event, data in astream_answer(input.query, session_id, detect_language(input.query)):
+            yield f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,5 +1,4 @@
-import requests
-from app.embeddings import embed_text
+from app.fetcher import ConcurrentFetcher, DEFAULT_HEADERS
 
 PMC_MENU_API = "https://webadmin.pmc.gov.in/api/menu-data/pmc-services-citizen?lang=en"
 
@@ -23,32 +22,33 @@ def flatten_menu(menu):
 
     return flat_items
 
+# Same browser User-Agent the crawler sends everywhere
+MENU_HEADERS = DEFAULT_HEADERS
+
+def fetch_menu_json(fetcher=None):
+    pages, failures = (fetcher or ConcurrentFetcher()).fetch_all_sync([PMC_MENU_API], headers=MENU_HEADERS)
+    if PMC_MENU_API in failures:
+        raise RuntimeError(failures[PMC_MENU_API])
+    return pages[PMC_MENU_API]
+
+def menu_docs_from_json(menu_json):
+    docs = []
+    for item in flatten_menu(menu_json):
+        title = item["title"]
+        url = item["link"]
+        docs.append({
+            "id": url,
+            "text": f"{title}\n{url}",
+            "metadata": {
+                "source": url,
+                "kind": "menu"
+            }
+        })
+    return docs
+
 def load_menu_docs():
     try:
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                          "AppleWebKit/537.36 (KHTML, like Gecko) "
-                          "Chrome/115.0.0.0 Safari/537.36"
-        }
-
-        res = requests.get(PMC_MENU_API, headers=headers, verify=False, timeout=10)
-        res.raise_for_status()
-        menu_json = res.json()
-
-        items = flatten_menu(menu_json)
-        docs = []
-
-        for item in items:
-            title = item["title"]
-            url = item["link"]
-            docs.append({
-                "id": url,
-                "text": f"{title}\n{url}",
-                "metadata": {
-                    "source": url
-                }
-            })
-
+        docs = menu_docs_from_json(fetch_menu_json())
         print(f"✅ Extracted {len(docs)} menu items.")
         return docs
     except Exception as e:
@@ -0,0 +1,323 @@
+import glob
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional, Tuple
+
+# METRICS_ENABLED=0 turns every instrument into a no-op and /metrics into a 404
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") != "0"
+# Set (by gunicorn.conf.py) when several workers serve; each writes its samples there and /metrics sums them
+METRICS_DIR = os.getenv("METRICS_DIR") or None
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names, values, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def samples(self) -> Dict[tuple, object]:
+        with self._lock:
+            return {key: (list(value) if isinstance(value, list) else value) for key, value in self._values.items()}
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+
+class Gauge(_Metric):
+    """Value read at scrape time from `function` (returning {labels tuple: value}) or set directly."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), function: Callable = None,
+                 multiprocess: str = "sum"):
+        super().__init__(name, documentation, labelnames)
+        self.function = function
+        # How workers' values combine: "sum" (e.g. memory) or "max" (shared state seen by all of them)
+        self.multiprocess = multiprocess
+
+    def set(self, value: float, *labels) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+    def samples(self):
+        if self.function is None:
+            return super().samples()
+        try:
+            return self.function()
+        except Exception as e:
+            print(f"⚠️ Metric {self.name} failed: {e}")
+            return {}
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram; each label set keeps [bucket counts..., sum, count]."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labels) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    @contextmanager
+    def time(self, *labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+
+class _Noop:
+    """Stands in for every instrument when metrics are disabled."""
+
+    def inc(self, *labels, amount: float = 1.0) -> None:
+        pass
+
+    def set(self, value: float, *labels) -> None:
+        pass
+
+    def observe(self, value: float, *labels) -> None:
+        pass
+
+    @contextmanager
+    def time(self, *labels):
+        yield
+
+
+_NOOP = _Noop()
+
+
+class MetricsRegistry:
+    """
+    In-process metrics rendered in the Prometheus text format (0.0.4).
+
+    With METRICS_DIR set, every worker also dumps its samples to
+    <dir>/<pid>.json (every METRICS_FLUSH_INTERVAL seconds and on each
+    scrape), and a scrape of any worker sums all files, so /metrics covers
+    the whole server rather than whichever worker answered. Counters and
+    histograms of workers that have exited are kept; their gauges are not.
+    """
+
+    def __init__(self, enabled: bool = METRICS_ENABLED, directory: Optional[str] = METRICS_DIR,
+                 flush_interval: float = METRICS_FLUSH_INTERVAL):
+        self.enabled = enabled
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._metrics = []
+        self._thread = None
+
+    def _register(self, metric):
+        if not self.enabled:
+            return _NOOP
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=(), function=None, multiprocess="sum"):
+        return self._register(Gauge(name, documentation, labelnames, function, multiprocess))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    # -- multi-process ---------------------------------------------------------
+
+    def _snapshot(self) -> dict:
+        return {metric.name: [[list(key), value] for key, value in metric.samples().items()]
+                for metric in self._metrics}
+
+    def flush(self) -> None:
+        if not self.directory:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{os.getpid()}.json")
+        with open(path + ".tmp", "w") as f:
+            json.dump(self._snapshot(), f)
+        os.replace(path + ".tmp", path)
+
+    def start(self) -> None:
+        """Start the periodic flush (call in each worker, after fork)."""
+        if not (self.enabled and self.directory) or self._thread is not None:
+            return
+
+        def run():
+            while True:
+                time.sleep(self.flush_interval)
+                try:
+                    self.flush()
+                except OSError as e:
+                    print(f"⚠️ Failed to write metrics: {e}")
+
+        self._thread = threading.Thread(target=run, name="metrics-flush", daemon=True)
+        self._thread.start()
+
+    def _collect(self) -> Dict[str, Dict[tuple, object]]:
+        if not self.directory:
+            return {metric.name: metric.samples() for metric in self._metrics}
+        self.flush()
+        kinds = {metric.name: metric for metric in self._metrics}
+        merged = {name: {} for name in kinds}
+        for path in glob.glob(os.path.join(self.directory, "*.json")):
+            pid = int(os.path.basename(path)[:-len(".json")])
+            try:
+                with open(path) as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+            alive = _pid_alive(pid)
+            for name, samples in snapshot.items():
+                metric = kinds.get(name)
+                if metric is None or (metric.kind == "gauge" and not alive):
+                    continue
+                target = merged[name]
+                for key, value in samples:
+                    key = tuple(key)
+                    if key not in target:
+                        target[key] = value
+                    elif metric.kind == "histogram":
+                        target[key] = [a + b for a, b in zip(target[key], value)]
+                    elif metric.kind == "gauge" and metric.multiprocess == "max":
+                        target[key] = max(target[key], value)
+                    else:
+                        target[key] += value
+        return merged
+
+    # -- exposition ------------------------------------------------------------
+
+    def render(self) -> str:
+        collected = self._collect()
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for key, value in sorted(collected.get(metric.name, {}).items()):
+                if metric.kind != "histogram":
+                    lines.append(f"{metric.name}{_label_text(metric.labelnames, key)} {_format(value)}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(metric.buckets + (float("inf"),), value):
+                    cumulative += count
+                    le = f'le="{_format(bound)}"'
+                    lines.append(f"{metric.name}_bucket{_label_text(metric.labelnames, key, le)} {cumulative}")
+                labels = _label_text(metric.labelnames, key)
+                lines.append(f"{metric.name}_sum{labels} {_format(value[-2])}")
+                lines.append(f"{metric.name}_count{labels} {value[-1]}")
+        return "\n".join(lines) + "\n"
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+
+def _resident_memory() -> dict:
+    try:
+        with open("/proc/self/statm") as f:
+            return {(): int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")}
+    except (OSError, ValueError):
+        import resource
+        return {(): resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024}
+
+
+# Global instance
+metrics = MetricsRegistry()
+
+# Per-request stages, fed from StageTimings when the request is logged
+STAGE_SECONDS = metrics.histogram(
+    "pmcbot_stage_duration_seconds",
+    "Time per /chat pipeline stage (language, embed, vector_query, llm, postprocess, ..., total).",
+    ("stage",))
+HTTP_SECONDS = metrics.histogram(
+    "pmcbot_http_request_duration_seconds", "HTTP request time by route and status.", ("route", "method", "status"))
+LANGUAGE_SECONDS = metrics.histogram(
+    "pmcbot_detect_language_duration_seconds", "Time spent in detect_language.",
+    buckets=(0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005))
+LANGUAGE_DETECTIONS = metrics.counter(
+    "pmcbot_language_detections_total", "Detected languages by the detector that decided.", ("language", "method"))
+CACHE_LOOKUPS = metrics.counter(
+    "pmcbot_cache_lookups_total", "Answer and query-embedding cache lookups.", ("cache", "result"))
+ERRORS = metrics.counter(
+    "pmcbot_upstream_errors_total", "Failed calls to the vector store and OpenAI.", ("service",))
+LLM_TOKENS = metrics.counter(
+    "pmcbot_llm_tokens_total", "Tokens billed by OpenAI (response.usage).", ("kind",))
+DEGRADED = metrics.counter(
+    "pmcbot_degraded_answers_total", "Requests answered with sources and links only, by cause.", ("reason",))
+ANSWERS = metrics.counter(
+    "pmcbot_answers_total", "Answered requests by how the answer was produced (llm, cache, navigation, links_only).",
+    ("route",))
+PROMPT_TOKENS = metrics.histogram(
+    "pmcbot_prompt_tokens", "Tokens in the assembled answer prompt.",
+    buckets=(250, 500, 750, 1000, 1250, 1500, 2000, 3000, 4000))
+RERANK_KEPT = metrics.histogram(
+    "pmcbot_rerank_kept_pages", "Pages kept for the prompt by the cross-encoder reranker.",
+    buckets=(0, 1, 2, 3, 4, 5, 8))
+RESIDENT_MEMORY = metrics.gauge(
+    "process_resident_memory_bytes", "Resident set size of the server processes.", function=_resident_memory)
+
+
+def observe_timings(stages: Dict[str, float], total: float) -> None:
+    """StageTimings seconds -> stage histogram (one call per request)."""
+    if not metrics.enabled:
+        return
+    for stage, seconds in stages.items():
+        STAGE_SECONDS.observe(seconds, stage)
+    STAGE_SECONDS.observe(total, "total")
+
+
+@contextmanager
+def count_errors(service: str):
+    """Count (and re-raise) an exception from an upstream call."""
+    try:
+        yield
+    except Exception:
+        ERRORS.inc(service)
+        raise
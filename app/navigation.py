@@ -0,0 +1,120 @@
+import os
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from app.url_mapper import url_mapper, BACKEND_API_PREFIX
+
+# "Where is the link for X" questions whose answer is a single menu item or
+# verified page are answered from a template, without a completion.
+NAV_FAST_PATH = os.getenv("NAV_FAST_PATH", "1") != "0"
+# Minimum dense (cosine) score of the top match; MiniLM puts close title matches around 0.6-0.8
+NAV_MIN_SCORE = float(os.getenv("NAV_MIN_SCORE", "0.6"))
+# Longer questions usually want an explanation, not a link
+NAV_MAX_WORDS = int(os.getenv("NAV_MAX_WORDS", "12"))
+# Other qualifying link pages listed under the main one
+NAV_EXTRA_LINKS = int(os.getenv("NAV_EXTRA_LINKS", "2"))
+
+_WORD_RE = re.compile(r'\w+')
+_NAVIGATIONAL_PATTERNS = tuple(re.compile(p) for p in (
+    r'\b(link|links|url|website|web\s?site|webpage|web\s?page|portal|site)\b',
+    r'\b(where|how)\s+(can|do|should)\s+i\s+(find|get to|open|access|go)\b',
+    r'\b(take me to|show me the|open the|go to)\b',
+    r'\b(page|form)\s+(for|of)\b',
+    # Romanized Marathi: "kuthe milel", "link dya", "sanketsthal"
+    r'\b(sanketsthal|sanketsthala)\b',
+    r'\bkuthe\s+(milel|aahe|ahe|bhetel|sapdel)\b',
+    r'\blink\s+(dya|pathva|dakhva)\b',
+    # Devanagari
+    r'(लिंक|संकेतस्थळ|वेबसाइट|वेबसाईट|पोर्टल)',
+    r'कुठे\s+(मिळेल|आहे|सापडेल)',
+))
+# "link" as a verb ("how to link aadhaar with property tax") asks how, not where
+_LINK_VERB = re.compile(r'\b(to|i|we|you|can|should|must|will)\s+link\b')
+
+_HEADER = {
+    'english': "Here is the page you are looking for:",
+    'marathi': "तुम्ही शोधत असलेले पान येथे आहे:",
+}
+_ALSO_SEE = {
+    'english': "You may also find these useful:",
+    'marathi': "हे पान देखील उपयोगी पडू शकतात:",
+}
+
+
+@dataclass
+class NavigationAnswer:
+    answer: str
+    links: List[str]
+    matches: List[Dict]
+    score: float
+
+
+def is_navigational(query: str) -> bool:
+    """Short questions asking for a link / page / portal rather than an explanation."""
+    text = _LINK_VERB.sub(" ", query.lower())
+    if len(_WORD_RE.findall(text)) > NAV_MAX_WORDS:
+        return False
+    return any(pattern.search(text) for pattern in _NAVIGATIONAL_PATTERNS)
+
+
+def dense_score(match: Dict) -> Optional[float]:
+    """Cosine score of a retrieved page (fused matches keep it next to the RRF score)."""
+    if "dense_score" in match:
+        return match["dense_score"]
+    if "lexical_score" in match:
+        return None
+    return match.get("score")
+
+
+def link_target(match: Dict) -> Optional[tuple]:
+    """
+    (title, frontend URL) when the page is itself a link: a menu item, or a
+    page whose source has a manually verified frontend mapping.
+    """
+    metadata = match.get("metadata") or {}
+    source = metadata.get("source", "")
+    lines = [line.strip() for line in metadata.get("text", "").splitlines() if line.strip()]
+    if metadata.get("kind") == "menu" or (len(lines) == 2 and lines[1] == source):
+        # Menu items are indexed as "title\nurl"
+        title = lines[0] if lines else ""
+        return (title, source) if source and not source.startswith(BACKEND_API_PREFIX) else None
+    frontend_url = url_mapper.get_frontend_url(source)
+    if frontend_url is None and url_mapper.is_verified_frontend_url(source):
+        frontend_url = source
+    # Drupal pages have no separate title; their first line is body text
+    return ("", frontend_url) if frontend_url else None
+
+
+def _format_link(title: str, url: str) -> str:
+    return f"- [{title}]({url})" if title else f"- [{url}]({url})"
+
+
+def navigational_answer(query: str, detected_language: str, matches: List[Dict]) -> Optional[NavigationAnswer]:
+    """
+    The templated answer when the query is navigational, the top match is a
+    link page and its dense score clears NAV_MIN_SCORE; otherwise None.
+    """
+    if not NAV_FAST_PATH or not matches or not is_navigational(query):
+        return None
+    top_score = dense_score(matches[0])
+    target = link_target(matches[0])
+    if target is None or top_score is None or top_score < NAV_MIN_SCORE:
+        return None
+
+    used, links, extra = [matches[0]], [target[1]], []
+    for match in matches[1:]:
+        if len(extra) >= NAV_EXTRA_LINKS:
+            break
+        score, other = dense_score(match), link_target(match)
+        if other is None or score is None or score < NAV_MIN_SCORE or other[1] in links:
+            continue
+        used.append(match)
+        links.append(other[1])
+        extra.append(other)
+
+    lang = detected_language if detected_language in _HEADER else 'english'
+    answer = _HEADER[lang] + "\n\n" + _format_link(*target)
+    if extra:
+        answer += "\n\n" + _ALSO_SEE[lang] + "\n" + "\n".join(_format_link(*other) for other in extra)
+    return NavigationAnswer(answer, links, used, top_score)
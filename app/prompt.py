@@ -0,0 +1,231 @@
+import os
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+from app.tokens import count_tokens, truncate_tokens
+
+# Whole prompt (instructions + history + context + links + query), in tokens
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "1200"))
+# Upper bound for retrieved text inside that budget (replaces the old 5 x 500 character slices)
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "600"))
+# Context is the last section to give way, and never below this
+MIN_CONTEXT_TOKENS = int(os.getenv("MIN_CONTEXT_TOKENS", "200"))
+# Raw messages kept in the prompt; older turns are folded into the rolling summary
+HISTORY_RECENT_MESSAGES = int(os.getenv("HISTORY_RECENT_MESSAGES", "4"))
+HISTORY_MESSAGE_TOKENS = int(os.getenv("HISTORY_MESSAGE_TOKENS", "200"))
+HISTORY_SUMMARY_TOKENS = int(os.getenv("HISTORY_SUMMARY_TOKENS", "150"))
+MAX_LINKS = 5
+
+_TEMPLATES = {
+    'marathi': """
+तुम्ही पुणे महानगरपालिकेच्या वापरकर्त्यांसाठी एक सहाय्यक आहात.
+दिलेल्या दस्तऐवजांवर आणि वर्तमान संवादावर आधारित संक्षिप्त उत्तर द्या.
+योग्य ठिकाणी स्रोत मेटाडेटामधून क्लिक करण्यायोग्य लिंक्स समाविष्ट करा.
+वापरकर्त्यांना लिंक्स देताना नेहमी बॅकएंड API URL ऐवजी फ्रंटएंड URL प्राधान्य द्या.
+
+संवाद इतिहास:
+{history}
+
+संदर्भ:
+{context}
+
+वापरकर्ता: {query}
+उत्तर:
+{links}
+""",
+    'english': """
+You are a helpful assistant for Pune Municipal Corporation users.
+Answer concisely based on the provided documents and the current conversation.
+Include clickable links from source metadata wherever appropriate.
+Always prefer frontend URLs over backend API URLs when providing links to users.
+
+Chat History:
+{history}
+
+Context:
+{context}
+
+User: {query}
+Answer:
+{links}
+""",
+}
+
+_LINKS_HEADER = {'marathi': "उपयुक्त लिंक्स:", 'english': "Useful Links:"}
+
+SUMMARY_PROMPT = """
+Update the running summary of a conversation between a Pune Municipal Corporation
+user and an assistant. Keep what later questions may refer back to: the topics,
+services, places, names, numbers and links discussed, and what the user wants.
+Write at most {max_words} words, in the language the user writes in.
+
+Current summary:
+{summary}
+
+New messages:
+{messages}
+
+Updated summary:
+"""
+
+
+@dataclass
+class BuiltPrompt:
+    text: str
+    tokens: int
+    # Tokens per section, as rendered
+    sections: Dict[str, int] = field(default_factory=dict)
+    # Retrieved pages that made it into the context section
+    matches: List[dict] = field(default_factory=list)
+    links: List[str] = field(default_factory=list)
+    history: str = ""
+
+
+def _lines_cost(lines: List[str]) -> int:
+    return sum(count_tokens(line) + 1 for line in lines)
+
+
+def pack_context(matches, budget: int = CONTEXT_TOKEN_BUDGET):
+    """
+    Fill the context section with retrieved text in rank order until the
+    token budget is spent; the last page that doesn't fit is cut at a word
+    boundary. Returns (context text, matches that made it in).
+    """
+    blocks, packed, remaining = [], [], budget
+    for m in matches:
+        if remaining <= 0:
+            break
+        block = f"{m['metadata']['source']}:\n{m['metadata'].get('text', '')}"
+        cost = count_tokens(block) + 2
+        if cost > remaining:
+            if remaining < 40 and packed:
+                break
+            block = truncate_tokens(block, remaining - 2)
+            cost = remaining
+        blocks.append(block)
+        packed.append(m)
+        remaining -= cost
+    return "\n\n".join(blocks), packed
+
+
+class PromptBuilder:
+    """
+    Assembles the answer prompt within a token budget.
+
+    The instructions and the query are always kept. What is left of the budget
+    goes to the sections in priority order: retrieved context (up to
+    context_budget), the latest exchange, the rolling summary of older turns,
+    the links block and finally the earlier recent messages. When they don't
+    fit, the lowest-priority material is trimmed first (older messages, links
+    beyond three, a long summary); the context only shrinks, and never below
+    MIN_CONTEXT_TOKENS, before the rest is dropped.
+    """
+
+    def __init__(self, budget: int = PROMPT_TOKEN_BUDGET, context_budget: int = CONTEXT_TOKEN_BUDGET):
+        self.budget = budget
+        self.context_budget = context_budget
+
+    @staticmethod
+    def _render(language: str, query: str, history: str, context: str, links: List[str]) -> str:
+        links_md = ""
+        if links:
+            header = _LINKS_HEADER.get(language, _LINKS_HEADER['english'])
+            links_md = f"\n\n{header}\n" + "\n".join(f"- [{link}]({link})" for link in links)
+        template = _TEMPLATES.get(language, _TEMPLATES['english'])
+        return template.format(history=history, context=context, query=query, links=links_md)
+
+    @staticmethod
+    def _link_lines(links: List[str]) -> List[str]:
+        return [f"- [{link}]({link})" for link in links]
+
+    def build(self, query: str, language: str, matches, links: List[str], history=(), summary: str = "",
+              budget: int = None) -> BuiltPrompt:
+        budget = budget or self.budget
+        available = budget - count_tokens(self._render(language, query, "", "", []))
+
+        recent = [f"{m['role']}: {truncate_tokens(m['content'], HISTORY_MESSAGE_TOKENS)}"
+                  for m in list(history)[-HISTORY_RECENT_MESSAGES:]]
+        summary_line = f"summary: {summary}" if summary else ""
+        links = list(links[:MAX_LINKS])
+        blocks = [f"{m['metadata']['source']}:\n{m['metadata'].get('text', '')}" for m in matches]
+        context_tokens = min(self.context_budget, _lines_cost(blocks))
+
+        def others() -> int:
+            return _lines_cost(recent) + count_tokens(summary_line) + _lines_cost(self._link_lines(links)) + \
+                (count_tokens(_LINKS_HEADER['english']) + 2 if links else 0)
+
+        # Lowest priority first; each step gives back some tokens and returns False once exhausted
+        def drop_older_messages():
+            if len(recent) > 2:
+                del recent[0]
+                return True
+            return False
+
+        def drop_extra_links():
+            if len(links) > 3:
+                links.pop()
+                return True
+            return False
+
+        def shorten_summary():
+            nonlocal summary_line
+            if count_tokens(summary_line) > HISTORY_SUMMARY_TOKENS:
+                summary_line = truncate_tokens(summary_line, HISTORY_SUMMARY_TOKENS)
+                return True
+            return False
+
+        def shrink_context():
+            nonlocal context_tokens
+            target = max(MIN_CONTEXT_TOKENS, available - others())
+            if target < context_tokens:
+                context_tokens = target
+                return True
+            return False
+
+        def drop_latest_exchange():
+            if recent:
+                del recent[0]
+                return True
+            return False
+
+        def drop_summary():
+            nonlocal summary_line
+            if summary_line:
+                summary_line = ""
+                return True
+            return False
+
+        def drop_links():
+            if links:
+                links.pop()
+                return True
+            return False
+
+        steps = [drop_older_messages, drop_extra_links, shorten_summary, shrink_context,
+                 drop_links, drop_summary, drop_latest_exchange]
+        for step in steps:
+            while others() + context_tokens > available and step():
+                pass
+
+        context, packed = pack_context(matches, max(0, min(context_tokens, available - others())))
+        history_text = "\n".join(([summary_line] if summary_line else []) + recent)
+        text = self._render(language, query, history_text, context, links)
+        sections = {
+            "history": count_tokens(history_text),
+            "context": count_tokens(context),
+            "links": _lines_cost(self._link_lines(links)),
+        }
+        sections["instructions"] = count_tokens(text) - sum(sections.values())
+        return BuiltPrompt(text, count_tokens(text), sections, packed, links, history_text)
+
+
+def summary_messages(previous: str, messages) -> List[dict]:
+    """Chat messages asking the model to fold `messages` into the running summary."""
+    lines = "\n".join(f"{m['role']}: {truncate_tokens(m['content'], HISTORY_MESSAGE_TOKENS * 2)}" for m in messages)
+    prompt = SUMMARY_PROMPT.format(max_words=HISTORY_SUMMARY_TOKENS * 2 // 3, summary=previous or "(none)",
+                                   messages=lines)
+    return [{"role": "user", "content": prompt}]
+
+
+# Global instance
+prompt_builder = PromptBuilder()
@@ -0,0 +1,86 @@
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+
+class Provider:
+    """
+    A process-wide resource (API client, vector store) built on first use or
+    by warm_up(), never at import. `warm` is an optional extra step run on
+    the built value during warm-up (e.g. open the connection). Providers
+    marked preload=True are safe to build in the gunicorn master before fork.
+    """
+
+    def __init__(self, name: str, factory: Callable, warm: Callable = None, preload: bool = False):
+        self.name = name
+        self.factory = factory
+        self.warm = warm
+        self.preload = preload
+        self.load_seconds = None
+        self._value = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        if self._value is None:
+            with self._lock:
+                if self._value is None:
+                    start = time.perf_counter()
+                    self._value = self.factory()
+                    self.load_seconds = time.perf_counter() - start
+        return self._value
+
+    @property
+    def ready(self) -> bool:
+        return self._value is not None
+
+    def warm_up(self) -> None:
+        value = self.get()
+        if self.warm is not None:
+            self.warm(value)
+
+    def reset(self) -> None:
+        """Drop the value so the next get() builds a new one (e.g. clients inherited across fork)."""
+        with self._lock:
+            self._value = None
+
+
+_providers: Dict[str, Provider] = {}
+
+
+def register(name: str, factory: Callable, warm: Callable = None, preload: bool = False) -> Provider:
+    provider = _providers[name] = Provider(name, factory, warm, preload)
+    return provider
+
+
+def warm_up(names: Optional[List[str]] = None) -> Dict[str, float]:
+    """Build and warm the given providers (all by default); failures are logged, not raised."""
+    seconds = {}
+    for provider in list(_providers.values()):
+        if names is not None and provider.name not in names:
+            continue
+        start = time.perf_counter()
+        try:
+            provider.warm_up()
+        except Exception as e:
+            print(f"⚠️ Warm-up of {provider.name} failed: {e}")
+            continue
+        seconds[provider.name] = time.perf_counter() - start
+    return seconds
+
+
+def preload() -> None:
+    """Build the fork-safe providers only (no threads, no connections)."""
+    for provider in list(_providers.values()):
+        if provider.preload:
+            provider.get()
+
+
+def reset_after_fork() -> None:
+    for provider in list(_providers.values()):
+        if not provider.preload:
+            provider.reset()
+
+
+def status() -> Dict[str, dict]:
+    return {name: {"ready": p.ready, "load_seconds": round(p.load_seconds, 3) if p.load_seconds else None}
+            for name, p in _providers.items()}
@@ -1,346 +1,746 @@
-from app.embeddings import embed_text
-from app.vector_store import query_embedding
-from app.session_memory import add_to_history, get_history
-from app.url_mapper import url_mapper
-from openai import OpenAI
+from app.embeddings import embed_text, aembed_text, aembed_queries
+from app.retrieval import lexical_search, lexical_pages, retrieve, aretrieve, aretrieve_many
+from app.session_memory import add_to_history, get_history, get_summary, compact_history, session_store
+from app.url_mapper import url_mapper, BACKEND_API_PREFIX
+from app.answer_cache import answer_cache, is_context_dependent, CachedAnswer
+from app.language import detect_language
+from app.request_log import StageTimings, request_logger, utc_timestamp
+from app.navigation import NavigationAnswer, navigational_answer
+from app.reranker import reranker
+from app.metrics import ANSWERS, DEGRADED, ERRORS, LLM_TOKENS, PROMPT_TOKENS, count_errors, observe_timings
+from app.upstream import Deadline, Overloaded, acall, call, is_openai_error, limiters, with_backoff
+from app.providers import register
+from app.prompt import prompt_builder, summary_messages, BuiltPrompt, HISTORY_RECENT_MESSAGES, \
+    HISTORY_SUMMARY_TOKENS
+import asyncio
 import re
 import os
-from typing import List
-from datetime import datetime
-
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from collections import Counter
+from typing import List, Optional
+
+# Full prompts are several KB per request; REQUEST_LOG_PROMPTS=0 leaves them out
+LOG_PROMPTS = os.getenv("REQUEST_LOG_PROMPTS", "1") != "0"
+
+# Older turns are folded into a rolling per-session summary, this many messages at a time
+HISTORY_SUMMARIZATION = os.getenv("HISTORY_SUMMARIZATION", "1") != "0"
+HISTORY_SUMMARIZE_BATCH = int(os.getenv("HISTORY_SUMMARIZE_BATCH", "4"))
+# Summarizing starts at HISTORY_RECENT_MESSAGES + HISTORY_SUMMARIZE_BATCH messages: SESSION_MAX_TURNS >= 4 by default
+if HISTORY_SUMMARIZATION and session_store.max_messages < HISTORY_RECENT_MESSAGES + HISTORY_SUMMARIZE_BATCH:
+    raise ValueError(f"SESSION_MAX_TURNS keeps {session_store.max_messages} messages, history summarization needs "
+                     f"{HISTORY_RECENT_MESSAGES + HISTORY_SUMMARIZE_BATCH}: raise it or set HISTORY_SUMMARIZATION=0")
+
+# Concurrent completions per /chat/batch call
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "8"))
+
+# Built on first use (or at startup warm-up): importing openai alone takes ~0.5s.
+# Retries (429 backoff with jitter, deadlines) are handled by app.upstream, not the SDK.
+def _openai_client():
+    from openai import OpenAI
+    return OpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)
+
+def _async_openai_client():
+    from openai import AsyncOpenAI
+    return AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)
+
+openai_client = register("openai", _openai_client)
+async_openai_client = register("async_openai", _async_openai_client)
+
+# Retrieval-only answers, used when OpenAI is over its limits or failing
+_DEGRADED_HEADER = {
+    'english': "We're receiving a very large number of questions right now, so I can't write a full answer. "
+               "These pages should have the information you need:",
+    'marathi': "सध्या खूप जास्त प्रश्न येत असल्यामुळे मी सविस्तर उत्तर देऊ शकत नाही. "
+               "तुम्हाला हवी असलेली माहिती या पानांवर मिळू शकेल:",
+}
+_DEGRADED_NO_LINKS = {
+    'english': "We're receiving a very large number of questions right now. Please try again in a minute.",
+    'marathi': "सध्या खूप जास्त प्रश्न येत आहेत. कृपया थोड्या वेळाने पुन्हा प्रयत्न करा.",
+}
+
+def _related_links(matches) -> List[str]:
+    """Merge the frontend links resolved per page at ingestion, in match rank order."""
+    related_links = {}
+    for m in matches:
+        metadata = m['metadata']
+        links = metadata.get("links")
+        if links is None:
+            # Vector indexed before links were resolved at ingestion
+            links = url_mapper.resolve_links(metadata.get("related_links", ()))
+        related_links.update(dict.fromkeys(links))
+    return list(related_links)
+
+def _lexical_links(lexical_matches) -> List[str]:
+    """Frontend URLs of the top BM25 hits (replaces the old keyword scan over mapping URLs)."""
+    links = []
+    for m in lexical_matches[:5]:
+        source = m['metadata'].get('source', '')
+        frontend_url = url_mapper.get_frontend_url(source) or source
+        if frontend_url and not frontend_url.startswith(BACKEND_API_PREFIX):
+            links.append(frontend_url)
+    return links
+
+def _merge_links(related_links: List[str], keyword_links: List[str]):
+    seen = set(related_links)
+    additional_links = []
+    for frontend_url in keyword_links:
+        if frontend_url not in seen:
+            seen.add(frontend_url)
+            additional_links.append(frontend_url)
 
-def _ensure_logs_dir_exists() -> None:
-    logs_dir = os.path.join("logs")
-    try:
-        os.makedirs(logs_dir, exist_ok=True)
-    except Exception:
-        # Best-effort logging directory creation; ignore failures
-        pass
+    # Combine all links, prioritizing related_links
+    all_links = related_links + additional_links[:3]  # Limit additional links to 3
+    return additional_links, all_links
+
+def _request_record(query, session_id, detected_language, related_links, additional_links,
+                    built: BuiltPrompt) -> dict:
+    """Structured request log entry, built before calling the LLM."""
+    record = {
+        "ts": utc_timestamp(),
+        "session_id": session_id,
+        "language": detected_language,
+        "query": query,
+        "cache_hit": False,
+        "history": built.history,
+        "matches": [
+            {"score": m.get("score"), "dense_score": m.get("dense_score"), "lexical_score": m.get("lexical_score"),
+             "rerank_score": m.get("rerank_score"), "source": (m.get("metadata") or {}).get("source", "")}
+            for m in built.matches
+        ],
+        "related_links": related_links,
+        "additional_links": additional_links,
+        "links": built.links,
+        "model": "gpt-4o-mini",
+        "prompt_tokens": built.tokens,
+        "prompt_sections": built.sections,
+    }
+    if LOG_PROMPTS:
+        record["prompt"] = built.text
+    return record
 
+def _postprocess_answer(answer: str) -> str:
+    # Convert any remaining backend URLs in the answer to frontend URLs
+    answer = url_mapper.convert_urls_in_text(answer)
 
-def _append_log_entry(text: str) -> None:
+    # Fix broken markdown links caused by punctuation right after the URL
+    return re.sub(r'\]\((https?://[^\s)]+)([).,])\)', r'](\1)\2)', answer)
+
+def _log_request(record: dict, answer: str, timings: StageTimings, usage=None) -> None:
+    # Hand off to the background writer; never blocks or fails the request
+    record["answer"] = answer
+    record["timings_ms"] = timings.as_dict()
+    ANSWERS.inc(record.setdefault("route", "llm"))
+    observe_timings(timings.stages, time.perf_counter() - timings.started)
+    if "prompt_tokens" in record:
+        PROMPT_TOKENS.observe(record["prompt_tokens"])
+    if usage is not None:
+        # What the API billed, next to our own count
+        record["usage"] = {"prompt_tokens": usage.prompt_tokens, "completion_tokens": usage.completion_tokens}
+        LLM_TOKENS.inc("prompt", amount=usage.prompt_tokens)
+        LLM_TOKENS.inc("completion", amount=usage.completion_tokens)
+    request_logger.log(record)
+
+def _build_prompt(query: str, session_id: str, detected_language: str, matches, lexical_matches, chat_history,
+                  timings: StageTimings):
+    """Links, then the token-budgeted prompt. Returns (built prompt, log record)."""
+    with timings.stage("links"):
+        related_links = _related_links(matches)
+        additional_links, all_links = _merge_links(related_links, _lexical_links(lexical_matches))
+    with timings.stage("prompt"):
+        built = prompt_builder.build(query, detected_language, matches, all_links,
+                                     history=chat_history, summary=get_summary(session_id))
+    record = _request_record(query, session_id, detected_language, related_links, additional_links, built)
+    return built, record
+
+_summary_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="summary")
+_summarizing = set()
+_summarizing_lock = threading.Lock()
+
+def _summarize_history(session_id: str) -> None:
+    """Fold the messages before the recent window into the session's rolling summary."""
     try:
-        _ensure_logs_dir_exists()
-        log_path = os.path.join("logs", "logs.txt")
-        with open(log_path, "a", encoding="utf-8") as log_file:
-            log_file.write(text)
-            if not text.endswith("\n"):
-                log_file.write("\n")
-            log_file.write("\n")
-    except Exception:
-        # Avoid breaking the request on logging errors
-        pass
-
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
-def detect_language(query: str) -> str:
+        older = get_history(session_id)[:-HISTORY_RECENT_MESSAGES]
+        if len(older) < HISTORY_SUMMARIZE_BATCH:
+            return
+        messages = summary_messages(get_summary(session_id), older)
+        with count_errors("openai"):
+            # Shares the OpenAI concurrency limit with answers
+            response = call("openai", lambda: openai_client.get().chat.completions.create(
+                model="gpt-4o-mini",
+                messages=messages,
+                temperature=0.2,
+                max_tokens=HISTORY_SUMMARY_TOKENS * 2,
+            ), Deadline())
+        summary = response.choices[0].message.content.strip()
+        if summary:
+            compact_history(session_id, summary, older[-1]["id"])
+    except Exception as e:
+        # Keep the raw messages; the prompt builder trims them meanwhile
+        print(f"⚠️ History summarization failed for {session_id}: {e}")
+    finally:
+        with _summarizing_lock:
+            _summarizing.discard(session_id)
+
+def _maybe_summarize(session_id: str) -> None:
+    """Summarize in the background once enough turns have scrolled out of the recent window."""
+    if not HISTORY_SUMMARIZATION:
+        return
+    if len(get_history(session_id)) < HISTORY_RECENT_MESSAGES + HISTORY_SUMMARIZE_BATCH:
+        return
+    with _summarizing_lock:
+        if session_id in _summarizing:
+            return
+        _summarizing.add(session_id)
+    _summary_executor.submit(_summarize_history, session_id)
+
+def _degraded_answer(detected_language: str, links: List[str], sources: List[str]) -> str:
+    """Sources and precomputed links of the retrieved pages, without an LLM call."""
+    urls = []
+    for url in list(links) + list(sources):
+        url = url_mapper.get_frontend_url(url) or url
+        if url and not url.startswith(BACKEND_API_PREFIX) and url not in urls:
+            urls.append(url)
+    if not urls:
+        return _DEGRADED_NO_LINKS.get(detected_language, _DEGRADED_NO_LINKS['english'])
+    header = _DEGRADED_HEADER.get(detected_language, _DEGRADED_HEADER['english'])
+    return header + "\n\n" + "\n".join(f"- [{url}]({url})" for url in urls[:5])
+
+def _llm_unavailable(error) -> bool:
+    """Over our limits, out of retries/time, or an OpenAI API error: answer with links instead."""
+    return isinstance(error, Overloaded) or is_openai_error(error)
+
+def _degrade(record: dict, timings: StageTimings, detected_language: str, links, sources, error) -> str:
+    """Answer with links only; not cached and not added to the history."""
+    reason = error.reason if isinstance(error, Overloaded) else "openai_error"
+    print(f"⚠️ Answering with links only: {error}")
+    DEGRADED.inc(reason)
+    record["degraded"] = reason
+    record["route"] = "links_only"
+    answer = _degraded_answer(detected_language, links, sources)
+    _log_request(record, answer, timings)
+    return answer
+
+def _cache_lookup(query: str, query_emb, detected_language: str, chat_history):
     """
-    Detect if the query is in English or Marathi using LLM for better accuracy.
-    Returns 'english' or 'marathi'
+    Returns (cached answer or None, whether a fresh answer may be cached).
+    Context-dependent follow-ups bypass the cache entirely, and only answers
+    produced without any history are stored.
     """
-    # Simple heuristic-based language detection for Devanagari
-    # Count Devanagari characters vs Latin characters
-    
-    # Devanagari Unicode range: 0x0900-0x097F
-    devanagari_chars = sum(1 for char in query if '\u0900' <= char <= '\u097F')
-    
-    # Latin characters (basic English)
-    latin_chars = sum(1 for char in query if char.isalpha() and ord(char) < 128)
-    
-    # If more Devanagari characters, it's definitely Marathi
-    if devanagari_chars > latin_chars:
-        return 'marathi'
-    
-    # For Latin script text, run lightweight rule checks before any LLM call
-    query_lower = query.lower()
-
-    marathi_indicators = {
-        'kasa', 'kase', 'kay', 'kaay', 'kuthe', 'kadhi', 'kiti', 'konala', 'kona',
-        'milwaycha', 'milwayche', 'milwaychi', 'karaycha', 'karayche', 'karaychi',
-        'ghaycha', 'ghayche', 'ghaychi', 'deyacha', 'deyache', 'deyachi',
-        'bharaycha', 'bharayche', 'bharaychi', 'mahnaycha', 'mahnayche', 'mahnaychi',
-        'sangaycha', 'sangayche', 'sangaychi', 'hotay', 'hoti', 'hota', 'hotat',
-        'aadhaar', 'mahapalika', 'nagar', 'palika',
+    if is_context_dependent(query, chat_history):
+        return None, False
+    return answer_cache.lookup(query_emb, detected_language), not chat_history
+
+def _cache_hit_record(query: str, session_id: str, detected_language: str, cached) -> dict:
+    return {
+        "ts": utc_timestamp(),
+        "session_id": session_id,
+        "language": detected_language,
+        "query": query,
+        "cache_hit": True,
+        "route": "cache",
+        "sources": list(cached.sources),
+        "cache": answer_cache.stats(),
     }
 
-    words_in_query = query_lower.split()
-    marathi_indicator_count = 0
-    for word in words_in_query:
-        clean_word = ''.join(c for c in word if c.isalnum())
-        if clean_word in marathi_indicators:
-            marathi_indicator_count += 1
-
-    marathi_patterns = [
-        r'\b(kasa|kase|kay|kaay|kuthe|kadhi|kiti|konala|kona)\s+\w+',
-        r'\w+\s+(cha|che|chi|ne|la|na|ta|te|ti|sa|se|si)\b',
-        r'\b(milwaycha|milwayche|milwaychi|karaycha|karayche|karaychi)\b',
-        r'\b(ghaycha|ghayche|ghaychi|deyacha|deyache|deyachi)\b',
-        r'\b(bharaycha|bharayche|bharaychi|mahnaycha|mahnayche|mahnaychi)\b',
-        r'\w+\s+(kasa|kase|kay|kaay|kuthe|kadhi|kiti|konala|kona)\s+\w+',
-    ]
-    pattern_matches = 0
-    for pattern in marathi_patterns:
-        if re.search(pattern, query_lower):
-            pattern_matches += 1
-
-    # If there are no Marathi indicators or patterns at all, treat as English
-    if marathi_indicator_count == 0 and pattern_matches == 0:
-        return 'english'
-
-    # Strong Marathi signals: classify as Marathi without LLM
-    if marathi_indicator_count >= 2 or pattern_matches > 0:
-        return 'marathi'
-
-    # Ambiguous case (e.g., exactly one indicator): use LLM as a tie-breaker
-    try:
-        language_detection_prompt = f"""
-You are a language detection expert. Analyze the following text and determine if it's written in English or Romanized Marathi (Marathi words written using English/Latin script).
-
-Text to analyze: "{query}"
+def _navigation_record(query: str, session_id: str, detected_language: str, navigation: NavigationAnswer) -> dict:
+    return {
+        "ts": utc_timestamp(),
+        "session_id": session_id,
+        "language": detected_language,
+        "query": query,
+        "cache_hit": False,
+        "route": "navigation",
+        "navigation_score": navigation.score,
+        "matches": [{"score": m.get("score"), "dense_score": m.get("dense_score"),
+                     "source": (m.get("metadata") or {}).get("source", "")} for m in navigation.matches],
+        "links": navigation.links,
+    }
 
-Respond with only one word: "english" or "marathi"
-"""
+def generate_answer(query: str, session_id: str, detected_language: Optional[str] = None):
+    timings = StageTimings()
+    deadline = Deadline()
 
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": language_detection_prompt}],
-            temperature=0.1,
-            max_tokens=10,
-        )
+    # Detect language of the query (once per request; callers may pass it in)
+    if detected_language is None:
+        with timings.stage("language"):
+            detected_language = detect_language(query)
+    
+    with timings.stage("embed"):
+        query_emb = embed_text(query)
 
-        detected_lang = response.choices[0].message.content.strip().lower()
+    # Get recent chat history
+    chat_history = get_history(session_id)
 
-        # Strict normalization of response
-        if detected_lang in {"marathi", "romanized marathi"}:
-            return 'marathi'
-        if detected_lang == 'english':
-            return 'english'
-        # Default to English if unclear in ambiguous scenarios
-        return 'english'
+    with timings.stage("cache"):
+        cached, cacheable = _cache_lookup(query, query_emb, detected_language, chat_history)
+    if cached is not None:
+        add_to_history(session_id, "user", query)
+        add_to_history(session_id, "assistant", cached.answer)
+        _maybe_summarize(session_id)
+        _log_request(_cache_hit_record(query, session_id, detected_language, cached), cached.answer, timings)
+        return cached.answer, list(cached.sources)
+
+    with timings.stage("lexical"):
+        lexical_matches = lexical_search(query)
+    with timings.stage("vector_query"):
+        try:
+            matches, vector_failed = retrieve(query_emb, lexical_matches, top_k=reranker.depth(5),
+                                              deadline=deadline), False
+        except Exception as e:
+            # BM25 alone still gives the LLM something to answer from
+            print(f"⚠️ Vector query failed, using lexical matches only: {e}")
+            matches, vector_failed = lexical_pages(lexical_matches), True
+
+    # "Where is the link for X": answered from the top link page, no completion
+    navigation = None if vector_failed else navigational_answer(query, detected_language, matches)
+    if navigation is not None:
+        sources = [m["metadata"]["source"] for m in navigation.matches]
+        add_to_history(session_id, "user", query)
+        add_to_history(session_id, "assistant", navigation.answer)
+        _maybe_summarize(session_id)
+        if cacheable:
+            answer_cache.store(query_emb, detected_language, navigation.answer, sources)
+        _log_request(_navigation_record(query, session_id, detected_language, navigation), navigation.answer,
+                     timings)
+        return navigation.answer, sources
+
+    if reranker.enabled and not vector_failed:
+        with timings.stage("rerank"):
+            matches = reranker.rerank(query, matches)
+
+    built, record = _build_prompt(query, session_id, detected_language, matches, lexical_matches, chat_history,
+                                  timings)
+    if vector_failed:
+        record["degraded"] = "vector_store"
+    sources = [m["metadata"]["source"] for m in built.matches]
 
+    try:
+        with timings.stage("llm"), count_errors("openai"):
+            # Identical prompts in flight at the same time share one completion
+            response = call("openai", lambda: openai_client.get().chat.completions.create(
+                model="gpt-4o-mini",
+                messages=[{"role": "user", "content": built.text}],
+                temperature=0.3,
+                timeout=deadline.remaining(),
+            ), deadline, key=built.text)
     except Exception as e:
-        # If LLM fails, use fallback
-        print(f"LLM language detection failed: {e}")
-        return fallback_language_detection(query)
+        if not _llm_unavailable(e):
+            raise
+        return _degrade(record, timings, detected_language, built.links, sources, e), sources
+
+    with timings.stage("postprocess"):
+        answer = _postprocess_answer(response.choices[0].message.content.strip())
 
-def fallback_language_detection(query: str) -> str:
+    add_to_history(session_id, "user", query)
+    add_to_history(session_id, "assistant", answer)
+    _maybe_summarize(session_id)
+
+    if cacheable:
+        answer_cache.store(query_emb, detected_language, answer, sources)
+
+    _log_request(record, answer, timings, getattr(response, "usage", None))
+
+    return answer, sources
+
+@dataclass
+class _PreparedRequest:
+    query: str
+    session_id: str
+    detected_language: str
+    timings: StageTimings
+    deadline: Deadline
+    query_emb: Optional[list] = None
+    chat_history: list = field(default_factory=list)
+    lexical_matches: list = field(default_factory=list)
+    cached: Optional[CachedAnswer] = None
+    cacheable: bool = False
+    navigation: Optional[NavigationAnswer] = None
+    matches: list = field(default_factory=list)
+    links: list = field(default_factory=list)
+    prompt: str = ""
+    record: Optional[dict] = None
+
+    @property
+    def sources(self) -> List[str]:
+        if self.cached is not None:
+            return list(self.cached.sources)
+        return [m["metadata"]["source"] for m in self.matches]
+
+    @property
+    def direct_answer(self) -> Optional[str]:
+        """The answer when no completion is needed (answer cache or navigational fast path)."""
+        if self.cached is not None:
+            return self.cached.answer
+        if self.navigation is not None:
+            return self.navigation.answer
+        return None
+
+# The stages of _aprepare, split so the batch path can run embedding and retrieval for many requests at once
+
+def _new_request(query: str, session_id: str, detected_language: Optional[str],
+                 timings: StageTimings = None) -> _PreparedRequest:
+    timings = timings or StageTimings()
+    if detected_language is None:
+        with timings.stage("language"):
+            detected_language = detect_language(query)
+    return _PreparedRequest(query, session_id, detected_language, timings, Deadline())
+
+def _lexical(prepared: _PreparedRequest) -> None:
+    # BM25 lookup is well under a millisecond, no need to leave the event loop
+    with prepared.timings.stage("lexical"):
+        prepared.lexical_matches = lexical_search(prepared.query)
+
+def _check_cache(prepared: _PreparedRequest) -> bool:
+    """History + answer cache lookup; True when the answer is cached."""
+    prepared.chat_history = get_history(prepared.session_id)
+    with prepared.timings.stage("cache"):
+        prepared.cached, prepared.cacheable = _cache_lookup(prepared.query, prepared.query_emb,
+                                                            prepared.detected_language, prepared.chat_history)
+    if prepared.cached is not None:
+        prepared.record = _cache_hit_record(prepared.query, prepared.session_id, prepared.detected_language,
+                                            prepared.cached)
+        return True
+    return False
+
+def _navigate(prepared: _PreparedRequest, matches) -> bool:
+    """True when the navigational fast path answers the request from the retrieved pages."""
+    prepared.navigation = navigational_answer(prepared.query, prepared.detected_language, matches)
+    if prepared.navigation is None:
+        return False
+    prepared.matches, prepared.links = prepared.navigation.matches, prepared.navigation.links
+    prepared.record = _navigation_record(prepared.query, prepared.session_id, prepared.detected_language,
+                                         prepared.navigation)
+    return True
+
+def _use_matches(prepared: _PreparedRequest, matches, error: Optional[BaseException] = None) -> None:
+    """Build the prompt from the (reranked) pages, or BM25 alone when the vector query failed."""
+    if error is not None:
+        # BM25 alone still gives the LLM something to answer from
+        print(f"⚠️ Vector query failed, using lexical matches only: {error}")
+        matches = lexical_pages(prepared.lexical_matches)
+    built, prepared.record = _build_prompt(prepared.query, prepared.session_id, prepared.detected_language,
+                                           matches, prepared.lexical_matches, prepared.chat_history,
+                                           prepared.timings)
+    if error is not None:
+        prepared.record["degraded"] = "vector_store"
+    prepared.matches, prepared.links, prepared.prompt = built.matches, built.links, built.text
+
+async def _aprepare(query: str, session_id: str, detected_language: Optional[str] = None) -> _PreparedRequest:
     """
-    Fallback rule-based language detection when LLM is unavailable.
+    Everything up to the LLM call. Language detection and the BM25 lookup run
+    on the loop while the embedding runs on its executor; then cache lookup,
+    retrieval, links and prompt.
     """
-    query_lower = query.lower()
-    
-    # Marathi-specific words that are strong indicators
-    marathi_indicators = {
-        'kasa', 'kase', 'kay', 'kaay', 'kuthe', 'kadhi', 'kiti', 'konala', 'kona',
-        'milwaycha', 'milwayche', 'milwaychi', 'karaycha', 'karayche', 'karaychi',
-        'ghaycha', 'ghayche', 'ghaychi', 'deyacha', 'deyache', 'deyachi',
-        'bharaycha', 'bharayche', 'bharaychi', 'mahnaycha', 'mahnayche', 'mahnaychi',
-        'sangaycha', 'sangayche', 'sangaychi', 'hotay', 'hoti', 'hota', 'hotat',
-        'aadhaar', 'mahapalika', 'nagar', 'palika',
-    }
-    
-    # Count strong Marathi indicators in the query
-    marathi_indicator_count = 0
-    words_in_query = query_lower.split()
-    
-    for word in words_in_query:
-        clean_word = ''.join(c for c in word if c.isalnum())
-        if clean_word in marathi_indicators:
-            marathi_indicator_count += 1
-    
-    # If we find strong Marathi indicators, treat as Marathi
-    if marathi_indicator_count > 0:
-        return 'marathi'
-    
-    # Check for common Marathi sentence patterns
-    marathi_patterns = [
-        r'\b(kasa|kase|kay|kaay|kuthe|kadhi|kiti|konala|kona)\s+\w+',
-        r'\w+\s+(cha|che|chi|ne|la|na|ta|te|ti|sa|se|si)\b',
-        r'\b(milwaycha|milwayche|milwaychi|karaycha|karayche|karaychi)\b',
-        r'\b(ghaycha|ghayche|ghaychi|deyacha|deyache|deyachi)\b',
-        r'\b(bharaycha|bharayche|bharaychi|mahnaycha|mahnayche|mahnaychi)\b',
-        r'\w+\s+(kasa|kase|kay|kaay|kuthe|kadhi|kiti|konala|kona)\s+\w+',
-    ]
-    
-    import re
-    pattern_matches = 0
-    for pattern in marathi_patterns:
-        if re.search(pattern, query_lower):
-            pattern_matches += 1
-    
-    # If we find Marathi patterns, treat as Marathi
-    if pattern_matches > 0:
-        return 'marathi'
-    
-    # Default to English if no clear Marathi indicators
-    return 'english'
-
-def generate_answer(query: str, session_id: str):
-    # Detect language of the query
-    detected_language = detect_language(query)
-    
-    query_emb = embed_text(query)
-    matches = query_embedding(query_emb, top_k=5)
-
-    # Compose context text from matched docs
-    docs_context = "\n\n".join(
-        f"{m['metadata']['source']}:\n{m['metadata'].get('text', '')[:500]}" for m in matches
-    )
+    timings = StageTimings()
+    embedding = asyncio.ensure_future(timings.timed("embed", aembed_text(query)))
+    try:
+        prepared = _new_request(query, session_id, detected_language, timings)
+        _lexical(prepared)
+    finally:
+        # Errors above still wait for (and surface) the embedding task
+        query_emb = await embedding
+    prepared.query_emb = query_emb
+    if _check_cache(prepared):
+        return prepared
+    try:
+        matches = await prepared.timings.timed(
+            "vector_query", aretrieve(prepared.query_emb, prepared.lexical_matches, top_k=reranker.depth(5),
+                                      deadline=prepared.deadline))
+    except Exception as e:
+        _use_matches(prepared, None, e)
+        return prepared
+    if not _navigate(prepared, matches):
+        if reranker.enabled:
+            matches = await prepared.timings.timed("rerank", reranker.arerank(query, matches))
+        _use_matches(prepared, matches)
+    return prepared
+
+def _finish(query: str, session_id: str, prepared: _PreparedRequest, answer: str, usage=None) -> None:
+    add_to_history(session_id, "user", query)
+    add_to_history(session_id, "assistant", answer)
+    _maybe_summarize(session_id)
+
+    if prepared.cacheable:
+        answer_cache.store(prepared.query_emb, prepared.detected_language, answer, prepared.sources)
+
+    _log_request(prepared.record, answer, prepared.timings, usage)
+
+async def _acomplete(prepared: _PreparedRequest):
+    """LLM call (unless cached or navigational), postprocessing, history and cache; returns (answer, sources)."""
+    usage = None
+    answer = prepared.direct_answer
+    if answer is None:
+        deadline = prepared.deadline
+        try:
+            with count_errors("openai"):
+                # Identical prompts in flight at the same time share one completion
+                completion = lambda: async_openai_client.get().chat.completions.create(
+                    model="gpt-4o-mini",
+                    messages=[{"role": "user", "content": prepared.prompt}],
+                    temperature=0.3,
+                    timeout=deadline.remaining(),
+                )
+                response = await prepared.timings.timed(
+                    "llm", acall("openai", completion, deadline, key=prepared.prompt))
+        except Exception as e:
+            if not _llm_unavailable(e):
+                raise
+            answer = _degrade(prepared.record, prepared.timings, prepared.detected_language, prepared.links,
+                              prepared.sources, e)
+            return answer, prepared.sources
+        with prepared.timings.stage("postprocess"):
+            answer = _postprocess_answer(response.choices[0].message.content.strip())
+        usage = getattr(response, "usage", None)
+
+    _finish(prepared.query, prepared.session_id, prepared, answer, usage)
+
+    return answer, prepared.sources
+
+async def agenerate_answer(query: str, session_id: str, detected_language: Optional[str] = None):
+    """
+    Async variant of generate_answer. The embedding goes through the batching
+    embedding service, the vector query runs on its own pool and the
+    completion goes through AsyncOpenAI.
+    """
+    return await _acomplete(await _aprepare(query, session_id, detected_language))
+
+@dataclass
+class BatchResult:
+    session_id: str
+    detected_language: Optional[str] = None
+    answer: Optional[str] = None
+    sources: List[str] = field(default_factory=list)
+    error: Optional[str] = None
+
+async def _agenerate_wave(items, results, concurrency: int) -> None:
+    """One request per session: embed together, retrieve together, complete concurrently."""
+    prepared = {}
+    for i, (query, session_id, language) in items:
+        try:
+            prepared[i] = _new_request(query, session_id, language)
+        except Exception as e:
+            results[i].error = str(e) or type(e).__name__
+
+    # One encode call for every query that is not in the embedding cache; BM25 runs meanwhile
+    if prepared:
+        start = time.perf_counter()
+        embedding = asyncio.ensure_future(aembed_queries([p.query for p in prepared.values()]))
+        for i, p in list(prepared.items()):
+            try:
+                _lexical(p)
+            except Exception as e:
+                results[i].error = str(e) or type(e).__name__
+                del prepared[i]
+        try:
+            vectors = await embedding
+        except Exception as e:
+            for i in prepared:
+                results[i].error = f"embedding failed: {e}"
+            return
+        elapsed = time.perf_counter() - start
+        for p, vector in zip(prepared.values(), vectors):
+            p.query_emb = vector
+            p.timings.add("embed", elapsed)
+
+    pending = {}
+    for i, p in prepared.items():
+        results[i].detected_language = p.detected_language
+        try:
+            if not _check_cache(p):
+                pending[i] = p
+        except Exception as e:
+            results[i].error = str(e) or type(e).__name__
+
+    # Vector queries together: one matmul for the local index, concurrent calls for Pinecone
+    if pending:
+        start = time.perf_counter()
+        retrieved = await aretrieve_many([p.query_emb for p in pending.values()],
+                                         [p.lexical_matches for p in pending.values()], top_k=reranker.depth(5),
+                                         deadline=next(iter(pending.values())).deadline)
+        elapsed = time.perf_counter() - start
+        to_rerank = {}
+        for (i, p), matches in zip(pending.items(), retrieved):
+            p.timings.add("vector_query", elapsed)
+            try:
+                if isinstance(matches, BaseException):
+                    _use_matches(p, None, matches)
+                elif not _navigate(p, matches):
+                    to_rerank[i] = matches
+            except Exception as e:
+                results[i].error = str(e) or type(e).__name__
+
+        # Every (query, page) pair of the wave in one cross-encoder call
+        if to_rerank and reranker.enabled:
+            start = time.perf_counter()
+            reranked = await reranker.arerank_many([pending[i].query for i in to_rerank], list(to_rerank.values()))
+            elapsed = time.perf_counter() - start
+            to_rerank = dict(zip(to_rerank, reranked))
+            for i in to_rerank:
+                pending[i].timings.add("rerank", elapsed)
+        for i, matches in to_rerank.items():
+            try:
+                _use_matches(pending[i], matches)
+            except Exception as e:
+                results[i].error = str(e) or type(e).__name__
+
+    # Completions with a bounded fan-out (on top of the global OpenAI limiter)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def complete(i, p):
+        async with semaphore:
+            try:
+                results[i].answer, results[i].sources = await _acomplete(p)
+            except Exception as e:
+                print(f"❌ Batch item {i} failed: {e}")
+                results[i].error = str(e) or type(e).__name__
+
+    await asyncio.gather(*(complete(i, p) for i, p in prepared.items() if results[i].error is None))
+
+async def agenerate_answers(items, concurrency: int = BATCH_LLM_CONCURRENCY) -> List[BatchResult]:
+    """
+    Many (query, session_id[, detected_language]) requests in one call; results
+    in input order, with errors per item. Several messages of one session are
+    answered in order, each seeing the previous answer in its history.
+    """
+    items = [(item[0], item[1], item[2] if len(item) > 2 else None) for item in items]
+    results = [BatchResult(session_id) for _, session_id, _ in items]
+    waves, seen = [], Counter()
+    for i, item in enumerate(items):
+        turn = seen[item[1]]
+        seen[item[1]] += 1
+        if turn == len(waves):
+            waves.append([])
+        waves[turn].append((i, item))
+    for wave in waves:
+        await _agenerate_wave(wave, results, concurrency)
+    return results
+
+class StreamingPostprocessor:
+    """
+    Applies _postprocess_answer incrementally to a token stream.
 
-    # Extract all related_links from matched docs metadata and convert to frontend URLs
-    related_links = []
-    for m in matches:
-        links = m['metadata'].get("related_links", [])
-        for link in links:
-            # Convert backend URLs to frontend URLs
-            frontend_url = url_mapper.get_frontend_url(link)
-            if frontend_url:
-                if frontend_url not in related_links:
-                    related_links.append(frontend_url)
-            else:
-                # If no mapping found, keep the original URL if it's not a backend API URL
-                if not link.startswith("https://webadmin.pmc.gov.in/api/"):
-                    if link not in related_links:
-                        related_links.append(link)
-
-    # Search for additional relevant URLs based on query keywords
-    query_keywords = extract_keywords(query)
-    additional_links = []
-    for keyword in query_keywords:
-        keyword_mappings = url_mapper.search_mappings_by_keyword(keyword)
-        for mapping in keyword_mappings[:2]:  # Limit to 2 results per keyword
-            frontend_url = mapping['frontend_url']
-            if frontend_url not in related_links and frontend_url not in additional_links:
-                additional_links.append(frontend_url)
-    
-    # Combine all links, prioritizing related_links
-    all_links = related_links + additional_links[:3]  # Limit additional links to 3
+    URLs and the broken-markdown-link pattern never contain whitespace, so the
+    text can be rewritten piecewise as long as every piece ends right before a
+    whitespace run. The trailing whitespace + partial word (which may be the
+    start of a URL) is held back until more text arrives.
+    """
 
-    # Prepare clickable links markdown block if any links exist
-    links_md = ""
-    if all_links:
-        top_links = all_links[:5]
-        if detected_language == 'marathi':
-            links_md = "\n\nउपयुक्त लिंक्स:\n" + "\n".join(f"- [{link}]({link})" for link in top_links)
+    _TAIL = re.compile(r'\s+\S*$')
+
+    def __init__(self, max_pending: int = 4096):
+        self.max_pending = max_pending
+        self._pending = ""
+        self._started = False
+        self.parts = []
+
+    def _emit(self, text: str) -> str:
+        if not self._started:
+            text = text.lstrip()
+            if not text:
+                return ""
+            self._started = True
+        text = _postprocess_answer(text)
+        self.parts.append(text)
+        return text
+
+    def feed(self, chunk: str) -> str:
+        self._pending += chunk
+        match = self._TAIL.search(self._pending)
+        if match is None:
+            # No whitespace yet; only give up waiting on runaway tokens
+            if len(self._pending) <= self.max_pending:
+                return ""
+            ready, self._pending = self._pending, ""
         else:
-            links_md = "\n\nUseful Links:\n" + "\n".join(f"- [{link}]({link})" for link in top_links)
-
-    # Get recent chat history
-    chat_history = get_history(session_id)
-    history_context = "\n".join(f"{msg['role']}: {msg['content']}" for msg in chat_history[-5:])
-
-    # Language-specific prompts
-    if detected_language == 'marathi':
-        prompt = f"""
-तुम्ही पुणे महानगरपालिकेच्या वापरकर्त्यांसाठी एक सहाय्यक आहात.
-दिलेल्या दस्तऐवजांवर आणि वर्तमान संवादावर आधारित संक्षिप्त उत्तर द्या.
-योग्य ठिकाणी स्रोत मेटाडेटामधून क्लिक करण्यायोग्य लिंक्स समाविष्ट करा.
-वापरकर्त्यांना लिंक्स देताना नेहमी बॅकएंड API URL ऐवजी फ्रंटएंड URL प्राधान्य द्या.
-
-संवाद इतिहास:
-{history_context}
-
-संदर्भ:
-{docs_context}
-
-वापरकर्ता: {query}
-उत्तर:
-{links_md}
-"""
-    else:
-        prompt = f"""
-You are a helpful assistant for Pune Municipal Corporation users.
-Answer concisely based on the provided documents and the current conversation.
-Include clickable links from source metadata wherever appropriate.
-Always prefer frontend URLs over backend API URLs when providing links to users.
-
-Chat History:
-{history_context}
-
-Context:
-{docs_context}
-
-User: {query}
-Answer:
-{links_md}
-"""
-
-    # Build detailed log before calling the LLM
-    try:
-        matches_log_lines = []
-        for idx, m in enumerate(matches, start=1):
-            meta = m.get("metadata", {}) or {}
-            source = meta.get("source", "")
-            text_snippet = (meta.get("text", "") or "")[:500]
-            score = m.get("score", None)
-            matches_log_lines.append(
-                f"  {idx}. score={score} source={source}\n     snippet={text_snippet}"
-            )
-
-        matches_section = "\n".join(matches_log_lines) if matches_log_lines else "  (none)"
-
-        detailed_log = (
-            f"==== Chat Request Log ====\n"
-            f"Time: {datetime.utcnow().isoformat()}Z\n"
-            f"Session ID: {session_id}\n"
-            f"Detected Language: {detected_language}\n"
-            f"User Query: {query}\n"
-            f"\nRecent History Used (last 5):\n{history_context}\n"
-            f"\nRetrieved Matches ({len(matches)}):\n{matches_section}\n"
-            f"\nRelated Links ({len(related_links)}): {related_links}\n"
-            f"Additional Links from Keywords ({len(additional_links)}): {additional_links}\n"
-            f"All Links Used in Prompt ({len(all_links)}): {all_links}\n"
-            f"\nPrompt sent to OpenAI (model=gpt-4o-mini):\n{prompt}"
-        )
-    except Exception:
-        detailed_log = None
-
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.3,
-    )
-
-    answer = response.choices[0].message.content.strip()
+            ready, self._pending = self._pending[:match.start()], self._pending[match.start():]
+        return self._emit(ready) if ready else ""
 
-    # Convert any remaining backend URLs in the answer to frontend URLs
-    answer = url_mapper.convert_urls_in_text(answer)
+    def flush(self) -> str:
+        ready, self._pending = self._pending.rstrip(), ""
+        return self._emit(ready) if ready else ""
 
-    # Fix broken markdown links caused by punctuation right after the URL
-    answer = re.sub(r'\]\((https?://[^\s)]+)([).,])\)', r'](\1)\2)', answer)
-
-    add_to_history(session_id, "user", query)
-    add_to_history(session_id, "assistant", answer)
+    @property
+    def text(self) -> str:
+        return "".join(self.parts)
 
-    # Append answer to the detailed log and write to file
+async def astream_answer(query: str, session_id: str, detected_language: Optional[str] = None):
+    """
+    Streaming variant of agenerate_answer. Yields (event, data) pairs:
+    one "meta" event with sources and detected language, then "token" events
+    as the completion arrives, then "done" (or "error").
+    """
+    error_event = {"message": "Sorry, there was an error processing your request. Please try again."}
     try:
-        if detailed_log is not None:
-            full_log = detailed_log + f"\n\nLLM Answer:\n{answer}\n============================="
-            _append_log_entry(full_log)
-    except Exception:
-        pass
-
-    return answer, [m["metadata"]["source"] for m in matches]
-
-def extract_keywords(query: str) -> List[str]:
-    """Extract relevant keywords from the query for URL matching."""
-    # Remove common stop words and extract meaningful keywords
-    stop_words = {
-        'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by',
-        'is', 'are', 'was', 'were', 'be', 'been', 'being', 'have', 'has', 'had', 'do', 'does', 'did',
-        'will', 'would', 'could', 'should', 'may', 'might', 'can', 'this', 'that', 'these', 'those',
-        'i', 'you', 'he', 'she', 'it', 'we', 'they', 'me', 'him', 'her', 'us', 'them',
-        'what', 'when', 'where', 'why', 'how', 'who', 'which', 'whose', 'whom'
+        prepared = await _aprepare(query, session_id, detected_language)
+    except Exception as e:
+        print(f"❌ Failed to prepare streaming answer: {e}")
+        yield "error", error_event
+        return
+
+    yield "meta", {
+        "session_id": session_id,
+        "sources": prepared.sources,
+        "detected_language": prepared.detected_language,
     }
-    
-    # Simple keyword extraction - split by spaces and filter out stop words
-    words = re.findall(r'\b\w+\b', query.lower())
-    keywords = [word for word in words if word not in stop_words and len(word) > 2]
-    
-    # Add some domain-specific keywords that might be useful for PMC
-    pmc_keywords = ['property', 'tax', 'tree', 'cutting', 'permission', 'circular', 'aadhaar', 'pan', 'card', 'linking']
-    for keyword in pmc_keywords:
-        if keyword in query.lower():
-            keywords.append(keyword)
-    
-    return keywords[:5]  # Limit to 5 keywords
+
+    if prepared.direct_answer is not None:
+        yield "token", {"text": prepared.direct_answer}
+        _finish(query, session_id, prepared, prepared.direct_answer)
+        yield "done", {}
+        return
+
+    timings = prepared.timings
+    postprocessor = StreamingPostprocessor()
+    llm_started = time.perf_counter()
+    first_token = True
+    usage = None
+    deadline = prepared.deadline
+    try:
+        # Streams hold their slot until the last token; they are not coalesced
+        async with limiters["openai"].slot(deadline):
+            stream = await with_backoff("openai", lambda: async_openai_client.get().chat.completions.create(
+                model="gpt-4o-mini",
+                messages=[{"role": "user", "content": prepared.prompt}],
+                temperature=0.3,
+                stream=True,
+                stream_options={"include_usage": True},
+                timeout=deadline.remaining(),
+            ), deadline)
+            async for chunk in stream:
+                if getattr(chunk, "usage", None) is not None:
+                    usage = chunk.usage
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    if first_token:
+                        timings.add("llm_first_token", time.perf_counter() - llm_started)
+                        first_token = False
+                    with timings.stage("postprocess"):
+                        text = postprocessor.feed(delta)
+                    if text:
+                        yield "token", {"text": text}
+            with timings.stage("postprocess"):
+                text = postprocessor.flush()
+            if text:
+                yield "token", {"text": text}
+    except Exception as e:
+        if not isinstance(e, Overloaded):
+            ERRORS.inc("openai")
+        if first_token and _llm_unavailable(e):
+            yield "token", {"text": _degrade(prepared.record, timings, prepared.detected_language, prepared.links,
+                                             prepared.sources, e)}
+            yield "done", {}
+            return
+        print(f"❌ Streaming completion failed: {e}")
+        yield "error", error_event
+        return
+    # Whole stream, including the time spent handing tokens to the client
+    timings.add("llm", time.perf_counter() - llm_started)
+
+    _finish(query, session_id, prepared, postprocessor.text, usage)
+
+    yield "done", {}
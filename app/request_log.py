@@ -0,0 +1,260 @@
+import atexit
+import glob
+import gzip
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process use only
+    fcntl = None
+
+
+class StageTimings:
+    """Wall time per request stage, reported in milliseconds."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start)
+
+    async def timed(self, stage: str, awaitable):
+        """Await `awaitable` and record its time, e.g. inside asyncio.gather."""
+        start = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            self.add(stage, time.perf_counter() - start)
+
+    def as_dict(self) -> Dict[str, float]:
+        timings = {stage: round(seconds * 1000, 2) for stage, seconds in self.stages.items()}
+        timings["total"] = round((time.perf_counter() - self.started) * 1000, 2)
+        return timings
+
+
+class RequestLogger:
+    """
+    JSON-lines request log written by a background thread.
+
+    Requests only put a dict on a bounded queue; when the queue is full the
+    record is dropped and counted instead of blocking the request. The writer
+    batches records into one O_APPEND write, so lines from several worker
+    processes never interleave, and rotates the file by size or age
+    (optionally gzipping the rotated file and keeping `backup_count` of them).
+    """
+
+    def __init__(self, path: str = None, max_bytes: int = None, rotate_seconds: float = None,
+                 backup_count: int = None, compress: bool = None, queue_size: int = None,
+                 enabled: bool = None):
+        self.path = path or os.getenv("REQUEST_LOG_PATH", os.path.join("logs", "requests.jsonl"))
+        self.max_bytes = max_bytes if max_bytes is not None else int(
+            os.getenv("REQUEST_LOG_MAX_BYTES", str(50 * 1024 * 1024)))
+        self.rotate_seconds = rotate_seconds if rotate_seconds is not None else float(
+            os.getenv("REQUEST_LOG_ROTATE_SECONDS", "86400"))
+        self.backup_count = backup_count if backup_count is not None else int(
+            os.getenv("REQUEST_LOG_BACKUPS", "10"))
+        self.compress = compress if compress is not None else os.getenv("REQUEST_LOG_COMPRESS", "1") != "0"
+        self.enabled = enabled if enabled is not None else os.getenv("REQUEST_LOG_ENABLED", "1") != "0"
+        self._queue = queue.Queue(maxsize=queue_size or int(os.getenv("REQUEST_LOG_QUEUE_SIZE", "10000")))
+        self._lock = threading.Lock()
+        self._thread = None
+        self._fd = None
+        self._opened_at = 0.0
+        self.written = 0
+        self.dropped = 0
+        self.errors = 0
+
+    def log(self, record: dict) -> None:
+        """Queue a record for writing; never blocks."""
+        if not self.enabled:
+            return
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "errors": self.errors,
+        }
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Flush what is queued and stop the writer thread."""
+        thread = self._thread
+        if thread is None:
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        thread.join(timeout)
+        self._thread = None
+
+    # -- writer thread ---------------------------------------------------------
+
+    def _ensure_writer(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="request-log", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        stop = False
+        while not stop:
+            batch = [self._queue.get()]
+            # Drain whatever else is waiting so one write covers many requests
+            while len(batch) < 1000:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:
+                stop = True
+                batch = [record for record in batch if record is not None]
+            if batch:
+                self._write(batch)
+        self._close_file()
+
+    def _write(self, batch) -> None:
+        lines = []
+        for record in batch:
+            try:
+                lines.append(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+            except Exception:
+                self.errors += 1
+        if not lines:
+            return
+        data = "".join(lines).encode("utf-8")
+        try:
+            self._append(data)
+            self.written += len(lines)
+        except Exception as e:
+            self.errors += len(lines)
+            print(f"⚠️ Failed to write request log: {e}")
+
+    def _append(self, data: bytes) -> None:
+        """
+        Write under an exclusive flock on the current file. Rotation happens
+        under the same lock, so once a file is renamed no worker writes to it
+        again and it can be compressed safely.
+        """
+        while True:
+            fd = self._open_file()
+            _lock(fd)
+            try:
+                if not self._is_current(fd):
+                    # Rotated by another worker while we waited for the lock
+                    self._close_file()
+                    continue
+                rotated = self._maybe_rotate(fd, len(data))
+                if rotated is None:
+                    os.write(fd, data)
+                    return
+            finally:
+                if self._fd is not None:
+                    _unlock(fd)
+            self._compress(rotated)
+
+    def _is_current(self, fd: int) -> bool:
+        try:
+            return os.stat(self.path).st_ino == os.fstat(fd).st_ino
+        except OSError:
+            return False
+
+    def _open_file(self) -> int:
+        if self._fd is not None and self._is_current(self._fd):
+            return self._fd
+        self._close_file()
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._opened_at = time.time()
+        return self._fd
+
+    def _close_file(self) -> None:
+        if self._fd is not None:
+            try:
+                os.close(self._fd)
+            except OSError:
+                pass
+            self._fd = None
+
+    def _maybe_rotate(self, fd: int, incoming: int):
+        """Rename the file if it is too big or too old; returns the new name or None."""
+        size = os.fstat(fd).st_size
+        if size == 0:
+            return None
+        too_big = self.max_bytes > 0 and size + incoming > self.max_bytes
+        too_old = self.rotate_seconds > 0 and time.time() - self._opened_at > self.rotate_seconds
+        if not (too_big or too_old):
+            return None
+
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S-%f")
+        rotated = f"{self.path}.{stamp}.{os.getpid()}"
+        os.rename(self.path, rotated)
+        # Closing drops our lock; waiting workers see the inode change and reopen
+        self._close_file()
+        return rotated
+
+    def _compress(self, rotated: str) -> None:
+        if self.compress:
+            try:
+                with open(rotated, "rb") as src, gzip.open(rotated + ".gz", "wb") as dst:
+                    shutil.copyfileobj(src, dst)
+                os.remove(rotated)
+            except OSError as e:
+                print(f"⚠️ Failed to compress {rotated}: {e}")
+        self._prune()
+
+    def _prune(self) -> None:
+        if self.backup_count <= 0:
+            return
+        backups = sorted(glob.glob(glob.escape(self.path) + ".*"), key=os.path.getmtime)
+        for old in backups[:-self.backup_count]:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+
+
+def _lock(fd: int) -> None:
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+
+
+def _unlock(fd: int) -> None:
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+def utc_timestamp() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+# Global instance
+request_logger = RequestLogger()
+atexit.register(request_logger.close)
@@ -0,0 +1,113 @@
+import asyncio
+import inspect
+import math
+import os
+from typing import Dict, List
+
+from app.metrics import RERANK_KEPT
+from app.providers import register
+
+# RERANK=1 puts a cross-encoder between retrieval and prompt assembly
+RERANK = os.getenv("RERANK", "0") != "0"
+
+
+def _sigmoid(x: float) -> float:
+    return 1.0 / (1.0 + math.exp(-x)) if x >= 0 else math.exp(x) / (1.0 + math.exp(x))
+
+
+class Reranker:
+    """
+    Optional second retrieval stage: a wider candidate set is scored by a
+    small local cross-encoder (one batched predict per request, or per
+    /chat/batch call) and only pages scoring at least min_score go into the
+    prompt, at most max_docs and at least min_docs of them. Scores are the
+    sigmoid of the model's logit, 0-1.
+    """
+
+    def __init__(self, enabled: bool = None, model_name: str = None, candidates: int = None, max_docs: int = None,
+                 min_docs: int = None, min_score: float = None, batch_size: int = None, text_chars: int = None):
+        self.enabled = RERANK if enabled is None else enabled
+        self.model_name = model_name or os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+        self.candidates = candidates or int(os.getenv("RERANK_CANDIDATES", "12"))
+        self.max_docs = max_docs or int(os.getenv("RERANK_MAX_DOCS", "3"))
+        self.min_docs = min_docs if min_docs is not None else int(os.getenv("RERANK_MIN_DOCS", "1"))
+        self.min_score = min_score if min_score is not None else float(os.getenv("RERANK_MIN_SCORE", "0.1"))
+        self.batch_size = batch_size or int(os.getenv("RERANK_BATCH", "32"))
+        # The model sees at most 512 tokens of each pair anyway
+        self.text_chars = text_chars or int(os.getenv("RERANK_TEXT_CHARS", "1500"))
+        self._predict_kwargs = {}
+        # Read-only weights, like the embedding model: loaded in the gunicorn master when preloading
+        self.provider = register("reranker", self._load_model, warm=self._warm, preload=True) if self.enabled else None
+
+    def _load_model(self):
+        from sentence_transformers import CrossEncoder
+
+        model = CrossEncoder(self.model_name)
+        # Ask for raw logits whatever activation the installed version / model config defaults to
+        params = inspect.signature(model.predict).parameters
+        for name in ("activation_fn", "activation_fct"):
+            if name in params:
+                try:
+                    import torch
+                except ImportError:
+                    break
+                self._predict_kwargs = {name: torch.nn.Identity()}
+                break
+        print(f"🧠 Loaded reranker {self.model_name}")
+        return model
+
+    def _warm(self, model) -> None:
+        model.predict([("warm up", "warm up")], show_progress_bar=False, **self._predict_kwargs)
+
+    def depth(self, top_k: int) -> int:
+        """Pages to retrieve for a prompt of top_k pages."""
+        return max(top_k, self.candidates) if self.enabled else top_k
+
+    def _scores(self, pairs) -> List[float]:
+        logits = self.provider.get().predict(pairs, batch_size=self.batch_size, show_progress_bar=False,
+                                             **self._predict_kwargs)
+        return [_sigmoid(float(x)) for x in logits]
+
+    def _select(self, matches: List[Dict], scores: List[float]) -> List[Dict]:
+        ranked = sorted((dict(m, rerank_score=s) for m, s in zip(matches, scores)),
+                        key=lambda m: m["rerank_score"], reverse=True)
+        kept = [m for m in ranked[:self.max_docs] if m["rerank_score"] >= self.min_score]
+        kept = kept if len(kept) >= self.min_docs else ranked[:self.min_docs]
+        RERANK_KEPT.observe(len(kept))
+        return kept
+
+    def rerank_many(self, queries: List[str], match_lists: List[List[Dict]], top_k: int = 5) -> List[List[Dict]]:
+        """All (query, page) pairs of all requests in one predict call; the first top_k pages if it fails."""
+        if not self.enabled:
+            return match_lists
+        pairs = [(query, (m.get("metadata") or {}).get("text", "")[:self.text_chars])
+                 for query, matches in zip(queries, match_lists) for m in matches]
+        if not pairs:
+            return match_lists
+        try:
+            scores = self._scores(pairs)
+        except Exception as e:
+            print(f"⚠️ Reranking failed, using retrieval order: {e}")
+            return [matches[:top_k] for matches in match_lists]
+        reranked, start = [], 0
+        for matches in match_lists:
+            reranked.append(self._select(matches, scores[start:start + len(matches)]) if matches else [])
+            start += len(matches)
+        return reranked
+
+    def rerank(self, query: str, matches: List[Dict], top_k: int = 5) -> List[Dict]:
+        return self.rerank_many([query], [matches], top_k)[0]
+
+    async def arerank_many(self, queries: List[str], match_lists: List[List[Dict]], top_k: int = 5):
+        if not self.enabled:
+            return match_lists
+        # CPU-bound inference (torch releases the GIL); keep it off the event loop
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.rerank_many, queries, match_lists, top_k)
+
+    async def arerank(self, query: str, matches: List[Dict], top_k: int = 5) -> List[Dict]:
+        return (await self.arerank_many([query], [matches], top_k))[0]
+
+
+# Global instance
+reranker = Reranker()
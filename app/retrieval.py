@@ -0,0 +1,102 @@
+import asyncio
+import os
+from typing import Dict, List
+
+from app.chunking import merge_adjacent_chunks
+from app.lexical_index import lexical_index
+from app.upstream import Deadline, acall, call
+from app.vector_store import query_embedding, aquery_embedding, aquery_embeddings, supports_batch_query
+
+# HYBRID_RETRIEVAL=0 falls back to dense-only top-k
+HYBRID_RETRIEVAL = os.getenv("HYBRID_RETRIEVAL", "1") != "0"
+RRF_K = int(os.getenv("RRF_K", "60"))
+DENSE_CANDIDATES = int(os.getenv("DENSE_CANDIDATES", "10"))
+LEXICAL_CANDIDATES = int(os.getenv("LEXICAL_CANDIDATES", "10"))
+# Chunks kept after fusion, before adjacent chunks are merged into pages
+RETRIEVAL_CHUNKS = int(os.getenv("RETRIEVAL_CHUNKS", "8"))
+
+
+def reciprocal_rank_fusion(result_lists, top_k: int = 5, k: int = RRF_K) -> List[Dict]:
+    """
+    Merge ranked match lists by summing 1 / (k + rank). The fused score
+    replaces "score"; the original scores are kept per list for logging.
+    """
+    fused = {}
+    for list_index, results in enumerate(result_lists):
+        for rank, match in enumerate(results, start=1):
+            entry = fused.get(match["id"])
+            if entry is None:
+                entry = fused[match["id"]] = {"id": match["id"], "score": 0.0, "metadata": match["metadata"],
+                                              "scores": {}}
+            elif list_index in entry["scores"]:
+                continue  # only the best rank per list counts
+            entry["score"] += 1.0 / (k + rank)
+            entry["scores"][list_index] = match.get("score")
+    return sorted(fused.values(), key=lambda m: m["score"], reverse=True)[:top_k]
+
+
+def lexical_search(query: str, top_k: int = LEXICAL_CANDIDATES) -> List[Dict]:
+    return lexical_index.search(query, top_k=top_k) if HYBRID_RETRIEVAL else []
+
+
+def fuse(dense: List[Dict], lexical: List[Dict], top_k: int = 5) -> List[Dict]:
+    """Dense + BM25 through RRF; dense-only when there are no lexical hits."""
+    if not lexical:
+        return dense[:top_k]
+    fused = reciprocal_rank_fusion([dense, lexical], top_k=top_k)
+    for match in fused:
+        scores = match.pop("scores")
+        match["dense_score"] = scores.get(0)
+        match["lexical_score"] = scores.get(1)
+    return fused
+
+
+def dense_candidates(top_k: int) -> int:
+    return max(top_k, RETRIEVAL_CHUNKS, DENSE_CANDIDATES if HYBRID_RETRIEVAL else 0)
+
+
+def _pages(dense: List[Dict], lexical: List[Dict], top_k: int) -> List[Dict]:
+    chunks = fuse(dense, lexical, top_k=max(top_k, RETRIEVAL_CHUNKS))
+    return merge_adjacent_chunks(chunks)[:top_k]
+
+
+def retrieve(query_emb, lexical: List[Dict], top_k: int = 5, deadline: Deadline = None) -> List[Dict]:
+    """
+    Up to top_k pages, each with its retrieved (adjacent-merged) chunks as
+    text. Identical in-flight vector queries share one call (app.upstream).
+    """
+    n = dense_candidates(top_k)
+    dense = call("vector", lambda: query_embedding(query_emb, top_k=n), deadline or Deadline(),
+                 key=(tuple(query_emb), n))
+    return _pages(dense, lexical, top_k)
+
+
+async def aretrieve(query_emb, lexical: List[Dict], top_k: int = 5, deadline: Deadline = None) -> List[Dict]:
+    n = dense_candidates(top_k)
+    dense = await acall("vector", lambda: aquery_embedding(query_emb, top_k=n), deadline or Deadline(),
+                        key=(tuple(query_emb), n))
+    return _pages(dense, lexical, top_k)
+
+
+async def aretrieve_many(query_embs, lexicals: List[List[Dict]], top_k: int = 5,
+                         deadline: Deadline = None) -> List:
+    """
+    aretrieve for many queries, in order; a failed vector query yields its
+    exception in place of the pages. The local index answers all of them with
+    one matmul, Pinecone gets one concurrent call per query.
+    """
+    deadline = deadline or Deadline()
+    if not supports_batch_query():
+        return await asyncio.gather(*(aretrieve(e, l, top_k, deadline) for e, l in zip(query_embs, lexicals)),
+                                    return_exceptions=True)
+    n = dense_candidates(top_k)
+    try:
+        dense = await acall("vector", lambda: aquery_embeddings(query_embs, top_k=n), deadline)
+    except Exception as e:
+        return [e] * len(query_embs)
+    return [_pages(d, l, top_k) for d, l in zip(dense, lexicals)]
+
+
+def lexical_pages(lexical: List[Dict], top_k: int = 5) -> List[Dict]:
+    """BM25 matches alone, for when the vector store is unavailable."""
+    return merge_adjacent_chunks(lexical[:max(top_k, RETRIEVAL_CHUNKS)])[:top_k]
@@ -1,10 +1,291 @@
-from collections import defaultdict
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Dict, List
 
-# Structure: {session_id: [{"role": "user", "content": ...}, {"role": "assistant", "content": ...}]}
-session_memory = defaultdict(list)
+
+class SessionStore:
+    """
+    Chat history per session: {"role": "user"|"assistant", "content": ..., "id": ...},
+    ids increasing within a session. Implementations keep at most the last
+    `max_turns` user/assistant turns.
+    """
+
+    def add(self, session_id: str, role: str, content: str) -> None:
+        raise NotImplementedError
+
+    def get(self, session_id: str) -> List[Dict[str, str]]:
+        raise NotImplementedError
+
+    def clear(self, session_id: str) -> None:
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def get_summary(self, session_id: str) -> str:
+        """Rolling summary of the turns already folded out of the history ("" if none)."""
+        raise NotImplementedError
+
+    def compact(self, session_id: str, summary: str, through_id: int) -> None:
+        """Store a new rolling summary and drop the messages it now covers, ids up to `through_id`."""
+        raise NotImplementedError
+
+
+class _Session:
+    __slots__ = ("messages", "last_seen", "size", "summary", "next_id")
+
+    def __init__(self, max_messages: int):
+        self.messages = deque(maxlen=max_messages)
+        self.last_seen = time.monotonic()
+        self.size = 0
+        self.summary = ""
+        self.next_id = 0
+
+
+class MemorySessionStore(SessionStore):
+    """
+    In-process store with a ring buffer per session, idle-TTL expiry and a
+    global cap on sessions / stored characters. Sessions are kept in LRU
+    order, so expiry and eviction only ever look at the front.
+    """
+
+    def __init__(self, max_turns: int = 5, idle_ttl: float = 1800, max_sessions: int = 10000,
+                 max_chars: int = 20_000_000):
+        self.max_messages = max_turns * 2
+        self.idle_ttl = idle_ttl
+        self.max_sessions = max_sessions
+        self.max_chars = max_chars
+        self._sessions = OrderedDict()
+        self._chars = 0
+        self._lock = threading.Lock()
+        self.evicted = 0
+        self.expired = 0
+
+    def _drop(self, session_id: str) -> None:
+        session = self._sessions.pop(session_id, None)
+        if session is not None:
+            self._chars -= session.size
+
+    def _evict(self, now: float) -> None:
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session.last_seen > self.idle_ttl:
+                self.expired += 1
+            elif len(self._sessions) > self.max_sessions or self._chars > self.max_chars:
+                self.evicted += 1
+            else:
+                break
+            self._drop(session_id)
+
+    def add(self, session_id: str, role: str, content: str) -> None:
+        now = time.monotonic()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._sessions[session_id] = _Session(self.max_messages)
+            else:
+                self._sessions.move_to_end(session_id)
+            if len(session.messages) == session.messages.maxlen:
+                dropped = session.messages[0]["content"]
+                session.size -= len(dropped)
+                self._chars -= len(dropped)
+            session.messages.append({"role": role, "content": content, "id": session.next_id})
+            session.next_id += 1
+            session.size += len(content)
+            self._chars += len(content)
+            session.last_seen = now
+            self._evict(now)
+
+    def get(self, session_id: str) -> List[Dict[str, str]]:
+        now = time.monotonic()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return []
+            if now - session.last_seen > self.idle_ttl:
+                self._drop(session_id)
+                self.expired += 1
+                return []
+            return list(session.messages)
+
+    def clear(self, session_id: str) -> None:
+        with self._lock:
+            self._drop(session_id)
+
+    def count(self) -> int:
+        return len(self._sessions)
+
+    def get_summary(self, session_id: str) -> str:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            return session.summary if session is not None else ""
+
+    def compact(self, session_id: str, summary: str, through_id: int) -> None:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return
+            # By id: the ring buffer may have dropped some of the summarized messages meanwhile
+            while session.messages and session.messages[0]["id"] <= through_id:
+                dropped = session.messages.popleft()["content"]
+                session.size -= len(dropped)
+                self._chars -= len(dropped)
+            delta = len(summary) - len(session.summary)
+            session.summary = summary
+            session.size += delta
+            self._chars += delta
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    SQLite-backed store (via SQLAlchemy) so several uvicorn workers on one
+    host share history. Each add trims the session to its last max_turns
+    turns; idle sessions are purged every `purge_every` writes.
+    """
+
+    def __init__(self, url: str = None, max_turns: int = 5, idle_ttl: float = 1800, purge_every: int = 500):
+        from sqlalchemy import (Column, Float, Index, Integer, MetaData, String, Table, Text, create_engine,
+                                event)
+
+        self.url = url or os.getenv("SESSION_DB_URL", "sqlite:///data/sessions.db")
+        self.max_messages = max_turns * 2
+        self.idle_ttl = idle_ttl
+        self.purge_every = purge_every
+        self._writes = 0
+
+        if self.url.startswith("sqlite:///"):
+            directory = os.path.dirname(self.url[len("sqlite:///"):])
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        self.engine = create_engine(self.url, connect_args={"timeout": 30})
+
+        @event.listens_for(self.engine, "connect")
+        def _sqlite_pragmas(dbapi_connection, _):
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+            cursor.close()
+
+        metadata = MetaData()
+        self.messages = Table(
+            "session_messages", metadata,
+            Column("id", Integer, primary_key=True, autoincrement=True),
+            Column("session_id", String(128), nullable=False),
+            Column("role", String(16), nullable=False),
+            Column("content", Text, nullable=False),
+            Column("created_at", Float, nullable=False),
+            Index("ix_session_messages_session", "session_id", "id"),
+            Index("ix_session_messages_created", "created_at"),
+        )
+        self.summaries = Table(
+            "session_summaries", metadata,
+            Column("session_id", String(128), primary_key=True),
+            Column("summary", Text, nullable=False),
+        )
+        metadata.create_all(self.engine)
+
+    def add(self, session_id: str, role: str, content: str) -> None:
+        from sqlalchemy import delete, select
+
+        m = self.messages
+        with self.engine.begin() as conn:
+            conn.execute(m.insert().values(session_id=session_id, role=role, content=content,
+                                           created_at=time.time()))
+            keep = (select(m.c.id).where(m.c.session_id == session_id)
+                    .order_by(m.c.id.desc()).limit(self.max_messages))
+            conn.execute(delete(m).where(m.c.session_id == session_id, m.c.id.not_in(keep.scalar_subquery())))
+        self._writes += 1
+        if self._writes % self.purge_every == 0:
+            self.purge_idle()
+
+    def get(self, session_id: str) -> List[Dict[str, str]]:
+        from sqlalchemy import select
+
+        m = self.messages
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                select(m.c.id, m.c.role, m.c.content, m.c.created_at).where(m.c.session_id == session_id)
+                .order_by(m.c.id.desc()).limit(self.max_messages)
+            ).all()
+        if not rows or time.time() - rows[0].created_at > self.idle_ttl:
+            return []
+        return [{"role": row.role, "content": row.content, "id": row.id} for row in reversed(rows)]
+
+    def purge_idle(self) -> None:
+        """Delete sessions whose newest message is older than idle_ttl."""
+        from sqlalchemy import delete, func, select
+
+        m = self.messages
+        cutoff = time.time() - self.idle_ttl
+        stale = select(m.c.session_id).group_by(m.c.session_id).having(func.max(m.c.created_at) < cutoff)
+        with self.engine.begin() as conn:
+            conn.execute(delete(m).where(m.c.session_id.in_(stale.scalar_subquery())))
+            # Summaries of sessions that have no messages left
+            live = select(m.c.session_id).distinct()
+            conn.execute(delete(self.summaries).where(self.summaries.c.session_id.not_in(live.scalar_subquery())))
+
+    def clear(self, session_id: str) -> None:
+        from sqlalchemy import delete
+
+        with self.engine.begin() as conn:
+            conn.execute(delete(self.messages).where(self.messages.c.session_id == session_id))
+            conn.execute(delete(self.summaries).where(self.summaries.c.session_id == session_id))
+
+    def get_summary(self, session_id: str) -> str:
+        from sqlalchemy import select
+
+        with self.engine.connect() as conn:
+            summary = conn.execute(
+                select(self.summaries.c.summary).where(self.summaries.c.session_id == session_id)
+            ).scalar()
+        return summary or ""
+
+    def compact(self, session_id: str, summary: str, through_id: int) -> None:
+        from sqlalchemy import delete
+
+        m, s = self.messages, self.summaries
+        with self.engine.begin() as conn:
+            conn.execute(delete(m).where(m.c.session_id == session_id, m.c.id <= through_id))
+            conn.execute(delete(s).where(s.c.session_id == session_id))
+            conn.execute(s.insert().values(session_id=session_id, summary=summary))
+
+    def count(self) -> int:
+        from sqlalchemy import func, select
+
+        with self.engine.connect() as conn:
+            return conn.execute(select(func.count(func.distinct(self.messages.c.session_id)))).scalar()
+
+
+def get_session_store(backend: str = None) -> SessionStore:
+    """SESSION_BACKEND=memory (default) or sqlite; limits come from SESSION_* env vars."""
+    backend = (backend or os.getenv("SESSION_BACKEND", "memory")).lower()
+    max_turns = int(os.getenv("SESSION_MAX_TURNS", "5"))
+    idle_ttl = float(os.getenv("SESSION_IDLE_TTL", "1800"))
+    if backend == "sqlite":
+        return SQLiteSessionStore(max_turns=max_turns, idle_ttl=idle_ttl)
+    if backend == "memory":
+        return MemorySessionStore(
+            max_turns=max_turns,
+            idle_ttl=idle_ttl,
+            max_sessions=int(os.getenv("SESSION_MAX_SESSIONS", "10000")),
+            max_chars=int(os.getenv("SESSION_MAX_CHARS", "20000000")),
+        )
+    raise ValueError(f"Unknown session backend: {backend}")
+
+
+# Global instance
+session_store = get_session_store()
 
 def add_to_history(session_id: str, role: str, content: str):
-    session_memory[session_id].append({"role": role, "content": content})
+    session_store.add(session_id, role, content)
 
 def get_history(session_id: str):
-    return session_memory.get(session_id, [])
+    return session_store.get(session_id)
+
+def get_summary(session_id: str) -> str:
+    return session_store.get_summary(session_id)
+
+def compact_history(session_id: str, summary: str, through_id: int):
+    session_store.compact(session_id, summary, through_id)
@@ -0,0 +1,223 @@
+"""
+Static files of the web UI, served precompressed and cache-friendly:
+
+- every file under static/ gets a content-hashed copy (pmc-logo.<hash>.jpg)
+  served from /static/dist/ with a one-year immutable Cache-Control
+- index.html is rendered with those hashed URLs and revalidated by ETag
+- text files get gzip (and brotli, when the brotli package is installed)
+  variants, picked per request from Accept-Encoding
+
+`python -m app.static_assets` writes all of it to static/dist/ at image build
+time. Without that directory the same files are built in memory on first use.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import shutil
+import threading
+from typing import Dict, Optional, Tuple
+
+from starlette.responses import Response
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+STATIC_DIR = os.getenv("STATIC_DIR", "static")
+DIST_DIRNAME = "dist"
+MANIFEST_NAME = "manifest.json"
+INDEX_NAME = "index.html"
+
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+# index.html names the hashed files, so browsers must revalidate it (cheap with the ETag)
+INDEX_CACHE = "no-cache"
+
+_COMPRESSIBLE = {".html", ".css", ".js", ".mjs", ".json", ".svg", ".txt", ".xml", ".map", ".ico"}
+_ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def hashed_name(name: str, data: bytes) -> str:
+    stem, ext = os.path.splitext(name)
+    return f"{stem}.{_digest(data)[:10]}{ext}"
+
+
+def _compressed(name: str, data: bytes) -> Dict[str, bytes]:
+    """{".gz": ..., ".br": ...} for text files, keeping only variants that are actually smaller."""
+    if os.path.splitext(name)[1].lower() not in _COMPRESSIBLE:
+        return {}
+    variants = {".gz": gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants[".br"] = brotli.compress(data, quality=11)
+    return {suffix: body for suffix, body in variants.items() if len(body) < len(data)}
+
+
+def render_index(html: str, manifest: Dict[str, str]) -> str:
+    """Point static/<name> references (src, href, url()) at the hashed copies."""
+    for name, hashed in manifest.items():
+        pattern = re.compile(r'(["\'(])/?static/' + re.escape(name) + r'(["\')])')
+        html = pattern.sub(lambda m: f"{m.group(1)}/static/{DIST_DIRNAME}/{hashed}{m.group(2)}", html)
+    return html
+
+
+def build(static_dir: str = STATIC_DIR) -> Dict[str, bytes]:
+    """Every file of static/dist/ as {relative name: bytes} (hashed assets, variants, index, manifest)."""
+    files, manifest = {}, {}
+    for root, dirs, names in os.walk(static_dir):
+        dirs[:] = sorted(d for d in dirs if not (root == static_dir and d == DIST_DIRNAME))
+        for filename in sorted(names):
+            path = os.path.join(root, filename)
+            name = os.path.relpath(path, static_dir).replace(os.sep, "/")
+            if name == INDEX_NAME:
+                continue
+            with open(path, "rb") as f:
+                data = f.read()
+            manifest[name] = hashed_name(name, data)
+            files[manifest[name]] = data
+            for suffix, body in _compressed(name, data).items():
+                files[manifest[name] + suffix] = body
+
+    index_path = os.path.join(static_dir, INDEX_NAME)
+    if os.path.exists(index_path):
+        with open(index_path, encoding="utf-8") as f:
+            index = render_index(f.read(), manifest).encode("utf-8")
+        files[INDEX_NAME] = index
+        for suffix, body in _compressed(INDEX_NAME, index).items():
+            files[INDEX_NAME + suffix] = body
+
+    files[MANIFEST_NAME] = json.dumps(manifest, indent=2, sort_keys=True).encode("utf-8")
+    return files
+
+
+def write(static_dir: str = STATIC_DIR) -> Dict[str, bytes]:
+    """Build step: replace static/dist/ with a fresh build."""
+    files = build(static_dir)
+    dist = os.path.join(static_dir, DIST_DIRNAME)
+    shutil.rmtree(dist, ignore_errors=True)
+    for name, data in files.items():
+        path = os.path.join(dist, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+    return files
+
+
+def accepted_encodings(accept_encoding: str) -> set:
+    """Codings the client accepts (q=0 means refused)."""
+    accepted = set()
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        q = params.strip()
+        if q.startswith("q=") and q[2:].strip() in ("0", "0.0", "0.00", "0.000"):
+            continue
+        if coding:
+            accepted.add(coding.strip())
+    return accepted
+
+
+class _Asset:
+    __slots__ = ("media_type", "cache_control", "variants", "etag")
+
+    def __init__(self, name: str, files: Dict[str, bytes], cache_control: str):
+        self.media_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        if self.media_type.startswith("text/") or self.media_type in ("application/javascript", "application/json"):
+            self.media_type += "; charset=utf-8"
+        self.cache_control = cache_control
+        self.variants = {None: files[name]}
+        for coding, suffix in _ENCODINGS:
+            if name + suffix in files:
+                self.variants[coding] = files[name + suffix]
+        self.etag = _digest(files[name])[:16]
+
+    def _etag(self, coding: Optional[str]) -> str:
+        # Each encoding is its own representation, so it gets its own strong validator
+        return f'"{self.etag}-{coding}"' if coding else f'"{self.etag}"'
+
+    def response(self, headers) -> Response:
+        accepted = accepted_encodings(headers.get("accept-encoding", ""))
+        coding = next((c for c, _ in _ENCODINGS if c in self.variants and c in accepted), None)
+        response_headers = {"Cache-Control": self.cache_control, "ETag": self._etag(coding)}
+        if len(self.variants) > 1:
+            response_headers["Vary"] = "Accept-Encoding"
+
+        if_none_match = headers.get("if-none-match")
+        if if_none_match:
+            tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+            if "*" in tags or tags & {self._etag(c) for c in self.variants}:
+                return Response(status_code=304, headers=response_headers)
+
+        if coding:
+            response_headers["Content-Encoding"] = coding
+        return Response(self.variants[coding], media_type=self.media_type, headers=response_headers)
+
+
+class StaticAssets:
+    """Hashed, precompressed static files, held in memory (the UI is a few dozen KB)."""
+
+    def __init__(self, static_dir: str = STATIC_DIR):
+        self.static_dir = static_dir
+        self.manifest: Dict[str, str] = {}
+        self._assets: Optional[Dict[str, _Asset]] = None
+        self._lock = threading.Lock()
+
+    def _load_files(self) -> Tuple[Dict[str, bytes], bool]:
+        dist = os.path.join(self.static_dir, DIST_DIRNAME)
+        if not os.path.exists(os.path.join(dist, MANIFEST_NAME)):
+            return build(self.static_dir), False
+        files = {}
+        for root, _, names in os.walk(dist):
+            for filename in names:
+                path = os.path.join(root, filename)
+                with open(path, "rb") as f:
+                    files[os.path.relpath(path, dist).replace(os.sep, "/")] = f.read()
+        return files, True
+
+    def _load(self) -> Dict[str, _Asset]:
+        if self._assets is None:
+            with self._lock:
+                if self._assets is None:
+                    files, prebuilt = self._load_files()
+                    self.manifest = json.loads(files[MANIFEST_NAME])
+                    assets = {hashed: _Asset(hashed, files, IMMUTABLE_CACHE) for hashed in self.manifest.values()}
+                    if INDEX_NAME in files:
+                        assets[INDEX_NAME] = _Asset(INDEX_NAME, files, INDEX_CACHE)
+                    self._assets = assets
+                    if not prebuilt:
+                        print(f"⚠️ {self.static_dir}/{DIST_DIRNAME} not built (python -m app.static_assets); "
+                              f"compressed {len(assets)} static files in memory")
+        return self._assets
+
+    @property
+    def ready(self) -> bool:
+        return self._assets is not None
+
+    def warm_up(self) -> None:
+        self._load()
+
+    def index_response(self, headers) -> Optional[Response]:
+        asset = self._load().get(INDEX_NAME)
+        return asset.response(headers) if asset is not None else None
+
+    def asset_response(self, hashed: str, headers) -> Optional[Response]:
+        asset = self._load().get(hashed) if hashed != INDEX_NAME else None
+        return asset.response(headers) if asset is not None else None
+
+
+# Global instance; files are read (or built) on first request or at warm-up
+static_assets = StaticAssets()
+
+
+if __name__ == "__main__":
+    written = write()
+    manifest = json.loads(written[MANIFEST_NAME])
+    print(f"📦 Wrote {len(written)} files to {STATIC_DIR}/{DIST_DIRNAME} "
+          f"({len(manifest)} hashed assets, brotli {'on' if brotli is not None else 'off'})")
+    for name, data in sorted(written.items()):
+        print(f"  {name:<40}{len(data):>9}")
@@ -0,0 +1,66 @@
+import math
+import os
+import re
+import threading
+from functools import lru_cache
+
+# gpt-4o / gpt-4o-mini tokenizer
+TOKEN_ENCODING = os.getenv("TOKEN_ENCODING", "o200k_base")
+
+_APPROX_TOKEN = re.compile(r'\w+|[^\w\s]')
+
+_encoding = None
+_encoding_loaded = False
+_encoding_lock = threading.Lock()
+
+
+def get_encoding():
+    """The tiktoken encoding, or None (approximate counts) when tiktoken or its data file is unavailable."""
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        with _encoding_lock:
+            if not _encoding_loaded:
+                try:
+                    import tiktoken
+                    _encoding = tiktoken.get_encoding(TOKEN_ENCODING)
+                except Exception as e:
+                    print(f"⚠️ tiktoken encoding {TOKEN_ENCODING} unavailable ({e}); using approximate token counts")
+                    _encoding = None
+                _encoding_loaded = True
+    return _encoding
+
+
+def _approx_count(text: str) -> int:
+    # ~4 characters per token for long words, one per short word / punctuation mark
+    return sum(max(1, math.ceil(len(piece) / 4)) for piece in _APPROX_TOKEN.findall(text))
+
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    encoding = get_encoding()
+    if encoding is None:
+        return _approx_count(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+@lru_cache(maxsize=65536)
+def word_tokens(word: str) -> int:
+    """Tokens of one space-prefixed word; summing these approximates count_tokens of the joined text."""
+    return count_tokens(" " + word)
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """Longest prefix of text (cut at a word boundary) that fits in max_tokens."""
+    if max_tokens <= 0:
+        return ""
+    if count_tokens(text) <= max_tokens:
+        return text
+    kept, total = [], 0
+    for word in text.split():
+        cost = word_tokens(word)
+        if total + cost > max_tokens:
+            break
+        kept.append(word)
+        total += cost
+    return " ".join(kept)
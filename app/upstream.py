@@ -0,0 +1,251 @@
+import asyncio
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict, Hashable, Optional
+
+from app.metrics import metrics
+
+# Time budget for all upstream work of one request (queueing, retries, calls)
+UPSTREAM_DEADLINE = float(os.getenv("UPSTREAM_DEADLINE_SECONDS", "20"))
+# Per-process limits; with N gunicorn workers the server allows N times as many
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "32"))
+OPENAI_MAX_QUEUE = int(os.getenv("OPENAI_MAX_QUEUE", "256"))
+VECTOR_MAX_CONCURRENCY = int(os.getenv("VECTOR_MAX_CONCURRENCY", "16"))
+VECTOR_MAX_QUEUE = int(os.getenv("VECTOR_MAX_QUEUE", "256"))
+# Full-jitter exponential backoff on 429 / 5xx / connection errors
+BACKOFF_RETRIES = int(os.getenv("UPSTREAM_RETRIES", "3"))
+BACKOFF_BASE = float(os.getenv("UPSTREAM_BACKOFF_BASE", "0.5"))
+BACKOFF_CAP = float(os.getenv("UPSTREAM_BACKOFF_CAP", "8"))
+SINGLE_FLIGHT = os.getenv("UPSTREAM_SINGLE_FLIGHT", "1") != "0"
+
+COALESCED = metrics.counter(
+    "pmcbot_upstream_coalesced_total", "Calls answered by an identical call already in flight.", ("service",))
+RETRIES = metrics.counter(
+    "pmcbot_upstream_retries_total", "Upstream calls retried after a 429, 5xx or connection error.", ("service",))
+REJECTED = metrics.counter(
+    "pmcbot_upstream_rejected_total", "Upstream calls given up on: queue full, deadline or retries exhausted.",
+    ("service", "reason"))
+
+
+class Overloaded(Exception):
+    """An upstream limit, queue or deadline was exceeded; the caller should degrade instead of failing."""
+
+    def __init__(self, service: str, reason: str, detail: str = ""):
+        super().__init__(f"{service}: {reason}" + (f" ({detail})" if detail else ""))
+        self.service = service
+        # queue_full, deadline or retries
+        self.reason = reason
+
+
+class Deadline:
+    def __init__(self, seconds: float = UPSTREAM_DEADLINE):
+        self.expires = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires - time.monotonic())
+
+
+def _status(error: BaseException) -> Optional[int]:
+    # openai: status_code, pinecone: status
+    status = getattr(error, "status_code", None) or getattr(error, "status", None)
+    return status if isinstance(status, int) else None
+
+
+def is_openai_error(error: BaseException, name: str = "APIError") -> bool:
+    """isinstance(error, openai.<name>) without importing openai (if it isn't loaded, nothing raised one)."""
+    openai = sys.modules.get("openai")
+    return openai is not None and isinstance(error, getattr(openai, name))
+
+
+def is_transient(error: BaseException) -> bool:
+    status = _status(error)
+    if status is not None:
+        return status == 429 or status >= 500
+    return (isinstance(error, (ConnectionError, TimeoutError, asyncio.TimeoutError))
+            or is_openai_error(error, "APIConnectionError"))
+
+
+def retry_delay(error: BaseException, attempt: int) -> float:
+    """Retry-After when the server sends one, otherwise full jitter: uniform(0, min(cap, base * 2^attempt))."""
+    response = getattr(error, "response", None)
+    retry_after = getattr(response, "headers", {}).get("retry-after") if response is not None else None
+    try:
+        if retry_after is not None:
+            return min(BACKOFF_CAP, float(retry_after))
+    except ValueError:
+        pass
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+
+class SingleFlight:
+    """Concurrent async calls with the same key share one in-flight call (and its result or error)."""
+
+    def __init__(self, service: str, enabled: bool = SINGLE_FLIGHT):
+        self.service = service
+        self.enabled = enabled
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable]):
+        if not self.enabled or key is None:
+            return await factory()
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            COALESCED.inc(self.service)
+        # A caller that gives up must not cancel the call the others are waiting on
+        return await asyncio.shield(task)
+
+
+class ThreadSingleFlight:
+    """SingleFlight for the synchronous path (callers on different threads)."""
+
+    def __init__(self, service: str, enabled: bool = SINGLE_FLIGHT):
+        self.service = service
+        self.enabled = enabled
+        self._inflight: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable):
+        if not self.enabled or key is None:
+            return fn()
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+        if not leader:
+            COALESCED.inc(self.service)
+            return future.result()
+        try:
+            future.set_result(fn())
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+        return future.result()
+
+
+class ConcurrencyLimiter:
+    """
+    At most `limit` concurrent calls; up to `max_queue` more wait for a slot,
+    each no longer than its request's deadline. Anything beyond that is
+    rejected at once with Overloaded, so a burst sheds load instead of piling
+    up behind a rate-limited upstream.
+    """
+
+    def __init__(self, service: str, limit: int, max_queue: int):
+        self.service = service
+        self.limit = limit
+        self.max_queue = max_queue
+        self.waiting = 0
+        self._semaphore = None
+        self._thread_semaphore = threading.BoundedSemaphore(limit)
+
+    @asynccontextmanager
+    async def slot(self, deadline: Deadline):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.limit)
+        if self._semaphore.locked() and self.waiting >= self.max_queue:
+            REJECTED.inc(self.service, "queue_full")
+            raise Overloaded(self.service, "queue_full")
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), deadline.remaining())
+        except asyncio.TimeoutError:
+            REJECTED.inc(self.service, "deadline")
+            raise Overloaded(self.service, "deadline", "while queued") from None
+        finally:
+            self.waiting -= 1
+        try:
+            yield
+        finally:
+            self._semaphore.release()
+
+    def acquire_sync(self, deadline: Deadline) -> None:
+        if not self._thread_semaphore.acquire(timeout=deadline.remaining()):
+            REJECTED.inc(self.service, "deadline")
+            raise Overloaded(self.service, "deadline", "while queued")
+
+    def release_sync(self) -> None:
+        self._thread_semaphore.release()
+
+
+limiters = {
+    "openai": ConcurrencyLimiter("openai", OPENAI_MAX_CONCURRENCY, OPENAI_MAX_QUEUE),
+    "vector": ConcurrencyLimiter("vector", VECTOR_MAX_CONCURRENCY, VECTOR_MAX_QUEUE),
+}
+single_flights = {name: SingleFlight(name) for name in limiters}
+thread_single_flights = {name: ThreadSingleFlight(name) for name in limiters}
+
+
+def _give_up(service: str, error: BaseException, attempt: int, deadline: Deadline) -> Optional[float]:
+    """Delay before the next attempt, or None when the error is final."""
+    if not is_transient(error):
+        return None
+    delay = retry_delay(error, attempt)
+    if attempt >= BACKOFF_RETRIES or delay >= deadline.remaining():
+        REJECTED.inc(service, "retries")
+        raise Overloaded(service, "retries", f"gave up after {attempt + 1} attempts: {error}") from error
+    RETRIES.inc(service)
+    return delay
+
+
+async def with_backoff(service: str, factory: Callable[[], Awaitable], deadline: Deadline):
+    """Await factory() (a fresh call per attempt), retrying transient errors within the deadline."""
+    attempt = 0
+    while True:
+        try:
+            return await asyncio.wait_for(factory(), deadline.remaining())
+        except asyncio.TimeoutError:
+            REJECTED.inc(service, "deadline")
+            raise Overloaded(service, "deadline") from None
+        except Exception as e:
+            delay = _give_up(service, e, attempt, deadline)
+            if delay is None:
+                raise
+        await asyncio.sleep(delay)
+        attempt += 1
+
+
+def with_backoff_sync(service: str, fn: Callable, deadline: Deadline):
+    attempt = 0
+    while True:
+        try:
+            return fn()
+        except Exception as e:
+            delay = _give_up(service, e, attempt, deadline)
+            if delay is None:
+                raise
+        time.sleep(delay)
+        attempt += 1
+
+
+async def acall(service: str, factory: Callable[[], Awaitable], deadline: Deadline, key: Hashable = None):
+    """Single-flight by key -> concurrency slot -> call with backoff, all within the deadline."""
+    async def run():
+        async with limiters[service].slot(deadline):
+            return await with_backoff(service, factory, deadline)
+
+    return await single_flights[service].do(key, run)
+
+
+def call(service: str, fn: Callable, deadline: Deadline, key: Hashable = None):
+    """Synchronous counterpart of acall."""
+    def run():
+        limiter = limiters[service]
+        limiter.acquire_sync(deadline)
+        try:
+            return with_backoff_sync(service, fn, deadline)
+        finally:
+            limiter.release_sync()
+
+    return thread_single_flights[service].do(key, run)
@@ -1,19 +1,120 @@
 import json
 import os
-from typing import Dict, List, Optional
+import re
+import time
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+_URL_PATTERN = re.compile(r'https?://[^\s\)]+')
+# Drupal backend; never shown to users
+BACKEND_API_PREFIX = "https://webadmin.pmc.gov.in/api/"
+_TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+
+
+def normalize_api_url(url: str) -> Tuple[str, str]:
+    """
+    Split an API URL into (url without the lang parameter, lang) so that
+    '...?lang=en', '...' and '...?foo=1&lang=en' variants share one key.
+    A missing lang means English, which is what the Drupal API defaults to.
+    """
+    parts = urlsplit(url)
+    params = parse_qsl(parts.query, keep_blank_values=True)
+    lang = next((value for key, value in params if key == 'lang'), 'en') or 'en'
+    query = urlencode([(key, value) for key, value in params if key != 'lang'])
+    return urlunsplit((parts.scheme, parts.netloc.lower(), parts.path.rstrip('/'), query, '')), lang.lower()
+
+
+class _MappingIndex:
+    """Lookup structures built once per load of the mappings file."""
+
+    def __init__(self, mappings_data: Optional[dict]):
+        self.by_api = {}
+        self.by_normalized = {}
+        self.verified = []
+        self.frontend_urls = set()
+        self.token_index = {}
+        self.keyword_cache = {}
+
+        for mapping in (mappings_data or {}).get('mappings', []):
+            api_url = mapping.get('api_url')
+            frontend_url = mapping.get('frontend_url')
+            if mapping.get('manual_verdict') != 'correct' or not frontend_url:
+                continue
+
+            position = len(self.verified)
+            self.verified.append({'api_url': api_url, 'frontend_url': frontend_url})
+            self.frontend_urls.add(frontend_url)
+
+            if api_url:
+                # First verified mapping wins, as with the old linear scan
+                self.by_api.setdefault(api_url, frontend_url)
+                self.by_normalized.setdefault(normalize_api_url(api_url), frontend_url)
+
+            tokens = set(_TOKEN_PATTERN.findall((api_url or '').lower()))
+            tokens.update(_TOKEN_PATTERN.findall(frontend_url.lower()))
+            for token in tokens:
+                self.token_index.setdefault(token, []).append(position)
+
+    def lookup(self, api_url: str) -> Optional[str]:
+        frontend_url = self.by_api.get(api_url)
+        if frontend_url is None and api_url:
+            frontend_url = self.by_normalized.get(normalize_api_url(api_url))
+        return frontend_url
+
+    def search(self, keyword: str) -> List[int]:
+        positions = self.keyword_cache.get(keyword)
+        if positions is None:
+            keyword_tokens = _TOKEN_PATTERN.findall(keyword)
+            if len(keyword_tokens) == 1 and keyword_tokens[0] == keyword:
+                # Substring match against the token vocabulary, not every URL
+                found = set()
+                for token, token_positions in self.token_index.items():
+                    if keyword in token:
+                        found.update(token_positions)
+                positions = sorted(found)
+            else:
+                # Keywords spanning punctuation: fall back to the plain scan
+                positions = [
+                    i for i, m in enumerate(self.verified)
+                    if keyword in (m['api_url'] or '').lower() or keyword in m['frontend_url'].lower()
+                ]
+            if len(self.keyword_cache) < 10000:
+                self.keyword_cache[keyword] = positions
+        return positions
+
 
 class URLMapper:
-    def __init__(self, mapping_file_path: str = "clean_api_frontend_mappings.json"):
+    def __init__(self, mapping_file_path: str = "clean_api_frontend_mappings.json", reload_interval: float = None,
+                 lazy: bool = False):
         self.mapping_file_path = mapping_file_path
+        self.reload_interval = reload_interval if reload_interval is not None else float(
+            os.getenv("URL_MAPPINGS_RELOAD_INTERVAL", "5"))
         self.mappings_data = None
-        self.load_mappings()
-    
+        self._index = _MappingIndex(None)
+        self._mtime = None
+        self._checked_at = time.monotonic()
+        self._attempted = False
+        if not lazy:
+            self.load_mappings()
+
+    def _file_mtime(self) -> Optional[int]:
+        try:
+            return os.stat(self.mapping_file_path).st_mtime_ns
+        except OSError:
+            return None
+
     def load_mappings(self):
-        """Load the complete mappings data from JSON file for direct lookup."""
+        """Load the complete mappings data from JSON file and build the lookup indexes."""
+        self._attempted = True
         try:
             if os.path.exists(self.mapping_file_path):
+                mtime = self._file_mtime()
                 with open(self.mapping_file_path, 'r', encoding='utf-8') as f:
-                    self.mappings_data = json.load(f)
+                    mappings_data = json.load(f)
+                # Build first, then swap, so concurrent lookups never see a half-built index
+                self._index = _MappingIndex(mappings_data)
+                self.mappings_data = mappings_data
+                self._mtime = mtime
                 print(f"Loaded clean mappings data from {self.mapping_file_path}")
                 print(f"Total mappings: {self.mappings_data.get('total_mappings', 0)}")
                 print(f"Correct mappings: {self.mappings_data.get('correct_mappings', 0)}")
@@ -21,76 +122,73 @@ class URLMapper:
                 print(f"Warning: Mapping file {self.mapping_file_path} not found")
         except Exception as e:
             print(f"Error loading URL mappings: {e}")
-    
+
+    @property
+    def ready(self) -> bool:
+        return self.mappings_data is not None
+
+    def warm_up(self) -> None:
+        """Load the mappings now rather than on the first lookup."""
+        self._current_index()
+
+    def _current_index(self) -> _MappingIndex:
+        """Hot reload: re-read the JSON file when its mtime changes (checked every reload_interval s)."""
+        if not self._attempted:
+            self.load_mappings()
+        elif self.reload_interval >= 0:
+            now = time.monotonic()
+            if now - self._checked_at >= self.reload_interval:
+                self._checked_at = now
+                if self._file_mtime() != self._mtime:
+                    self.load_mappings()
+        return self._index
+
     def get_frontend_url(self, api_url: str) -> Optional[str]:
         """Direct lookup of frontend URL from manually verified mappings."""
-        if not self.mappings_data:
-            return None
-            
-        mappings = self.mappings_data.get('mappings', [])
-        
-        # Direct search through mappings for exact API URL match
-        for mapping in mappings:
-            if (mapping.get('api_url') == api_url and 
-                mapping.get('manual_verdict') == 'correct' and
-                mapping.get('frontend_url')):
-                return mapping.get('frontend_url')
-        
-        return None
-    
+        return self._current_index().lookup(api_url)
+
+    def is_verified_frontend_url(self, url: str) -> bool:
+        return url in self._current_index().frontend_urls
+
+    def resolve_links(self, links, limit: int = None) -> List[str]:
+        """
+        A document's links as user-facing URLs, ranked: verified frontend pages
+        first, then other public links (files, external sites), each in
+        document order. Unmapped backend API URLs and duplicates are dropped.
+        """
+        index = self._current_index()
+        mapped, other = {}, {}
+        for link in links:
+            frontend_url = index.lookup(link)
+            if frontend_url:
+                mapped.setdefault(frontend_url)
+            elif not link.startswith(BACKEND_API_PREFIX):
+                other.setdefault(link)
+        resolved = list(mapped) + [link for link in other if link not in mapped]
+        return resolved[:limit] if limit else resolved
+
     def convert_urls_in_text(self, text: str) -> str:
-        """Convert all backend URLs in a text to their frontend equivalents using direct lookup."""
-        if not text or not self.mappings_data:
+        """Convert all backend URLs in a text to their frontend equivalents in a single regex pass."""
+        if not text:
             return text
-            
-        # Find all URLs in the text
-        import re
-        url_pattern = r'https?://[^\s\)]+'
-        urls = re.findall(url_pattern, text)
-        
-        converted_text = text
-        for url in urls:
-            frontend_url = self.get_frontend_url(url)
-            if frontend_url:
-                converted_text = converted_text.replace(url, frontend_url)
-        
-        return converted_text
-    
+        index = self._current_index()
+        if not index.verified:
+            return text
+
+        def replace(match):
+            url = match.group(0)
+            return index.lookup(url) or url
+
+        return _URL_PATTERN.sub(replace, text)
+
     def get_all_frontend_urls(self) -> List[str]:
         """Get all manually verified frontend URLs."""
-        if not self.mappings_data:
-            return []
-            
-        frontend_urls = []
-        mappings = self.mappings_data.get('mappings', [])
-        
-        for mapping in mappings:
-            if (mapping.get('manual_verdict') == 'correct' and 
-                mapping.get('frontend_url')):
-                frontend_urls.append(mapping.get('frontend_url'))
-        
-        return frontend_urls
-    
+        return [m['frontend_url'] for m in self._current_index().verified]
+
     def search_mappings_by_keyword(self, keyword: str) -> List[Dict]:
-        """Search for mappings that contain the keyword using direct JSON lookup."""
-        if not self.mappings_data:
-            return []
-            
-        results = []
-        keyword_lower = keyword.lower()
-        mappings = self.mappings_data.get('mappings', [])
-        
-        for mapping in mappings:
-            if (mapping.get('manual_verdict') == 'correct' and
-                mapping.get('frontend_url') and
-                (keyword_lower in mapping.get('api_url', '').lower() or 
-                 keyword_lower in mapping.get('frontend_url', '').lower())):
-                results.append({
-                    'api_url': mapping.get('api_url'),
-                    'frontend_url': mapping.get('frontend_url')
-                })
-        
-        return results
-
-# Global instance
-url_mapper = URLMapper() 
\ No newline at end of file
+        """Search for mappings whose API or frontend URL contains the keyword (inverted token index)."""
+        index = self._current_index()
+        return [dict(index.verified[i]) for i in index.search(keyword.lower())]
+
+# Global instance; the 90KB JSON is parsed on first lookup or at warm-up
+url_mapper = URLMapper(lazy=True)
@@ -1,26 +1,315 @@
+import asyncio
+import json
 import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 load_dotenv()
 
-from pinecone import Pinecone, ServerlessSpec
+import numpy as np
 
-pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
-index_name = os.getenv("PINECONE_INDEX_NAME")
+from app.metrics import count_errors
+from app.providers import register
 
-if index_name not in pc.list_indexes().names():
-    pc.create_index(
-        name=index_name,
-        dimension=384,
-        metric="cosine",
-        spec=ServerlessSpec(cloud="aws", region=os.getenv("PINECONE_ENV"))
-    )
+DIMENSION = 384
 
-index = pc.Index(index_name)
+
+class VectorStore:
+    """
+    Minimal interface shared by the vector backends. Matches are returned in
+    Pinecone's shape: [{"id": ..., "score": ..., "metadata": {...}}, ...].
+    """
+
+    # query_batch answers many queries in one operation (not one call per query)
+    batch_queries = False
+
+    def query(self, embedding, top_k=5):
+        raise NotImplementedError
+
+    def query_batch(self, embeddings, top_k=5):
+        return [self.query(embedding, top_k=top_k) for embedding in embeddings]
+
+    def upsert(self, vectors):
+        """vectors: iterable of (id, values, metadata)"""
+        raise NotImplementedError
+
+    def delete(self, ids):
+        raise NotImplementedError
+
+    def reset(self):
+        raise NotImplementedError
+
+    def warm_up(self):
+        """Open connections / load data ahead of the first query."""
+
+
+class PineconeStore(VectorStore):
+    """Pinecone serverless index. The client connects on first use, not at import."""
+
+    name = "pinecone"
+
+    # Pinecone caps upsert requests at 1000 vectors / 2MB
+    MAX_UPSERT_VECTORS = 100
+    MAX_UPSERT_BYTES = 1_500_000
+
+    def __init__(self, api_key=None, index_name=None, region=None):
+        self.api_key = api_key or os.getenv("PINECONE_API_KEY")
+        self.index_name = index_name or os.getenv("PINECONE_INDEX_NAME")
+        self.region = region or os.getenv("PINECONE_ENV")
+        self._pc = None
+        self._index = None
+        self._lock = threading.Lock()
+
+    @property
+    def pc(self):
+        if self._pc is None:
+            from pinecone import Pinecone
+            self._pc = Pinecone(api_key=self.api_key)
+        return self._pc
+
+    @property
+    def index(self):
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    self._ensure_index()
+                    self._index = self.pc.Index(self.index_name)
+        return self._index
+
+    def _ensure_index(self):
+        from pinecone import ServerlessSpec
+
+        if self.index_name not in self.pc.list_indexes().names():
+            print(f"📦 Creating index '{self.index_name}'...")
+            self.pc.create_index(
+                name=self.index_name,
+                dimension=DIMENSION,
+                metric="cosine",
+                spec=ServerlessSpec(cloud="aws", region=self.region)
+            )
+
+    def warm_up(self):
+        self.index
+
+    @staticmethod
+    def _as_dict(match) -> dict:
+        # The SDK returns ScoredVector objects; the retrieval code spreads and copies plain dicts
+        return {"id": match["id"], "score": match["score"], "metadata": dict(match.get("metadata") or {})}
+
+    def query(self, embedding, top_k=5):
+        result = self.index.query(vector=embedding, top_k=top_k, include_metadata=True)
+        return [self._as_dict(match) for match in result["matches"]]
+
+    def upsert(self, vectors):
+        self.index.upsert(vectors=list(vectors))
+
+    def delete(self, ids):
+        self.index.delete(ids=list(ids))
+
+    def reset(self):
+        if self.index_name in self.pc.list_indexes().names():
+            print(f"🧹 Deleting existing index '{self.index_name}'...")
+            self.pc.delete_index(self.index_name)
+        else:
+            print(f"⚠️ Index '{self.index_name}' not found, nothing to reset.")
+        self._index = None
+
+
+class LocalStore(VectorStore):
+    """
+    In-process index for small corpora. Vectors are L2-normalized float32 rows
+    in a memory-mapped file (vectors.f32) with ids/metadata in meta.json, so a
+    top-k cosine query is a single matmul over the matrix.
+    """
+
+    name = "local"
+    batch_queries = True
+    VECTORS_FILE = "vectors.f32"
+    META_FILE = "meta.json"
+
+    def __init__(self, path=None, dimension=DIMENSION, reload_interval=5.0):
+        self.path = path or os.getenv("LOCAL_INDEX_DIR", os.path.join("data", "local_index"))
+        self.dimension = dimension
+        self.reload_interval = reload_interval
+        self.ids = []
+        self.metadata = []
+        self.matrix = np.zeros((0, dimension), dtype=np.float32)
+        self._loaded_version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._maybe_reload(force=True)
+
+    def _meta_path(self):
+        return os.path.join(self.path, self.META_FILE)
+
+    def _vectors_path(self):
+        return os.path.join(self.path, self.VECTORS_FILE)
+
+    def _version(self):
+        try:
+            return os.stat(self._meta_path()).st_mtime_ns
+        except OSError:
+            return None
+
+    def _maybe_reload(self, force=False):
+        """Pick up an index rebuilt by load_to_pinecone.py in another process."""
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.reload_interval:
+            return
+        self._checked_at = now
+        version = self._version()
+        if version is None or version == self._loaded_version:
+            return
+        with self._lock:
+            with open(self._meta_path(), encoding="utf-8") as f:
+                meta = json.load(f)
+            count = meta["count"]
+            if count:
+                matrix = np.memmap(self._vectors_path(), dtype=np.float32, mode="r",
+                                   shape=(count, meta["dimension"]))
+            else:
+                matrix = np.zeros((0, meta["dimension"]), dtype=np.float32)
+            self.ids, self.metadata, self.matrix = meta["ids"], meta["metadata"], matrix
+            self.dimension = meta["dimension"]
+            self._loaded_version = version
+
+    @staticmethod
+    def _normalize(vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def _top_k(self, scores, top_k):
+        if scores.shape[-1] <= top_k:
+            order = np.argsort(-scores, axis=-1)
+        else:
+            part = np.argpartition(-scores, top_k - 1, axis=-1)[..., :top_k]
+            part_scores = np.take_along_axis(scores, part, axis=-1)
+            order = np.take_along_axis(part, np.argsort(-part_scores, axis=-1), axis=-1)
+        return order
+
+    @staticmethod
+    def _matches(ids, metadata, scores, order):
+        return [
+            {"id": ids[i], "score": float(scores[i]), "metadata": metadata[i]}
+            for i in order
+        ]
+
+    def query(self, embedding, top_k=5):
+        return self.query_batch([embedding], top_k=top_k)[0]
+
+    def query_batch(self, embeddings, top_k=5):
+        self._maybe_reload()
+        ids, metadata, matrix = self.ids, self.metadata, self.matrix
+        if not ids:
+            return [[] for _ in embeddings]
+        queries = self._normalize(np.atleast_2d(np.asarray(embeddings, dtype=np.float32)))
+        scores = queries @ matrix.T
+        orders = self._top_k(scores, top_k)
+        return [self._matches(ids, metadata, row_scores, row_order) for row_scores, row_order in zip(scores, orders)]
+
+    def _save(self, ids, metadata, matrix):
+        """Write vectors + metadata to temp files, then swap them in atomically."""
+        os.makedirs(self.path, exist_ok=True)
+        tmp_vectors = self._vectors_path() + ".tmp"
+        tmp_meta = self._meta_path() + ".tmp"
+        np.ascontiguousarray(matrix, dtype=np.float32).tofile(tmp_vectors)
+        with open(tmp_meta, "w", encoding="utf-8") as f:
+            json.dump({"dimension": self.dimension, "count": len(ids), "ids": ids, "metadata": metadata},
+                      f, ensure_ascii=False)
+        os.replace(tmp_vectors, self._vectors_path())
+        os.replace(tmp_meta, self._meta_path())
+        self._maybe_reload(force=True)
+
+    def upsert(self, vectors):
+        vectors = list(vectors)
+        if not vectors:
+            return
+        positions = {vid: i for i, vid in enumerate(self.ids)}
+        ids, metadata = list(self.ids), list(self.metadata)
+        matrix = np.array(self.matrix, dtype=np.float32)
+        existing = len(ids)
+        new_rows = []
+        for vid, values, meta in vectors:
+            row = self._normalize(values)
+            if vid in positions:
+                pos = positions[vid]
+                if pos < existing:
+                    matrix[pos] = row
+                else:
+                    new_rows[pos - existing] = row
+                metadata[pos] = meta
+            else:
+                positions[vid] = len(ids)
+                ids.append(vid)
+                metadata.append(meta)
+                new_rows.append(row)
+        if new_rows:
+            matrix = np.vstack([matrix, np.stack(new_rows)])
+        self._save(ids, metadata, matrix)
+
+    def delete(self, ids):
+        drop = set(ids)
+        keep = [i for i, vid in enumerate(self.ids) if vid not in drop]
+        self._save([self.ids[i] for i in keep], [self.metadata[i] for i in keep],
+                   np.asarray(self.matrix, dtype=np.float32)[keep])
+
+    def reset(self):
+        if os.path.isdir(self.path):
+            print(f"🧹 Deleting local index at '{self.path}'...")
+            shutil.rmtree(self.path)
+        self.ids, self.metadata = [], []
+        self.matrix = np.zeros((0, self.dimension), dtype=np.float32)
+        self._loaded_version = None
+
+
+def get_store(backend=None) -> VectorStore:
+    """Build the configured backend: VECTOR_BACKEND=pinecone (default) or local."""
+    backend = (backend or os.getenv("VECTOR_BACKEND", "pinecone")).lower()
+    if backend == "local":
+        return LocalStore()
+    if backend == "pinecone":
+        return PineconeStore()
+    raise ValueError(f"Unknown vector backend: {backend}")
+
+
+# Global instance, built on first use; a local index is mmapped before fork,
+# Pinecone connects in each worker
+store = register("vector_store", get_store, warm=lambda s: s.warm_up(),
+                 preload=os.getenv("VECTOR_BACKEND", "pinecone").lower() == "local")
 
 def upsert_embeddings(docs):
     to_upsert = [(doc["id"], doc["embedding"], doc["metadata"]) for doc in docs]
-    index.upsert(vectors=to_upsert)
+    store.get().upsert(to_upsert)
 
 def query_embedding(embedding, top_k=5):
-    result = index.query(vector=embedding, top_k=top_k, include_metadata=True)
-    return result["matches"]
+    backend = store.get()
+    with count_errors(backend.name):
+        return backend.query(embedding, top_k=top_k)
+
+def query_embeddings(embeddings, top_k=5):
+    """Batched query: one result list per embedding, in order."""
+    backend = store.get()
+    with count_errors(backend.name):
+        return backend.query_batch(embeddings, top_k=top_k)
+
+# Pinecone's query is blocking network I/O; offload it to its own pool so the
+# event loop stays free while the request waits on the round trip.
+_query_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("VECTOR_QUERY_WORKERS", "16")),
+    thread_name_prefix="vector-query",
+)
+
+async def aquery_embedding(embedding, top_k=5):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_query_executor, query_embedding, embedding, top_k)
+
+async def aquery_embeddings(embeddings, top_k=5):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_query_executor, query_embeddings, embeddings, top_k)
+
+def supports_batch_query() -> bool:
+    return store.get().batch_queries
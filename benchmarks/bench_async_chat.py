@@ -0,0 +1,139 @@
+"""
+Load test: sync /chat path (generate_answer on a 40-thread pool, like
+FastAPI's default threadpool) vs the async path (agenerate_answer).
+
+OpenAI, Pinecone and the embedding model are replaced by local stubs, see
+benchmarks/stubs.py.
+
+    python -m benchmarks.bench_async_chat --requests 400 --concurrency 100
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks import stubs
+
+QUERIES = [
+    "How do I pay property tax online?",
+    "Where can I get a birth certificate?",
+    "Tree cutting permission process",
+    "property tax kasa bharaycha",
+    "What is the contact number of the electrical department?",
+    "Plastic waste collection rules",
+    "E-waste collection centres in Pune",
+    "How to link aadhaar with property tax?",
+]
+
+# FastAPI/Starlette run sync endpoints on AnyIO's threadpool (40 tokens).
+SYNC_THREADPOOL_SIZE = 40
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    k = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[k]
+
+
+def summarize(name, latencies, wall, errors):
+    return {
+        "mode": name,
+        "requests": len(latencies),
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 1) if latencies else 0.0,
+        "rps": round(len(latencies) / wall, 1) if wall else 0.0,
+    }
+
+
+async def drive(name, handler, total, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def one(i):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await handler(QUERIES[i % len(QUERIES)], f"bench-{uuid.uuid4()}")
+            except Exception as e:
+                errors += 1
+                print(f"⚠️ {name} request failed: {e}")
+                return
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    return summarize(name, latencies, time.perf_counter() - start, errors)
+
+
+def run_sync(total, concurrency):
+    from app.rag import detect_language, generate_answer
+
+    pool = ThreadPoolExecutor(max_workers=SYNC_THREADPOOL_SIZE)
+
+    def chat(query, session_id):
+        return generate_answer(query, session_id, detect_language(query))
+
+    async def handler(query, session_id):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(pool, chat, query, session_id)
+
+    try:
+        return asyncio.run(drive("sync", handler, total, concurrency))
+    finally:
+        pool.shutdown()
+
+
+def run_async(total, concurrency):
+    from app.rag import detect_language, agenerate_answer
+
+    async def handler(query, session_id):
+        return await agenerate_answer(query, session_id, detect_language(query))
+
+    return asyncio.run(drive("async", handler, total, concurrency))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--openai-latency", type=float, default=0.3, help="stub completion latency (s)")
+    parser.add_argument("--vector-latency", type=float, default=0.05, help="stub vector query latency (s)")
+    parser.add_argument("--encode-ms", type=float, default=8.0, help="stub embedding time per call (ms)")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    # Repeated queries would otherwise be answered from the answer cache / link templates
+    os.environ.update(ANSWER_CACHE_ENABLED="0", NAV_FAST_PATH="0")
+    server = stubs.install(args.openai_latency, args.vector_latency, args.encode_ms / 1000)
+    try:
+        import app.rag  # noqa: F401  (imports run against the stubs)
+
+        # Keep the benchmark's request logs out of the working tree
+        os.chdir(tempfile.mkdtemp(prefix="pmcbot-bench-"))
+
+        results = [run_sync(args.requests, args.concurrency), run_async(args.requests, args.concurrency)]
+    finally:
+        server.stop()
+
+    print(f"{'mode':<8}{'requests':>10}{'errors':>8}{'p50 ms':>10}{'p99 ms':>10}{'rps':>10}")
+    for r in results:
+        print(f"{r['mode']:<8}{r['requests']:>10}{r['errors']:>8}{r['p50_ms']:>10}{r['p99_ms']:>10}{r['rps']:>10}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"benchmark": "async_chat", "params": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+/chat/batch vs the same messages sent as individual /chat requests.
+
+Runs the real FastAPI app under uvicorn against the local stubs and answers
+--size distinct questions three ways: one /chat after another, all /chat
+requests concurrently, and a single /chat/batch request. Reports wall time
+and how many encoder batches, vector queries and completion calls each
+scenario cost. --backend local serves retrieval from a LocalStore seeded like
+the stub Pinecone index, where the whole batch is one matrix product.
+
+    python -m benchmarks.bench_batch --size 32 --backend local
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+from benchmarks import stubs
+from benchmarks.bench_async_chat import QUERIES
+from benchmarks.bench_streaming_ttfb import start_server
+from benchmarks.bench_vector_backends import build_local
+from benchmarks.bench_workers import free_port
+
+
+VECTOR_CALLS = {"local": 0}
+
+
+def vector_calls():
+    return stubs.FakeIndex.queries + VECTOR_CALLS["local"]
+
+
+def count_local_queries():
+    from app.vector_store import LocalStore
+
+    query_batch = LocalStore.query_batch
+
+    def counted(self, embeddings, top_k=5):
+        VECTOR_CALLS["local"] += 1
+        return query_batch(self, embeddings, top_k)
+
+    LocalStore.query_batch = counted
+
+
+async def scenario(name, client, items, server):
+    from app.answer_cache import answer_cache
+    from app.embeddings import embedding_service
+
+    answer_cache.invalidate()
+    before = server.stats()
+    vector_before = vector_calls()
+    batches_before = embedding_service.batches
+
+    start = time.perf_counter()
+    if name == "batch":
+        response = await client.post("/chat/batch", json={"items": items})
+        response.raise_for_status()
+        errors = sum(1 for r in response.json()["results"] if r["error"])
+    elif name == "concurrent":
+        responses = await asyncio.gather(*(client.post("/chat", json=item) for item in items))
+        errors = sum(1 for r in responses if r.status_code != 200)
+    else:
+        errors = 0
+        for item in items:
+            errors += (await client.post("/chat", json=item)).status_code != 200
+    wall = time.perf_counter() - start
+
+    return {
+        "scenario": name,
+        "messages": len(items),
+        "errors": errors,
+        "wall_s": round(wall, 3),
+        "encode_batches": embedding_service.batches - batches_before,
+        "vector_calls": vector_calls() - vector_before,
+        "openai_calls": server.stats()["requests"] - before["requests"],
+    }
+
+
+async def run(args, server, base_url):
+    import httpx
+
+    results = []
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+        for name in ("sequential", "concurrent", "batch"):
+            # Fresh questions per scenario so no run is served from the query-embedding cache
+            items = [{"query": f"{QUERIES[i % len(QUERIES)]} ({name} {i})", "session_id": f"batch-{name}-{i}"}
+                     for i in range(args.size)]
+            results.append(await scenario(name, client, items, server))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=32, help="messages per scenario")
+    parser.add_argument("--openai-latency", type=float, default=0.3, help="stub completion latency (s)")
+    parser.add_argument("--vector-latency", type=float, default=0.05, help="stub vector query latency (s)")
+    parser.add_argument("--encode-seconds", type=float, default=0.008, help="stub encode time per batch (s)")
+    parser.add_argument("--backend", choices=["pinecone", "local"], default="pinecone")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    server = stubs.install(args.openai_latency, args.vector_latency, args.encode_seconds)
+    os.environ["CHAT_BATCH_MAX_ITEMS"] = str(max(args.size, 32))
+    if args.backend == "local":
+        local_store, _ = build_local(0)
+        os.environ.update(VECTOR_BACKEND="local", LOCAL_INDEX_DIR=os.path.abspath(local_store.path))
+        count_local_queries()
+    try:
+        # Keep the benchmark's request logs out of the working tree
+        uvicorn_server, thread = start_server(port := free_port())
+        os.chdir(tempfile.mkdtemp(prefix="pmcbot-bench-"))
+        results = asyncio.run(run(args, server, f"http://127.0.0.1:{port}"))
+        uvicorn_server.should_exit = True
+        thread.join(timeout=10)
+    finally:
+        server.stop()
+
+    print(f"backend: {args.backend}")
+    print(f"{'scenario':<14}{'msgs':>6}{'err':>5}{'wall s':>9}{'encode':>8}{'vector':>8}{'openai':>8}")
+    for r in results:
+        print(f"{r['scenario']:<14}{r['messages']:>6}{r['errors']:>5}{r['wall_s']:>9}{r['encode_batches']:>8}"
+              f"{r['vector_calls']:>8}{r['openai_calls']:>8}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"benchmark": "batch", "params": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Crawl benchmark against a local stand-in for the Drupal API.
+
+The stand-in server (separate process) serves one JSON document per
+data/urls.txt path with a configurable latency, sends ETag / Last-Modified
+and answers conditional requests with 304. Compared scenarios:
+
+- sequential: one bare requests.get per URL, like the old loader
+- cold:       ConcurrentFetcher with an empty on-disk cache
+- warm:       ConcurrentFetcher again, every page answered with 304
+- offline:    ConcurrentFetcher(offline=True), cache only
+
+    python -m benchmarks.bench_crawler --latency 0.05 --pages 443
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing
+import tempfile
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from benchmarks import stubs
+
+LAST_MODIFIED = formatdate(0, usegmt=True)
+
+
+def _page_body(path: str) -> bytes:
+    slug = path.rsplit("/", 1)[-1].split("?")[0]
+    return json.dumps({
+        "title": slug.replace("-", " "),
+        "summary": [f"<p>Details about <b>{slug}</b> from Pune Municipal Corporation.</p>"] * 5,
+        "internal_link": f"https://www.pmc.gov.in/en/{slug}",
+    }).encode("utf-8")
+
+
+class _DrupalHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    latency = 0.05
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        body = _page_body(self.path)
+        etag = '"' + hashlib.md5(body).hexdigest() + '"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", LAST_MODIFIED)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def _serve(port, latency):
+    handler = type("Handler", (_DrupalHandler,), {"latency": latency})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    server.request_queue_size = 1024
+    server.serve_forever()
+
+
+def local_urls(port, pages):
+    with open(f"{stubs.REPO_ROOT}/data/urls.txt") as f:
+        urls = list(dict.fromkeys(line.strip() for line in f if line.strip()))
+    urls = (urls * (pages // len(urls) + 1))[:pages] if pages > len(urls) else urls[:pages]
+    return [f"http://127.0.0.1:{port}{urlsplit(u).path}?{urlsplit(u).query}&n={i}" for i, u in enumerate(urls)]
+
+
+def run_sequential(urls):
+    import requests
+
+    for url in urls:
+        requests.get(url, timeout=10).json()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=443)
+    parser.add_argument("--latency", type=float, default=0.05, help="server latency per request (s)")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--host-rate", type=float, default=0, help="per-host requests/s limit (0 = off)")
+    parser.add_argument("--skip-sequential", action="store_true")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    from app.fetcher import ConcurrentFetcher, ResponseCache
+
+    port = stubs._free_port()
+    server = multiprocessing.Process(target=_serve, args=(port, args.latency), daemon=True)
+    server.start()
+    time.sleep(0.5)
+    urls = local_urls(port, args.pages)
+    cache = ResponseCache(tempfile.mkdtemp(prefix="pmcbot-http-cache-"))
+
+    results = []
+
+    def record(name, fn, fetcher=None):
+        start = time.perf_counter()
+        fn()
+        seconds = time.perf_counter() - start
+        row = {"scenario": name, "pages": len(urls), "seconds": round(seconds, 3),
+               "pages_per_s": round(len(urls) / seconds, 1)}
+        if fetcher is not None:
+            row.update(fetcher.stats.as_dict())
+        results.append(row)
+
+    def fetcher(offline=False):
+        return ConcurrentFetcher(cache=cache, max_concurrency=args.concurrency, per_host_rate=args.host_rate,
+                                 offline=offline)
+
+    try:
+        if not args.skip_sequential:
+            record("sequential", lambda: run_sequential(urls))
+        for name, offline in (("cold", False), ("warm (304)", False), ("offline", True)):
+            f = fetcher(offline)
+            record(name, lambda: f.fetch_all_sync(urls), f)
+    finally:
+        server.terminate()
+
+    print(f"{'scenario':<14}{'seconds':>10}{'pages/s':>10}{'downloaded':>12}{'304':>6}{'failed':>8}")
+    for r in results:
+        print(f"{r['scenario']:<14}{r['seconds']:>10}{r['pages_per_s']:>10}{r.get('downloaded', '-'):>12}"
+              f"{r.get('not_modified', '-'):>6}{r.get('failed', '-'):>8}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"benchmark": "crawler", "params": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
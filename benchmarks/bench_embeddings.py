@@ -0,0 +1,113 @@
+"""
+Embedding service per backend (torch, onnx, onnx-int8): model load time, RSS,
+single-query latency, throughput of sequential vs concurrent (micro-batched)
+queries, and cached lookups.
+
+Each backend runs in its own subprocess so load time and RSS are not
+shared. Needs sentence-transformers (plus `optimum[onnxruntime]` for the
+onnx backends); --stub swaps in the fake model from benchmarks/stubs.py to
+exercise the service itself.
+
+    python -m benchmarks.bench_embeddings --backends torch,onnx,onnx-int8 --queries 200
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.bench_async_chat import QUERIES, percentile
+from benchmarks.soak_sessions import rss_mb
+
+
+def unique_queries(n, tag):
+    return [f"{QUERIES[i % len(QUERIES)]} {tag} {i}" for i in range(n)]
+
+
+def measure(backend, queries, concurrency):
+    """Runs inside the per-backend subprocess."""
+    rss_before = rss_mb()
+    start = time.perf_counter()
+    from app.embeddings import EmbeddingService
+
+    service = EmbeddingService(backend=backend)
+    service.warm_up(background=False)
+    load_s = time.perf_counter() - start
+
+    single = []
+    for text in unique_queries(queries, "single"):
+        t = time.perf_counter()
+        service.embed(text)
+        single.append(time.perf_counter() - t)
+
+    texts = unique_queries(queries, "concurrent")
+    batches_before, batched_before = service.batches, service.batched_texts
+    t = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(service.embed, texts))
+    concurrent_s = time.perf_counter() - t
+
+    cached = []
+    for text in texts:
+        t = time.perf_counter()
+        service.embed(text.upper())
+        cached.append(time.perf_counter() - t)
+
+    batches = service.batches - batches_before
+    return {
+        "backend": backend,
+        "load_s": round(load_s, 2),
+        "rss_mb": rss_mb(),
+        "rss_model_mb": round(rss_mb() - rss_before, 1),
+        "single_p50_ms": round(percentile(single, 50) * 1000, 2),
+        "single_p99_ms": round(percentile(single, 99) * 1000, 2),
+        "sequential_qps": round(queries / sum(single), 1),
+        "concurrent_qps": round(queries / concurrent_s, 1),
+        "avg_batch": round((service.batched_texts - batched_before) / batches, 2) if batches else 0.0,
+        "cached_p50_us": round(percentile(cached, 50) * 1e6, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", default="torch,onnx,onnx-int8")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--stub", action="store_true", help="use the fake model from benchmarks/stubs.py")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    if args.child:
+        if args.stub:
+            from benchmarks import stubs
+            stubs.install().stop()
+        print(json.dumps(measure(args.child, args.queries, args.concurrency)))
+        return
+
+    results = []
+    for backend in args.backends.split(","):
+        cmd = [sys.executable, "-m", "benchmarks.bench_embeddings", "--child", backend,
+               "--queries", str(args.queries), "--concurrency", str(args.concurrency)]
+        if args.stub:
+            cmd.append("--stub")
+        proc = subprocess.run(cmd, capture_output=True, text=True)
+        if proc.returncode != 0:
+            print(f"⚠️ {backend} failed:\n{proc.stderr.strip().splitlines()[-1] if proc.stderr else ''}")
+            continue
+        results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    columns = ["backend", "load_s", "rss_mb", "single_p50_ms", "single_p99_ms", "sequential_qps",
+               "concurrent_qps", "avg_batch", "cached_p50_us"]
+    print("".join(f"{c:>16}" for c in columns))
+    for r in results:
+        print("".join(f"{str(r[c]):>16}" for c in columns))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"benchmark": "embeddings", "params": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+Extraction stage (drupal_loader.extract_pages): pages per second on a saved
+corpus of the data/urls.txt responses.
+
+The corpus is a ResponseCache directory, i.e. what a crawl leaves in
+HTTP_CACHE_DIR (data/http_cache by default). Without one, --synthesize
+writes Drupal-shaped responses for every data/urls.txt entry (nested
+paragraphs, summary HTML with entities, lists, tables and links) into a
+temporary cache first.
+
+Compared: the previous implementation (recursive walk, one BeautifulSoup
+tree per summary block), the current one in-process, and the current one
+across --workers processes. Every page's (text, links) is checked to be
+identical to the previous implementation's.
+
+    python -m benchmarks.bench_extract --corpus data/http_cache --workers 4
+    python -m benchmarks.bench_extract --synthesize --repeat 5
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+from bs4 import BeautifulSoup
+
+from benchmarks import stubs
+
+
+def reference_extract(data):
+    """extract_text_and_links as it was before the streaming parser and the iterative walk."""
+    texts = []
+    links = {}
+
+    def clean_html(html_content):
+        return BeautifulSoup(html_content, "html.parser").get_text(separator=" ", strip=True)
+
+    def recurse(obj):
+        if isinstance(obj, dict):
+            for key in ['title', 'detail_summary', 'sub_summary']:
+                if key in obj and obj[key]:
+                    texts.append(str(obj[key]))
+            if 'summary' in obj and isinstance(obj['summary'], list):
+                for html_block in obj['summary']:
+                    texts.append(clean_html(html_block))
+            if 'descriptions' in obj and obj['descriptions']:
+                for desc in obj['descriptions']:
+                    texts.append(str(desc))
+            for link_key in ['internal_link', 'external_link', 'file_url', 'paragraph_file_url', 'node_file_url']:
+                url = obj.get(link_key)
+                if url:
+                    links.setdefault(url)
+            if 'pdf_files' in obj:
+                for pdf in obj['pdf_files']:
+                    if 'file_url' in pdf:
+                        links.setdefault(pdf['file_url'])
+                    if 'pdf_title' in pdf:
+                        texts.append(pdf['pdf_title'])
+            for v in obj.values():
+                recurse(v)
+        elif isinstance(obj, list):
+            for item in obj:
+                recurse(item)
+
+    recurse(data)
+    return " ".join(texts), list(links)
+
+
+def _summary_html(rng, slug):
+    words = slug.replace("-", " ")
+    blocks = [
+        f"<p>Information about <strong>{words}</strong>&nbsp;from Pune Municipal Corporation.</p>",
+        f"<ul><li>Apply online</li><li>Documents &amp; fees</li><li>Contact the {words} office</li></ul>",
+        "<table><tr><th>Ward</th><th>Phone</th></tr><tr><td>Kasba</td><td>020-2550 1000</td></tr></table>",
+        f'<p>See <a href="https://www.pmc.gov.in/en/{slug}">the {words} page</a> for details.</p>',
+        "<p>मालमत्ता कर भरण्यासाठी ऑनलाइन सुविधा उपलब्ध आहे.</p>",
+        "<p>Office hours:<br>10:00 &ndash; 17:45, Monday to Friday</p>",
+        "<p>Citizen&#8217;s charter</p>",
+    ]
+    return "\n".join(rng.choice(blocks) for _ in range(rng.randint(3, 12)))
+
+
+def synthetic_page(url, rng):
+    slug = url.split("/api/")[-1].split("?")[0].rsplit("/", 1)[-1]
+    paragraphs = [{
+        "title": f"{slug.replace('-', ' ')} section {i}",
+        "summary": [_summary_html(rng, slug) for _ in range(rng.randint(1, 3))],
+        "internal_link": f"https://webadmin.pmc.gov.in/api/basic-page/{slug}-{i}?lang=en",
+        "pdf_files": [{"file_url": f"https://webadmin.pmc.gov.in/sites/default/files/{slug}-{i}.pdf",
+                       "pdf_title": f"{slug} form {i}"}],
+    } for i in range(rng.randint(2, 8))]
+    return {"data": {"title": slug.replace("-", " "), "detail_summary": f"About {slug}",
+                     "paragraphs": paragraphs, "descriptions": [f"{slug} description"]}}
+
+
+def urls_from_file():
+    with open(os.path.join(stubs.REPO_ROOT, "data", "urls.txt")) as f:
+        return list(dict.fromkeys(line.strip() for line in f if line.strip()))
+
+
+def synthesize_corpus(directory, seed=0):
+    from app.fetcher import ResponseCache
+
+    rng = random.Random(seed)
+    cache = ResponseCache(directory)
+    for url in urls_from_file():
+        cache.put(url, json.dumps(synthetic_page(url, rng)).encode("utf-8"))
+    return directory
+
+
+def load_corpus(directory):
+    from app.fetcher import ResponseCache
+
+    cache = ResponseCache(directory)
+    pages = {}
+    for url in urls_from_file():
+        entry = cache.get(url)
+        if entry is not None:
+            pages[url] = json.loads(entry[1])
+    return pages
+
+
+def timed(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help="ResponseCache directory with the data/urls.txt responses")
+    parser.add_argument("--synthesize", action="store_true", help="write a synthetic corpus first")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="processes for the pool run")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per scenario (best is reported)")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    from app.drupal_loader import extract_pages
+
+    directory = args.corpus or os.getenv("HTTP_CACHE_DIR", os.path.join("data", "http_cache"))
+    if args.synthesize:
+        directory = synthesize_corpus(tempfile.mkdtemp(prefix="pmcbot-extract-corpus-"))
+    pages = load_corpus(directory)
+    if not pages:
+        raise SystemExit(f"no cached responses for data/urls.txt in {directory} (crawl first or pass --synthesize)")
+
+    reference, reference_s = timed(lambda: {url: reference_extract(data) for url, data in pages.items()},
+                                   args.repeat)
+    scenarios = [("previous (recursive + BeautifulSoup)", reference_s, reference)]
+    for name, workers in (("current, in-process", 1), (f"current, {args.workers} processes", args.workers)):
+        (extracted, failures), seconds = timed(lambda: extract_pages(pages, workers), args.repeat)
+        scenarios.append((name, seconds, extracted))
+
+    results = []
+    for name, seconds, extracted in scenarios:
+        mismatches = [url for url in pages if extracted.get(url) != reference[url]]
+        results.append({
+            "scenario": name,
+            "pages": len(pages),
+            "seconds": round(seconds, 3),
+            "pages_per_s": round(len(pages) / seconds, 1),
+            "speedup": round(reference_s / seconds, 2),
+            "identical": not mismatches,
+            "mismatched_pages": mismatches[:10],
+        })
+
+    print(f"corpus: {directory} ({len(pages)} pages)")
+    print(f"{'scenario':<40}{'seconds':>9}{'pages/s':>10}{'speedup':>9}{'identical':>11}")
+    for r in results:
+        print(f"{r['scenario']:<40}{r['seconds']:>9}{r['pages_per_s']:>10}{r['speedup']:>9}{str(r['identical']):>11}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"benchmark": "extract", "params": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
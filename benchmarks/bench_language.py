@@ -0,0 +1,97 @@
+"""
+Accuracy and latency of language detection on a labeled query set
+(benchmarks/data/language_queries.tsv, not part of the training samples).
+
+Compared detectors:
+- rules+ngram: app.language.detect_language (rules, n-gram for the ambiguous case)
+- rules-only:  the old offline fallback (any Marathi indicator/pattern -> marathi)
+- ngram-only:  the n-gram classifier on every query
+
+"ambiguous" counts the queries where the old code made an OpenAI call.
+
+    python -m benchmarks.bench_language
+"""
+import argparse
+import json
+import os
+import time
+
+from app.language import MARATHI_PATTERNS, _WORD, classifier, detect_language, \
+    rule_based_language
+
+QUERIES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "language_queries.tsv")
+
+
+# The indicator words of the old code (app.language has added common function words since)
+OLD_INDICATORS = frozenset({
+    'kasa', 'kase', 'kay', 'kaay', 'kuthe', 'kadhi', 'kiti', 'konala', 'kona',
+    'milwaycha', 'milwayche', 'milwaychi', 'karaycha', 'karayche', 'karaychi',
+    'ghaycha', 'ghayche', 'ghaychi', 'deyacha', 'deyache', 'deyachi',
+    'bharaycha', 'bharayche', 'bharaychi', 'mahnaycha', 'mahnayche', 'mahnaychi',
+    'sangaycha', 'sangayche', 'sangaychi', 'hotay', 'hoti', 'hota', 'hotat',
+    'aadhaar', 'mahapalika', 'nagar', 'palika',
+})
+
+
+def old_fallback(query: str) -> str:
+    query_lower = query.lower()
+    if any(word in OLD_INDICATORS for word in _WORD.findall(query_lower)):
+        return 'marathi'
+    if any(p.search(query_lower) for p in MARATHI_PATTERNS):
+        return 'marathi'
+    return 'english'
+
+
+def load_queries(path=QUERIES_PATH):
+    with open(path, encoding="utf-8") as f:
+        return [tuple(line.rstrip("\n").split("\t", 1)) for line in f if "\t" in line]
+
+
+def evaluate(name, fn, labeled, repeats):
+    correct = sum(1 for label, text in labeled if fn(text) == label)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for _, text in labeled:
+            fn(text)
+    per_query_us = (time.perf_counter() - start) / (repeats * len(labeled)) * 1e6
+    ambiguous = [(label, text) for label, text in labeled if rule_based_language(text) is None]
+    ambiguous_correct = sum(1 for label, text in ambiguous if fn(text) == label)
+    return {
+        "detector": name,
+        "accuracy": round(correct / len(labeled), 4),
+        "ambiguous": len(ambiguous),
+        "ambiguous_accuracy": round(ambiguous_correct / len(ambiguous), 4) if ambiguous else None,
+        "latency_us": round(per_query_us, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", default=QUERIES_PATH)
+    parser.add_argument("--repeats", type=int, default=200)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    labeled = load_queries(args.queries)
+    results = [
+        evaluate("rules+ngram", detect_language, labeled, args.repeats),
+        evaluate("rules-only", old_fallback, labeled, args.repeats),
+        evaluate("ngram-only", classifier.predict, labeled, args.repeats),
+    ]
+
+    print(f"{len(labeled)} labeled queries")
+    print(f"{'detector':<14}{'accuracy':>10}{'ambiguous':>11}{'amb. acc':>10}{'us/query':>10}")
+    for r in results:
+        print(f"{r['detector']:<14}{r['accuracy']:>10}{r['ambiguous']:>11}{str(r['ambiguous_accuracy']):>10}"
+              f"{r['latency_us']:>10}")
+    for label, text in labeled:
+        if detect_language(text) != label:
+            print(f"  ✗ {label:<8} {text}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"benchmark": "language", "params": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
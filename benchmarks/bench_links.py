@@ -0,0 +1,122 @@
+"""
+Per-request cost of the related-links step: resolving every match's raw
+related_links through the URL mapper on each request (previous behaviour)
+versus merging the per-page lists resolved at ingestion. Also reports the
+metadata size per document for both shapes.
+
+Documents are synthetic but realistically shaped: each carries a mix of
+verified API URLs, unmapped API URLs, PDF files and external links, with
+duplicates, drawn from clean_api_frontend_mappings.json.
+
+    python -m benchmarks.bench_links --links-per-doc 30 --requests 20000
+"""
+import argparse
+import json
+import random
+import time
+
+from benchmarks import stubs
+
+
+# --- previous implementation, kept here as the baseline ---
+
+def old_related_links(url_mapper, matches):
+    related_links = []
+    for m in matches:
+        for link in m['metadata'].get("related_links", []):
+            frontend_url = url_mapper.get_frontend_url(link)
+            if frontend_url:
+                if frontend_url not in related_links:
+                    related_links.append(frontend_url)
+            elif not link.startswith("https://webadmin.pmc.gov.in/api/"):
+                if link not in related_links:
+                    related_links.append(link)
+    return related_links
+
+
+def old_merge_links(related_links, keyword_links):
+    additional_links = []
+    for frontend_url in keyword_links:
+        if frontend_url not in related_links and frontend_url not in additional_links:
+            additional_links.append(frontend_url)
+    return additional_links, related_links + additional_links[:3]
+
+
+def synthetic_links(rng, api_urls, count):
+    links = []
+    for _ in range(count):
+        kind = rng.random()
+        if kind < 0.5:
+            links.append(rng.choice(api_urls))
+        elif kind < 0.7:
+            links.append(f"https://webadmin.pmc.gov.in/api/basic-page/unmapped-{rng.randrange(500)}?lang=en")
+        elif kind < 0.9:
+            links.append(f"https://webadmin.pmc.gov.in/sites/default/files/{rng.randrange(2000)}.pdf")
+        else:
+            links.append(f"https://example.org/{rng.randrange(200)}")
+    # Menus and footers repeat links within one page
+    return links + links[:count // 4]
+
+
+def measure(fn, requests):
+    wall, cpu = time.perf_counter(), time.process_time()
+    for matches, keyword_links in requests:
+        fn(matches, keyword_links)
+    n = len(requests)
+    return {"wall_us": round((time.perf_counter() - wall) / n * 1e6, 2),
+            "cpu_us": round((time.process_time() - cpu) / n * 1e6, 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=300)
+    parser.add_argument("--links-per-doc", type=int, default=30)
+    parser.add_argument("--matches", type=int, default=5)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    stubs.install().stop()
+    from app import rag
+    from app.drupal_loader import LINKS_PER_DOC
+    from app.url_mapper import url_mapper
+
+    rng = random.Random(0)
+    url_mapper.warm_up()
+    api_urls = [m["api_url"] for m in url_mapper.mappings_data["mappings"] if m.get("api_url")]
+    raw_docs, new_docs = [], []
+    for _ in range(args.docs):
+        links = synthetic_links(rng, api_urls, args.links_per_doc)
+        raw_docs.append({"metadata": {"source": rng.choice(api_urls), "related_links": links}})
+        new_docs.append({"metadata": {"source": raw_docs[-1]["metadata"]["source"],
+                                      "links": url_mapper.resolve_links(links, LINKS_PER_DOC)}})
+
+    picks = [(rng.sample(range(args.docs), args.matches), [rng.choice(api_urls) for _ in range(5)])
+             for _ in range(args.requests)]
+    old_requests = [([raw_docs[i] for i in ids], kw) for ids, kw in picks]
+    new_requests = [([new_docs[i] for i in ids], kw) for ids, kw in picks]
+
+    def old(matches, keyword_links):
+        return old_merge_links(old_related_links(url_mapper, matches), keyword_links)
+
+    def new(matches, keyword_links):
+        return rag._merge_links(rag._related_links(matches), keyword_links)
+
+    results = {"per_request_resolve": measure(old, old_requests), "precomputed_merge": measure(new, new_requests)}
+    for name, docs in (("per_request_resolve", raw_docs), ("precomputed_merge", new_docs)):
+        results[name]["metadata_bytes"] = round(
+            sum(len(json.dumps(d["metadata"]).encode()) for d in docs) / len(docs))
+
+    print(f"{args.docs} docs x {args.links_per_doc} raw links, {args.matches} matches/request, "
+          f"{args.requests} requests")
+    print(f"{'method':>22}{'wall us/req':>14}{'cpu us/req':>14}{'metadata B/doc':>16}")
+    for name, r in results.items():
+        print(f"{name:>22}{r['wall_us']:>14}{r['cpu_us']:>14}{r['metadata_bytes']:>16}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"benchmark": "links", "params": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
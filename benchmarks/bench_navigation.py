@@ -0,0 +1,136 @@
+"""
+Navigational fast path (app/navigation.py): "where is the link for X"
+questions answered from the top menu item without a completion.
+
+Seeds a LocalStore with the stub Drupal pages plus one menu item
+("title\\nurl", kind=menu) per verified frontend mapping, then sends a mix
+of link questions built from menu titles and the regular benchmark
+questions through agenerate_answer, with the fast path on and off. Reports
+the share of answers per route, completion calls and latency per route.
+
+The stub encoder is a bag-of-words hash, so its cosine scores are lower
+than MiniLM's; --min-score sets NAV_MIN_SCORE for the run accordingly.
+
+    python -m benchmarks.bench_navigation --links 40 --min-score 0.45
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import tempfile
+import time
+import uuid
+
+from benchmarks import stubs
+from benchmarks.bench_async_chat import QUERIES, percentile
+
+LINK_TEMPLATES = [
+    "Where is the link for {}?",
+    "{} website",
+    "link for {}",
+    "{} link kuthe milel",
+]
+
+
+def menu_docs(limit):
+    from app.url_mapper import url_mapper
+
+    docs = []
+    for url in url_mapper.get_all_frontend_urls():
+        slug = url.rstrip("/").rsplit("/", 1)[-1]
+        title = re.sub(r"[^a-z0-9]+", " ", slug.lower()).strip().title()
+        if not title or any(d["id"] == url for d in docs):
+            continue
+        docs.append({"id": url, "text": f"{title}\n{url}", "metadata": {"source": url, "kind": "menu"}})
+    return docs[:limit]
+
+
+def build_store(links):
+    from app.vector_store import LocalStore
+
+    docs = stubs.seed_documents() + menu_docs(links)
+    store = LocalStore(path=tempfile.mkdtemp(prefix="pmcbot-nav-index-"))
+    store.upsert([(d["id"], stubs.hash_embed(d["text"]), {**d["metadata"], "text": d["text"]}) for d in docs])
+    return store.path, [d["text"].split("\n")[0] for d in docs if d["metadata"].get("kind") == "menu"]
+
+
+async def drive(name, queries, server):
+    from app import rag
+
+    rag.answer_cache.invalidate()
+    before = server.stats()
+    routes = {}
+    log = rag.request_logger.log
+    try:
+        for query in queries:
+            seen = []
+            rag.request_logger.log = lambda record, seen=seen: (seen.append(record), log(record))
+            start = time.perf_counter()
+            await rag.agenerate_answer(query, f"bench-{uuid.uuid4()}", None)
+            routes.setdefault(seen[-1]["route"], []).append(time.perf_counter() - start)
+    finally:
+        rag.request_logger.log = log
+
+    total = sum(len(v) for v in routes.values())
+    return {
+        "scenario": name,
+        "requests": total,
+        "openai_calls": server.stats()["requests"] - before["requests"],
+        "routes": {
+            route: {
+                "share": round(len(latencies) / total, 3),
+                "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+                "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+            }
+            for route, latencies in sorted(routes.items())
+        },
+    }
+
+
+async def run(args, server, titles):
+    from app import navigation
+
+    navigation.NAV_MIN_SCORE = args.min_score
+    link_queries = [LINK_TEMPLATES[i % len(LINK_TEMPLATES)].format(title.lower()) for i, title in enumerate(titles)]
+    queries = link_queries + [QUERIES[i % len(QUERIES)] for i in range(len(link_queries))]
+    results = []
+    for enabled in (False, True):
+        navigation.NAV_FAST_PATH = enabled
+        results.append(await drive(f"fast path {'on' if enabled else 'off'}", queries, server))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--links", type=int, default=40, help="menu items (and link questions)")
+    parser.add_argument("--min-score", type=float, default=0.45, help="NAV_MIN_SCORE for the stub encoder")
+    parser.add_argument("--openai-latency", type=float, default=0.3, help="stub completion latency (s)")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    server = stubs.install(args.openai_latency, 0.0)
+    try:
+        index_path, titles = build_store(args.links)
+        os.environ.update(VECTOR_BACKEND="local", LOCAL_INDEX_DIR=index_path)
+        import app.rag  # noqa: F401  (imports run against the stubs)
+
+        # Keep the benchmark's request logs out of the working tree
+        os.chdir(tempfile.mkdtemp(prefix="pmcbot-bench-"))
+        results = asyncio.run(run(args, server, titles))
+    finally:
+        server.stop()
+
+    print(f"{'scenario':<16}{'route':<12}{'share':>7}{'p50 ms':>9}{'p99 ms':>9}")
+    for r in results:
+        for route, row in r["routes"].items():
+            print(f"{r['scenario']:<16}{route:<12}{row['share']:>7}{row['p50_ms']:>9}{row['p99_ms']:>9}")
+        print(f"{r['scenario']:<16}{'openai calls':<12}{r['openai_calls']:>7}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"benchmark": "navigation", "params": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Request-path cost of logging: the old synchronous append to logs/logs.txt
+vs RequestLogger.log (bounded queue + background writer).
+
+Each record is the size of a real entry (prompt included, ~4 KB). Several
+processes log to the same file with a small max size, so the run also
+checks that rotation works and that no line is torn or interleaved.
+
+    python -m benchmarks.bench_request_log --records 20000 --processes 4
+"""
+import argparse
+import glob
+import gzip
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+
+from benchmarks.bench_async_chat import percentile
+
+PROMPT = ("You are a helpful assistant for Pune Municipal Corporation users.\n" +
+          "Context: property tax, water supply, birth certificates. " * 60)
+
+
+def make_record(i):
+    return {"ts": "2024-01-01T00:00:00.000Z", "session_id": f"s{i}", "language": "english",
+            "query": f"how to pay property tax {i}", "prompt": PROMPT, "answer": "Pay online. " * 20,
+            "timings_ms": {"embed": 8.1, "vector_query": 40.2, "llm": 900.5, "postprocess": 0.3}}
+
+
+def old_append(directory, text):
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, "logs.txt"), "a", encoding="utf-8") as log_file:
+        log_file.write(text)
+        if not text.endswith("\n"):
+            log_file.write("\n")
+        log_file.write("\n")
+
+
+def run_old(directory, records):
+    latencies = []
+    for i in range(records):
+        text = json.dumps(make_record(i), ensure_ascii=False)
+        start = time.perf_counter()
+        old_append(directory, text)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def run_new(path, records, max_bytes, queue_size):
+    from app.request_log import RequestLogger
+
+    logger = RequestLogger(path=path, max_bytes=max_bytes, backup_count=1000, compress=True,
+                           queue_size=queue_size, enabled=True)
+    latencies = []
+    for i in range(records):
+        record = make_record(i)
+        start = time.perf_counter()
+        logger.log(record)
+        latencies.append(time.perf_counter() - start)
+    logger.close(timeout=60)
+    return latencies, logger.stats()
+
+
+def _worker(args):
+    path, records, max_bytes, queue_size = args
+    return run_new(path, records, max_bytes, queue_size)
+
+
+def count_lines(path):
+    total = torn = 0
+    for name in glob.glob(path + "*"):
+        opener = gzip.open if name.endswith(".gz") else open
+        with opener(name, "rt", encoding="utf-8") as f:
+            for line in f:
+                total += 1
+                try:
+                    json.loads(line)
+                except ValueError:
+                    torn += 1
+    return total, torn
+
+
+def summarize(name, latencies):
+    us = sorted(x * 1e6 for x in latencies)
+    return {"mode": name, "calls": len(us), "p50_us": round(percentile(us, 50), 1),
+            "p99_us": round(percentile(us, 99), 1), "max_us": round(us[-1], 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=20000, help="records per process")
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--max-bytes", type=int, default=8 * 1024 * 1024, help="rotation size")
+    parser.add_argument("--queue-size", type=int, default=10000)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        old = summarize("sync append", run_old(os.path.join(tmp, "old"), args.records))
+
+        path = os.path.join(tmp, "new", "requests.jsonl")
+        jobs = [(path, args.records, args.max_bytes, args.queue_size)] * args.processes
+        with multiprocessing.Pool(args.processes) as pool:
+            outcomes = pool.map(_worker, jobs)
+        latencies = [x for lat, _ in outcomes for x in lat]
+        written = sum(stats["written"] for _, stats in outcomes)
+        dropped = sum(stats["dropped"] for _, stats in outcomes)
+        new = summarize("queued", latencies)
+        lines, torn = count_lines(path)
+        files = len(glob.glob(path + "*"))
+
+    results = [old, new]
+    print(f"{'mode':<14}{'calls':>8}{'p50 us':>10}{'p99 us':>10}{'max us':>10}")
+    for r in results:
+        print(f"{r['mode']:<14}{r['calls']:>8}{r['p50_us']:>10}{r['p99_us']:>10}{r['max_us']:>10}")
+    print(f"queued: {args.processes} processes, written={written} dropped={dropped}, "
+          f"{lines} lines in {files} files, {torn} torn")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"benchmark": "request_log", "params": vars(args), "results": results,
+                       "written": written, "dropped": dropped, "lines": lines, "torn": torn, "files": files},
+                      f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
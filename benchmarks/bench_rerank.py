@@ -0,0 +1,144 @@
+"""
+Cross-encoder reranking (app/reranker.py): prompt size, end-to-end latency
+and answer quality with the reranker off and on.
+
+The labeled queries of benchmarks/data/retrieval_queries.tsv go through
+agenerate_answer against a LocalStore + BM25 index of the documents. Per
+scenario: tokens and pages in the assembled prompt (the request log record),
+end-to-end latency, and context recall, i.e. the share of queries whose
+expected page made it into the prompt, as the answer-quality measure (the
+stub completion does not read the prompt, so answers themselves can't be
+graded offline). --prefill makes stub completions slower per prompt token,
+like the real API.
+
+Documents come from --docs (see bench_retrieval) or, with --synthesize, from
+Drupal-shaped pages for every data/urls.txt entry (see bench_extract), which
+are long enough for the context budget to matter. Embeddings and the
+cross-encoder are the stubs (hashing encoder, word-overlap scores), so the
+absolute numbers say more about the pipeline than about MiniLM.
+
+    python -m benchmarks.bench_rerank --synthesize --max-docs 3 --min-score 0.3
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+import uuid
+
+from benchmarks import stubs
+from benchmarks.bench_async_chat import percentile
+from benchmarks.bench_retrieval import QUERIES_PATH, is_hit, load_docs, load_queries
+
+
+def build_indexes(docs, directory):
+    from app.embeddings import embed_texts
+    from app.lexical_index import BM25Index
+    from app.vector_store import LocalStore
+
+    store = LocalStore(path=os.path.join(directory, "local_index"), dimension=stubs.DIM)
+    embeddings = embed_texts([doc["text"] for doc in docs])
+    store.upsert([(doc["id"], emb, {**doc["metadata"], "text": doc["text"]}) for doc, emb in zip(docs, embeddings)])
+    BM25Index(path=os.path.join(directory, "lexical_index.json"), reload_interval=-1).build(docs).save()
+    return store.path, os.path.join(directory, "lexical_index.json")
+
+
+async def drive(name, labeled, sources_by_id):
+    from app import rag
+
+    rag.answer_cache.invalidate()
+    records, latencies = [], []
+    log = rag.request_logger.log
+    try:
+        rag.request_logger.log = lambda record: (records.append(record), log(record))
+        for query, _ in labeled:
+            start = time.perf_counter()
+            await rag.agenerate_answer(query, f"bench-{uuid.uuid4()}", "english")
+            latencies.append(time.perf_counter() - start)
+    finally:
+        rag.request_logger.log = log
+
+    prompted = [r for r in records if "prompt_tokens" in r]
+    hits = 0
+    for (_, expected), record in zip(labeled, records):
+        hits += any(is_hit({"metadata": sources_by_id.get(m["source"], {"source": m["source"]})}, expected)
+                    for m in record.get("matches", ()))
+    return {
+        "scenario": name,
+        "requests": len(records),
+        "routes": {route: sum(r["route"] == route for r in records) for route in sorted({r["route"] for r in records})},
+        "prompt_tokens_mean": round(sum(r["prompt_tokens"] for r in prompted) / max(1, len(prompted)), 1),
+        "prompt_pages_mean": round(sum(len(r["matches"]) for r in prompted) / max(1, len(prompted)), 2),
+        "context_recall": round(hits / max(1, len(labeled)), 3),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "rerank_p50_ms": round(percentile([r["timings_ms"].get("rerank", 0.0) for r in prompted] or [0.0], 50), 1),
+    }
+
+
+async def run(args, labeled, sources_by_id):
+    from app.reranker import reranker
+
+    results = []
+    for enabled in (False, True):
+        reranker.enabled = enabled
+        results.append(await drive(f"rerank {'on' if enabled else 'off'}", labeled, sources_by_id))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", default=QUERIES_PATH)
+    parser.add_argument("--docs", choices=["auto", "cache", "seed"], default="auto")
+    parser.add_argument("--synthesize", action="store_true", help="index synthetic Drupal pages (bench_extract)")
+    parser.add_argument("--candidates", type=int, default=12, help="RERANK_CANDIDATES")
+    parser.add_argument("--max-docs", type=int, default=3, help="RERANK_MAX_DOCS")
+    parser.add_argument("--min-score", type=float, default=0.3, help="RERANK_MIN_SCORE (0-1)")
+    parser.add_argument("--openai-latency", type=float, default=0.3, help="stub completion latency (s)")
+    parser.add_argument("--prefill", type=float, default=0.1, help="extra stub latency per 1000 prompt tokens (s)")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    os.environ.update(RERANK="1", RERANK_CANDIDATES=str(args.candidates), RERANK_MAX_DOCS=str(args.max_docs),
+                      RERANK_MIN_SCORE=str(args.min_score), NAV_FAST_PATH="0")
+    server = stubs.install(args.openai_latency, 0.0, openai_prefill_seconds_per_1k=args.prefill)
+    try:
+        directory = tempfile.mkdtemp(prefix="pmcbot-rerank-")
+        source = args.docs
+        if args.synthesize:
+            from benchmarks.bench_extract import synthesize_corpus
+
+            os.environ["HTTP_CACHE_DIR"] = synthesize_corpus(os.path.join(directory, "http_cache"))
+            source = "cache"
+        elif source == "auto":
+            source = "cache" if os.path.isdir(os.path.join(stubs.REPO_ROOT, "data", "http_cache")) else "seed"
+        docs = load_docs(source)
+        index_path, lexical_path = build_indexes(docs, directory)
+        os.environ.update(VECTOR_BACKEND="local", LOCAL_INDEX_DIR=index_path, LEXICAL_INDEX_PATH=lexical_path)
+        import app.rag  # noqa: F401  (imports run against the stubs)
+
+        # The record logs sources only; api_url lets labels (API slugs) match public URLs
+        sources_by_id = {doc["metadata"]["source"]: doc["metadata"] for doc in docs}
+        labeled = load_queries(args.queries)
+        # Keep the benchmark's request logs out of the working tree
+        os.chdir(tempfile.mkdtemp(prefix="pmcbot-bench-"))
+        results = asyncio.run(run(args, labeled, sources_by_id))
+    finally:
+        server.stop()
+
+    print(f"{len(docs)} documents/chunks ({source}), {len(labeled)} labeled queries")
+    columns = ["scenario", "prompt_tokens_mean", "prompt_pages_mean", "context_recall", "p50_ms", "p99_ms",
+               "rerank_p50_ms"]
+    print("".join(f"{c:>20}" for c in columns))
+    for r in results:
+        print("".join(f"{str(r[c]):>20}" for c in columns))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"benchmark": "rerank", "params": vars(args), "documents": len(docs), "source": source,
+                       "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Offline retrieval quality of dense-only, BM25-only and hybrid (RRF) search:
+recall@k and MRR on the labeled queries in benchmarks/data/retrieval_queries.tsv,
+plus BM25 lookup latency.
+
+Documents come from the crawler's on-disk cache (data/http_cache, filled by
+`python -m app.load_to_pinecone`) when present, otherwise from the
+data/urls.txt-shaped stub documents. Dense vectors use the real model when
+sentence-transformers is installed, otherwise the hashing stub (--stub forces it).
+
+    python -m benchmarks.bench_retrieval --k 1,3,5
+"""
+import argparse
+import importlib.util
+import json
+import os
+import tempfile
+import time
+
+from benchmarks import stubs
+from benchmarks.bench_async_chat import percentile
+
+QUERIES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "retrieval_queries.tsv")
+
+
+def load_queries(path=QUERIES_PATH):
+    with open(path, encoding="utf-8") as f:
+        return [tuple(line.rstrip("\n").split("\t", 1)) for line in f if "\t" in line and not line.startswith("#")]
+
+
+def load_docs(source):
+    if source == "cache":
+        from app.drupal_loader import load_urls
+        from app.fetcher import ConcurrentFetcher
+        from app.ingest import chunk_stage, extract_stage, fetch_stage
+
+        pages, _, menu_json = fetch_stage(load_urls(os.path.join(stubs.REPO_ROOT, "data", "urls.txt")),
+                                          ConcurrentFetcher(offline=True))
+        docs = extract_stage(pages, menu_json)
+        # Keep the API URL next to the public one so labels (API slugs) can be matched
+        for doc, url in zip(docs, pages):
+            doc["metadata"].setdefault("api_url", url)
+        # Index chunks, exactly as the ingestion pipeline does
+        return [chunk for chunks in chunk_stage(docs).values() for chunk in chunks]
+    return stubs.seed_documents()
+
+
+def is_hit(match, expected):
+    metadata = match["metadata"]
+    return any(expected in (metadata.get(key) or "") for key in ("source", "api_url"))
+
+
+def evaluate(name, search, labeled, ks):
+    depth = max(ks)
+    recalls = {k: 0 for k in ks}
+    reciprocal = 0.0
+    for query, expected in labeled:
+        results = search(query)[:depth]
+        rank = next((i for i, m in enumerate(results, start=1) if is_hit(m, expected)), None)
+        if rank:
+            reciprocal += 1.0 / rank
+            for k in ks:
+                recalls[k] += rank <= k
+    row = {"method": name}
+    row.update({f"recall@{k}": round(recalls[k] / len(labeled), 3) for k in ks})
+    row["mrr"] = round(reciprocal / len(labeled), 3)
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", default=QUERIES_PATH)
+    parser.add_argument("--k", default="1,3,5", help="comma-separated cutoffs")
+    parser.add_argument("--docs", choices=["auto", "cache", "seed"], default="auto")
+    parser.add_argument("--stub", action="store_true", help="use the hashing stub instead of the real model")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    if args.stub or importlib.util.find_spec("sentence_transformers") is None:
+        stubs.install().stop()
+    from app.embeddings import embed_text, embed_texts
+    from app.chunking import merge_adjacent_chunks
+    from app.lexical_index import BM25Index
+    from app.retrieval import fuse
+    from app.vector_store import LocalStore
+
+    source = args.docs
+    if source == "auto":
+        source = "cache" if os.path.isdir(os.path.join(stubs.REPO_ROOT, "data", "http_cache")) else "seed"
+    docs = load_docs(source)
+    ks = [int(k) for k in args.k.split(",")]
+    labeled = load_queries(args.queries)
+    depth = max(max(ks), 10)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        dense = LocalStore(path=os.path.join(tmp, "local_index"), dimension=stubs.DIM)
+        embeddings = embed_texts([doc["text"] for doc in docs])
+        dense.upsert([(doc["id"], emb, {**doc["metadata"], "text": doc["text"]}) for doc, emb in zip(docs, embeddings)])
+        lexical = BM25Index(path=os.path.join(tmp, "lexical_index.json"), reload_interval=-1).build(docs)
+
+        query_embs = {query: embed_text(query) for query, _ in labeled}
+
+        def dense_search(query):
+            return dense.query(query_embs[query], top_k=depth)
+
+        def hybrid_search(query):
+            return merge_adjacent_chunks(fuse(dense_search(query), lexical.search(query, top_k=depth), top_k=depth))
+
+        results = [
+            evaluate("dense", lambda q: merge_adjacent_chunks(dense_search(q)), labeled, ks),
+            evaluate("bm25", lambda q: merge_adjacent_chunks(lexical.search(q, top_k=depth)), labeled, ks),
+            evaluate("hybrid (rrf)", hybrid_search, labeled, ks),
+        ]
+
+        latencies = []
+        for _ in range(20):
+            for query, _ in labeled:
+                start = time.perf_counter()
+                lexical.search(query, top_k=10)
+                latencies.append(time.perf_counter() - start)
+
+    print(f"{len(docs)} documents/chunks ({source}), {len(labeled)} labeled queries, "
+          f"{len(lexical.postings)} BM25 terms")
+    columns = ["method"] + [f"recall@{k}" for k in ks] + ["mrr"]
+    print("".join(f"{c:>14}" for c in columns))
+    for r in results:
+        print("".join(f"{str(r[c]):>14}" for c in columns))
+    lookup = {"p50_us": round(percentile(latencies, 50) * 1e6, 1), "p99_us": round(percentile(latencies, 99) * 1e6, 1)}
+    print(f"BM25 lookup: p50 {lookup['p50_us']} us, p99 {lookup['p99_us']} us")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"benchmark": "retrieval", "params": vars(args), "documents": len(docs), "source": source,
+                       "results": results, "bm25_lookup": lookup}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
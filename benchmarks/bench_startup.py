@@ -0,0 +1,130 @@
+"""
+Cold start: what importing the app costs and how long a fresh server takes
+to answer its probes.
+
+- import profile: `python -X importtime -c "import app.main"` in a clean
+  interpreter with no API keys and the real (not stubbed) dependencies;
+  total time, the slowest modules by self and cumulative time, time per
+  top-level package, and which heavy libraries were imported at all
+  (none of openai / pinecone / sentence_transformers / torch should be)
+- server: uvicorn on benchmarks.stub_app, time from spawn to the first
+  /livez 200 and the first /readyz 200 (model load simulated with
+  --model-load-seconds)
+
+    python -m benchmarks.bench_startup --top 15 --json startup.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+from benchmarks import stubs
+from benchmarks.bench_workers import free_port
+
+HEAVY_MODULES = ("openai", "pinecone", "sentence_transformers", "torch", "sqlalchemy", "tiktoken")
+
+
+def import_profile(module: str = "app.main", top: int = 15) -> dict:
+    code = (f"import sys; import {module}; "
+            f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))")
+    env = {k: v for k, v in os.environ.items() if not k.endswith("_API_KEY")}
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=stubs.REPO_ROOT, env=env,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+
+    packages = {}
+    for name, self_us, _ in rows:
+        package = name.split(".")[0]
+        packages[package] = packages.get(package, 0) + self_us
+    total_us = next((cumulative for name, _, cumulative in rows if name == module), 0)
+    return {
+        "module": module,
+        "total_ms": round(total_us / 1000, 1),
+        "modules_imported": len(rows),
+        "heavy_modules_loaded": [m for m in result.stdout.strip().split(",") if m],
+        "by_self_ms": [{"module": n, "ms": round(s / 1000, 1)}
+                       for n, s, _ in sorted(rows, key=lambda r: -r[1])[:top]],
+        "by_cumulative_ms": [{"module": n, "ms": round(c / 1000, 1)}
+                             for n, _, c in sorted(rows, key=lambda r: -r[2])[:top]],
+        "by_package_ms": {p: round(us / 1000, 1)
+                          for p, us in sorted(packages.items(), key=lambda kv: -kv[1])[:top]},
+    }
+
+
+def server_start(model_load_seconds: float = 2.0, warmup: str = "background", timeout: float = 120) -> dict:
+    openai_stub = stubs.StubOpenAIServer(latency=0.05).start()
+    port = free_port()
+    env = dict(os.environ, OPENAI_BASE_URL=openai_stub.base_url, PYTHONPATH=stubs.REPO_ROOT, WARMUP=warmup,
+               STUB_MODEL_LOAD_SECONDS=str(model_load_seconds))
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-m", "uvicorn", "benchmarks.stub_app:app", "--port", str(port),
+                                "--log-level", "warning"],
+                               cwd=stubs.REPO_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT)
+    times = {}
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=2) as client:
+            while len(times) < 2 and time.perf_counter() - start < timeout:
+                for probe in ("livez", "readyz"):
+                    if probe in times:
+                        continue
+                    try:
+                        if client.get(f"/{probe}").status_code == 200:
+                            times[probe] = time.perf_counter() - start
+                    except httpx.HTTPError:
+                        pass
+                time.sleep(0.02)
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+        openai_stub.stop()
+    return {"warmup": warmup, "model_load_s": model_load_seconds,
+            "livez_s": round(times["livez"], 2) if "livez" in times else None,
+            "readyz_s": round(times["readyz"], 2) if "readyz" in times else None}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--model-load-seconds", type=float, default=2.0)
+    parser.add_argument("--warmup", default="background", help="WARMUP mode of the started server")
+    parser.add_argument("--skip-server", action="store_true")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    profile = import_profile(args.module, args.top)
+    print(f"import {profile['module']}: {profile['total_ms']} ms, {profile['modules_imported']} modules")
+    print(f"heavy modules loaded: {', '.join(profile['heavy_modules_loaded']) or 'none'}")
+    print(f"\n{'slowest (cumulative)':<52}{'ms':>8}")
+    for row in profile["by_cumulative_ms"]:
+        print(f"{row['module']:<52}{row['ms']:>8}")
+    print(f"\n{'package (self time)':<52}{'ms':>8}")
+    for package, ms in profile["by_package_ms"].items():
+        print(f"{package:<52}{ms:>8}")
+
+    results = {"import": profile}
+    if not args.skip_server:
+        results["server"] = server_start(args.model_load_seconds, args.warmup)
+        s = results["server"]
+        print(f"\nserver (WARMUP={s['warmup']}, model load {s['model_load_s']}s): "
+              f"/livez after {s['livez_s']}s, /readyz after {s['readyz_s']}s")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"benchmark": "startup", "params": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Time-to-first-byte of /chat (buffered JSON) vs /chat/stream (SSE).
+
+Runs the real FastAPI app under uvicorn against the local stubs from
+benchmarks/stubs.py and measures, per request, the time to the first
+response byte, to the first answer token and to the end of the response.
+
+    python -m benchmarks.bench_streaming_ttfb --requests 50 --concurrency 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+
+from benchmarks import stubs
+from benchmarks.bench_async_chat import QUERIES, percentile
+
+
+def start_server(port):
+    import uvicorn
+    from app.main import app
+
+    config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread
+
+
+async def measure(client, path, query, session_id):
+    start = time.perf_counter()
+    first_byte = first_token = None
+    async with client.stream("POST", path, json={"query": query, "session_id": session_id}) as response:
+        async for chunk in response.aiter_bytes():
+            now = time.perf_counter()
+            if first_byte is None:
+                first_byte = now
+            if first_token is None and (path == "/chat" or b"event: token" in chunk):
+                first_token = now
+    end = time.perf_counter()
+    return first_byte - start, (first_token or end) - start, end - start
+
+
+async def run(base_url, path, total, concurrency):
+    import httpx
+
+    semaphore = asyncio.Semaphore(concurrency)
+    rows = []
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+        async def one(i):
+            async with semaphore:
+                rows.append(await measure(client, path, QUERIES[i % len(QUERIES)], f"ttfb-{path}-{i}"))
+
+        await asyncio.gather(*(one(i) for i in range(total)))
+
+    result = {"endpoint": path, "requests": len(rows)}
+    for idx, name in enumerate(["ttfb", "first_token", "total"]):
+        values = [r[idx] for r in rows]
+        result[f"{name}_p50_ms"] = round(percentile(values, 50) * 1000, 1)
+        result[f"{name}_p99_ms"] = round(percentile(values, 99) * 1000, 1)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--openai-latency", type=float, default=1.0, help="stub completion latency (s)")
+    parser.add_argument("--port", type=int, default=stubs._free_port())
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    # Repeated queries would otherwise be answered from the answer cache / link templates
+    os.environ.update(ANSWER_CACHE_ENABLED="0", NAV_FAST_PATH="0")
+    stub_server = stubs.install(openai_latency=args.openai_latency)
+    try:
+        server, thread = start_server(args.port)
+        os.chdir(tempfile.mkdtemp(prefix="pmcbot-bench-"))
+        base_url = f"http://127.0.0.1:{args.port}"
+        results = [asyncio.run(run(base_url, path, args.requests, args.concurrency))
+                   for path in ("/chat", "/chat/stream")]
+        server.should_exit = True
+        thread.join()
+    finally:
+        stub_server.stop()
+
+    print(f"{'endpoint':<14}{'ttfb p50':>10}{'ttfb p99':>10}{'token p50':>11}{'total p50':>11}")
+    for r in results:
+        print(f"{r['endpoint']:<14}{r['ttfb_p50_ms']:>10}{r['ttfb_p99_ms']:>10}"
+              f"{r['first_token_p50_ms']:>11}{r['total_p50_ms']:>11}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"benchmark": "streaming_ttfb", "params": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
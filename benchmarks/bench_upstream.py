@@ -0,0 +1,128 @@
+"""
+Upstream protection (app/upstream.py) against the stub OpenAI server:
+
+- burst: many concurrent requests with the same question (a link shared on
+  social media). Single-flight on vs off, counting the completion and
+  vector calls that actually reach the upstreams.
+- rate limit: a burst of distinct questions against a stub that answers 429
+  above --rate-limit concurrent calls. Without a local concurrency limit most
+  calls are rejected upstream and retried; with OPENAI_MAX_CONCURRENCY set to
+  the upstream limit they queue locally instead. Reports full answers,
+  links-only (degraded) answers, errors and 429s received.
+
+    python -m benchmarks.bench_upstream --burst 50 --requests 200 --rate-limit 8
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+import uuid
+
+from benchmarks import stubs
+from benchmarks.bench_async_chat import percentile
+
+QUESTION = "How do I pay property tax online?"
+QUESTIONS = [
+    "Where can I get a birth certificate?",
+    "Tree cutting permission process",
+    "What is the contact number of the electrical department?",
+    "Plastic waste collection rules",
+    "E-waste collection centres in Pune",
+]
+
+
+async def drive(name, queries, server):
+    from app import rag
+
+    before = server.stats()
+    vector_before = stubs.FakeIndex.queries
+    rag.answer_cache.invalidate()
+    degraded_prefixes = tuple(rag._DEGRADED_HEADER.values()) + tuple(rag._DEGRADED_NO_LINKS.values())
+    latencies, outcomes = [], {"full": 0, "degraded": 0, "errors": 0}
+
+    async def one(query):
+        start = time.perf_counter()
+        try:
+            answer, _ = await rag.agenerate_answer(query, f"bench-{uuid.uuid4()}", "english")
+        except Exception as e:
+            outcomes["errors"] += 1
+            print(f"⚠️ {name} request failed: {e}")
+            return
+        latencies.append(time.perf_counter() - start)
+        outcomes["degraded" if answer.startswith(degraded_prefixes) else "full"] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(q) for q in queries))
+    wall = time.perf_counter() - start
+    after = server.stats()
+    return {
+        "scenario": name,
+        "requests": len(queries),
+        **outcomes,
+        "openai_calls": after["requests"] - before["requests"],
+        "openai_429s": after["rate_limited"] - before["rate_limited"],
+        "vector_calls": stubs.FakeIndex.queries - vector_before,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "wall_s": round(wall, 2),
+    }
+
+
+async def run(args, server):
+    from app import upstream
+
+    def configure(single_flight, limit):
+        for name in ("openai", "vector"):
+            upstream.single_flights[name].enabled = single_flight
+        upstream.limiters["openai"] = upstream.ConcurrencyLimiter("openai", limit, upstream.OPENAI_MAX_QUEUE)
+
+    results = []
+    burst = [QUESTION] * args.burst
+    configure(False, args.rate_limit)
+    results.append(await drive("burst, no single-flight", burst, server))
+    configure(True, args.rate_limit)
+    results.append(await drive("burst, single-flight", burst, server))
+
+    distinct = [f"{QUESTIONS[i % len(QUESTIONS)]} ({i})" for i in range(args.requests)]
+    configure(True, 100_000)
+    results.append(await drive("rate limit, no local limit", distinct, server))
+    configure(True, args.rate_limit)
+    results.append(await drive(f"rate limit, local limit {args.rate_limit}", distinct, server))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--burst", type=int, default=50, help="concurrent identical questions")
+    parser.add_argument("--requests", type=int, default=200, help="concurrent distinct questions")
+    parser.add_argument("--rate-limit", type=int, default=8, help="stub OpenAI concurrent-call limit (429 above)")
+    parser.add_argument("--openai-latency", type=float, default=0.3, help="stub completion latency (s)")
+    parser.add_argument("--vector-latency", type=float, default=0.05, help="stub vector query latency (s)")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    server = stubs.install(args.openai_latency, args.vector_latency, openai_max_concurrent=args.rate_limit)
+    try:
+        import app.rag  # noqa: F401  (imports run against the stubs)
+
+        # Keep the benchmark's request logs out of the working tree
+        os.chdir(tempfile.mkdtemp(prefix="pmcbot-bench-"))
+        results = asyncio.run(run(args, server))
+    finally:
+        server.stop()
+
+    print(f"{'scenario':<30}{'full':>6}{'degr.':>7}{'err':>5}{'openai':>8}{'429s':>6}{'vector':>8}"
+          f"{'p50 ms':>9}{'p99 ms':>9}")
+    for r in results:
+        print(f"{r['scenario']:<30}{r['full']:>6}{r['degraded']:>7}{r['errors']:>5}{r['openai_calls']:>8}"
+              f"{r['openai_429s']:>6}{r['vector_calls']:>8}{r['p50_ms']:>9}{r['p99_ms']:>9}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"benchmark": "upstream", "params": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
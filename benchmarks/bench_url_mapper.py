@@ -0,0 +1,122 @@
+"""
+URLMapper lookup cost as the mapping set grows (374 -> 100k entries).
+
+Compares the indexed mapper against the previous linear-scan algorithms for
+api_url -> frontend_url lookups, keyword search and URL rewriting in text.
+
+    python -m benchmarks.bench_url_mapper --sizes 374 1000 10000 100000
+"""
+import argparse
+import json
+import os
+import random
+import re
+import tempfile
+import time
+
+from app.url_mapper import URLMapper
+
+WORDS = ["property", "tax", "birth", "certificate", "tree", "cutting", "water", "supply", "ward", "office",
+         "garden", "health", "school", "fire", "building", "permission", "circular", "hospital", "road", "drainage"]
+
+
+def synthetic_mappings(size, seed=0):
+    rng = random.Random(seed)
+    mappings = []
+    for i in range(size):
+        slug = "-".join(rng.sample(WORDS, 3)) + f"-{i}"
+        mappings.append({
+            "api_url": f"https://webadmin.pmc.gov.in/api/basic-page/{slug}?lang=en",
+            "frontend_url": f"https://www.pmc.gov.in/en/b/{slug}",
+            "manual_verdict": "correct" if i % 40 else "incorrect",
+        })
+    return {"total_mappings": size, "correct_mappings": size, "mappings": mappings}
+
+
+# --- previous implementation (linear scans), kept here as the baseline ---
+
+def linear_lookup(data, api_url):
+    for m in data["mappings"]:
+        if m.get("api_url") == api_url and m.get("manual_verdict") == "correct" and m.get("frontend_url"):
+            return m.get("frontend_url")
+    return None
+
+
+def linear_search(data, keyword):
+    keyword = keyword.lower()
+    return [m for m in data["mappings"] if m.get("manual_verdict") == "correct" and m.get("frontend_url") and
+            (keyword in m.get("api_url", "").lower() or keyword in m.get("frontend_url", "").lower())]
+
+
+def linear_convert(data, text):
+    converted = text
+    for url in re.findall(r'https?://[^\s\)]+', text):
+        frontend_url = linear_lookup(data, url)
+        if frontend_url:
+            converted = converted.replace(url, frontend_url)
+    return converted
+
+
+def per_call_us(fn, args_list, budget_s=1.0):
+    """Average microseconds per call, running at most ~budget_s."""
+    calls = 0
+    start = time.perf_counter()
+    while True:
+        for args in args_list:
+            fn(*args)
+            calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= budget_s or calls >= 100000:
+            return round(elapsed / calls * 1e6, 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[374, 1000, 10000, 100000])
+    parser.add_argument("--budget", type=float, default=0.5, help="seconds per measurement")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        data = synthetic_mappings(size)
+        path = os.path.join(tempfile.mkdtemp(prefix="pmcbot-mappings-"), "mappings.json")
+        with open(path, "w") as f:
+            json.dump(data, f)
+
+        start = time.perf_counter()
+        mapper = URLMapper(path, reload_interval=-1)
+        load_ms = round((time.perf_counter() - start) * 1000, 1)
+
+        rng = random.Random(1)
+        sample = [m["api_url"] for m in rng.sample(data["mappings"], min(50, size))]
+        lookups = [(u,) for u in sample]
+        keywords = [(k,) for k in ["tax", "ward", "certif", "zzz"]]
+        text = "Visit " + " and ".join(sample[:5]) + " for details."
+
+        row = {
+            "size": size,
+            "load_ms": load_ms,
+            "lookup_us": per_call_us(mapper.get_frontend_url, lookups, args.budget),
+            "lookup_linear_us": per_call_us(lambda u: linear_lookup(data, u), lookups, args.budget),
+            "search_us": per_call_us(mapper.search_mappings_by_keyword, keywords, args.budget),
+            "search_linear_us": per_call_us(lambda k: linear_search(data, k), keywords, args.budget),
+            "convert_us": per_call_us(mapper.convert_urls_in_text, [(text,)], args.budget),
+            "convert_linear_us": per_call_us(lambda t: linear_convert(data, t), [(text,)], args.budget),
+        }
+        assert mapper.convert_urls_in_text(text) == linear_convert(data, text)
+        results.append(row)
+
+    columns = ["size", "load_ms", "lookup_us", "lookup_linear_us", "search_us", "search_linear_us",
+               "convert_us", "convert_linear_us"]
+    print("".join(f"{c:>18}" for c in columns))
+    for r in results:
+        print("".join(f"{r[c]:>18}" for c in columns))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"benchmark": "url_mapper", "params": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Query latency of the local memory-mapped index vs Pinecone.
+
+The local index is built in a temp directory from data/urls.txt-shaped
+documents (optionally padded with random vectors to --size). Pinecone is only
+measured when PINECONE_API_KEY / PINECONE_INDEX_NAME are set, against the
+already-loaded index.
+
+    python -m benchmarks.bench_vector_backends --queries 200 --size 2000
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks import stubs
+from benchmarks.bench_async_chat import percentile
+
+
+def timed(fn, repeats):
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    return {
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+def build_local(size):
+    from app.vector_store import LocalStore
+
+    docs = stubs.seed_documents()
+    vectors = [(d["id"], stubs.hash_embed(d["text"]), d["metadata"]) for d in docs]
+    rng = np.random.default_rng(0)
+    for i in range(max(0, size - len(vectors))):
+        vectors.append((f"synthetic-{i}", rng.standard_normal(stubs.DIM).astype(np.float32),
+                        {"source": f"synthetic-{i}", "text": ""}))
+    store = LocalStore(path=tempfile.mkdtemp(prefix="pmcbot-local-index-"))
+    start = time.perf_counter()
+    store.upsert(vectors)
+    build_ms = (time.perf_counter() - start) * 1000
+    # Reopen so queries run against the memory-mapped file, as in the server
+    return LocalStore(path=store.path), round(build_ms, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--size", type=int, default=0, help="pad the local index to this many vectors")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--batch", type=int, default=32, help="batch size for the batched query run")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(1)
+    queries = rng.standard_normal((args.queries, stubs.DIM)).astype(np.float32)
+    query_iter = iter(np.tile(queries, (4, 1)))
+
+    results = []
+    local, build_ms = build_local(args.size)
+    results.append({
+        "backend": "local",
+        "vectors": len(local.ids),
+        "build_ms": build_ms,
+        **timed(lambda: local.query(next(query_iter), top_k=args.top_k), args.queries),
+    })
+    batched = timed(lambda: local.query_batch(queries[:args.batch], top_k=args.top_k), max(1, args.queries // 10))
+    results.append({
+        "backend": f"local (batch of {args.batch})",
+        "vectors": len(local.ids),
+        "p50_ms": batched["p50_ms"],
+        "p99_ms": batched["p99_ms"],
+        "per_query_p50_ms": round(batched["p50_ms"] / args.batch, 4),
+    })
+
+    if os.getenv("PINECONE_API_KEY") and os.getenv("PINECONE_INDEX_NAME"):
+        from app.vector_store import PineconeStore
+
+        pinecone = PineconeStore()
+        pinecone.query(queries[0].tolist(), top_k=args.top_k)  # connect + warm up
+        results.append({
+            "backend": "pinecone",
+            **timed(lambda: pinecone.query(next(query_iter).tolist(), top_k=args.top_k), args.queries),
+        })
+    else:
+        print("ℹ️ PINECONE_API_KEY / PINECONE_INDEX_NAME not set, skipping the Pinecone backend.")
+
+    print(f"{'backend':<24}{'p50 ms':>10}{'p99 ms':>10}")
+    for r in results:
+        print(f"{r['backend']:<24}{r['p50_ms']:>10}{r['p99_ms']:>10}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"benchmark": "vector_backends", "params": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Throughput of the multi-worker server profile (gunicorn.conf.py) as the
+worker count grows from 1 to N.
+
+Each run starts the real server on benchmarks.stub_app (fake model doing
+CPU-bound work per query, fake Pinecone, stub OpenAI server), waits for
+/readyz on every worker and drives /chat with concurrent clients. Query
+embeddings and answers are not cached, so every request pays the model
+compute. Sessions and the answer cache use the shared SQLite backends.
+
+    python -m benchmarks.bench_workers --workers 1,2,4 --requests 400 --concurrency 32
+"""
+import argparse
+import asyncio
+import importlib.util
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+import httpx
+
+from benchmarks import stubs
+from benchmarks.bench_async_chat import QUERIES, summarize
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(workers, port, env, server):
+    if server == "gunicorn":
+        command = [sys.executable, "-m", "gunicorn", "-c", os.path.join(stubs.REPO_ROOT, "gunicorn.conf.py"),
+                   "--bind", f"127.0.0.1:{port}", "--workers", str(workers), "benchmarks.stub_app:app"]
+    else:
+        command = [sys.executable, "-m", "uvicorn", "benchmarks.stub_app:app", "--port", str(port),
+                   "--workers", str(workers), "--log-level", "warning"]
+    return subprocess.Popen(command, cwd=stubs.REPO_ROOT, env={**env, "WEB_CONCURRENCY": str(workers)},
+                            stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT)
+
+
+async def wait_ready(base_url, workers, timeout=120):
+    """Until /readyz has answered 200 from `workers` distinct processes."""
+    seen = set()
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(timeout=2) as client:
+        while time.monotonic() < deadline:
+            try:
+                # New connection each time, so the kernel can hand it to any worker
+                response = await client.get(f"{base_url}/readyz", headers={"Connection": "close"})
+                if response.status_code == 200:
+                    seen.add(response.json()["pid"])
+                    if len(seen) >= workers:
+                        return
+                    continue
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"server not ready ({len(seen)}/{workers} workers)")
+
+
+async def drive(base_url, total, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(timeout=60, limits=limits) as client:
+        async def one(i):
+            nonlocal errors
+            # Unique text per request so neither cache can answer it
+            query = f"{QUERIES[i % len(QUERIES)]} {uuid.uuid4().hex[:6]}"
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    response = await client.post(f"{base_url}/chat", json={"query": query})
+                    response.raise_for_status()
+                    latencies.append(time.perf_counter() - start)
+                except httpx.HTTPError:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        return latencies, time.perf_counter() - start, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default=f"1,{os.cpu_count()}", help="comma-separated worker counts")
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--encode-cpu-ms", type=float, default=10.0, help="CPU-bound model work per query")
+    parser.add_argument("--openai-latency", type=float, default=0.05)
+    parser.add_argument("--server", choices=["gunicorn", "uvicorn"],
+                        default="gunicorn" if importlib.util.find_spec("gunicorn") else "uvicorn")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    openai_stub = stubs.StubOpenAIServer(latency=args.openai_latency).start()
+    results = []
+    try:
+        for workers in [int(n) for n in args.workers.split(",")]:
+            with tempfile.TemporaryDirectory() as tmp:
+                env = dict(os.environ,
+                           OPENAI_BASE_URL=openai_stub.base_url,
+                           PYTHONPATH=stubs.REPO_ROOT,
+                           STUB_ENCODE_CPU_SECONDS=str(args.encode_cpu_ms / 1000),
+                           EMBED_CACHE_SIZE="0",
+                           EMBED_WARMUP="eager",
+                           SESSION_BACKEND="sqlite",
+                           SESSION_DB_URL=f"sqlite:///{tmp}/sessions.db",
+                           ANSWER_CACHE_BACKEND="sqlite",
+                           ANSWER_CACHE_DB_URL=f"sqlite:///{tmp}/answer_cache.db",
+                           HISTORY_SUMMARIZATION="0",
+                           REQUEST_LOG_PATH=os.path.join(tmp, "requests.jsonl"))
+                port = free_port()
+                base_url = f"http://127.0.0.1:{port}"
+                process = start_server(workers, port, env, args.server)
+                try:
+                    asyncio.run(wait_ready(base_url, workers))
+                    asyncio.run(drive(base_url, min(args.requests, 2 * args.concurrency), args.concurrency))
+                    latencies, wall, errors = asyncio.run(drive(base_url, args.requests, args.concurrency))
+                finally:
+                    process.terminate()
+                    process.wait(timeout=30)
+            row = summarize(f"{workers} worker(s)", latencies, wall, errors)
+            row["workers"] = workers
+            results.append(row)
+            print(f"{row['mode']:>14}: {row['rps']:>7} req/s  p50 {row['p50_ms']} ms  p99 {row['p99_ms']} ms  "
+                  f"errors {row['errors']}")
+    finally:
+        openai_stub.stop()
+
+    base = results[0]["rps"] if results and results[0]["rps"] else None
+    if base:
+        for row in results:
+            row["speedup"] = round(row["rps"] / base, 2)
+        print("speedup: " + ", ".join(f"{r['workers']}w x{r['speedup']}" for r in results))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"benchmark": "workers", "params": vars(args), "cpu_count": os.cpu_count(),
+                       "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
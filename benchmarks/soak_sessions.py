@@ -0,0 +1,68 @@
+"""
+Session store soak test: millions of distinct session ids, one user +
+assistant turn each, while sampling process RSS. With the bounded store the
+RSS curve should flatten once the session cap is reached.
+
+    python -m benchmarks.soak_sessions --sessions 2000000 --max-sessions 10000
+    python -m benchmarks.soak_sessions --backend sqlite --sessions 20000
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    import resource
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=["memory", "sqlite"], default="memory")
+    parser.add_argument("--sessions", type=int, default=1_000_000)
+    parser.add_argument("--max-sessions", type=int, default=10000)
+    parser.add_argument("--answer-chars", type=int, default=600, help="size of each stored assistant answer")
+    parser.add_argument("--samples", type=int, default=10)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    from app.session_memory import MemorySessionStore, SQLiteSessionStore
+
+    if args.backend == "sqlite":
+        db_path = os.path.join(tempfile.mkdtemp(prefix="pmcbot-sessions-"), "sessions.db")
+        store = SQLiteSessionStore(url=f"sqlite:///{db_path}")
+    else:
+        store = MemorySessionStore(max_sessions=args.max_sessions)
+
+    answer = "x" * args.answer_chars
+    every = max(1, args.sessions // args.samples)
+    samples = [{"sessions_seen": 0, "stored_sessions": 0, "rss_mb": rss_mb(), "elapsed_s": 0.0}]
+    start = time.perf_counter()
+
+    for i in range(1, args.sessions + 1):
+        session_id = f"soak-{i}"
+        store.add(session_id, "user", f"question number {i}")
+        store.add(session_id, "assistant", answer)
+        if i % every == 0:
+            samples.append({"sessions_seen": i, "stored_sessions": store.count(), "rss_mb": rss_mb(),
+                            "elapsed_s": round(time.perf_counter() - start, 1)})
+            s = samples[-1]
+            print(f"{s['sessions_seen']:>10} sessions  stored={s['stored_sessions']:>8}  "
+                  f"rss={s['rss_mb']:>8} MB  t={s['elapsed_s']}s")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"benchmark": "soak_sessions", "params": vars(args), "results": samples}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+"""
+app.main:app with the fake pinecone / sentence_transformers modules, for
+running the real server (gunicorn or uvicorn) against benchmarks.stubs.
+The OpenAI stub is started by the caller and passed in via OPENAI_BASE_URL;
+STUB_* variables set the fake latencies.
+
+    gunicorn -c gunicorn.conf.py benchmarks.stub_app:app
+"""
+import os
+
+from benchmarks import stubs
+
+stubs.install_modules(
+    vector_latency=float(os.getenv("STUB_VECTOR_LATENCY", "0.01")),
+    encode_seconds=float(os.getenv("STUB_ENCODE_SECONDS", "0")),
+    encode_cpu_seconds=float(os.getenv("STUB_ENCODE_CPU_SECONDS", "0.01")),
+    model_load_seconds=float(os.getenv("STUB_MODEL_LOAD_SECONDS", "0")),
+)
+
+from app.main import app  # noqa: E402
@@ -0,0 +1,439 @@
+"""
+Local stand-ins for the external services used by the chat pipeline, so the
+benchmarks can run without API keys or network access:
+
+- an OpenAI-compatible HTTP server (separate process) with configurable latency,
+  an optional concurrency limit (429 above it) and call counters at GET /stats
+- a fake ``pinecone`` module whose index answers from an in-memory matrix seeded
+  from data/urls.txt
+- a fake ``sentence_transformers`` module with a deterministic hashing encoder
+  and a word-overlap cross-encoder
+
+Call ``install()`` BEFORE importing anything from ``app``.
+"""
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import socket
+import sys
+import threading
+import time
+import urllib.request
+import types
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+try:
+    # The SDK's own result types, so the pipeline sees what production sees
+    from pinecone import QueryResponse, ScoredVector
+except ImportError:
+    QueryResponse = ScoredVector = None
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DIM = 384
+
+STUB_ANSWER = (
+    "You can find the details on the PMC website: "
+    "https://webadmin.pmc.gov.in/api/basic-page/property-tax?lang=en. "
+    "See also [the services page](https://www.pmc.gov.in/en/services.)"
+)
+
+
+# ---------------------------------------------------------------------------
+# OpenAI-compatible stub server
+# ---------------------------------------------------------------------------
+
+def _completion_payload(content: str, prompt: str) -> dict:
+    prompt_tokens = max(1, len(prompt) // 4)
+    completion_tokens = max(1, len(content) // 4)
+    return {
+        "id": "chatcmpl-stub",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": "gpt-4o-mini",
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+
+
+def _stub_content(prompt: str) -> str:
+    if "language detection expert" in prompt:
+        return "english"
+    return STUB_ANSWER
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    latency = 0.3
+    prefill_seconds_per_1k = 0.0
+    # Like an account rate limit: requests beyond this many in flight get a 429
+    max_concurrent = None
+    stats = {"requests": 0, "rate_limited": 0, "active": 0, "max_active": 0}
+    lock = threading.Lock()
+
+    def log_message(self, format, *args):  # keep benchmark output clean
+        pass
+
+    def _send_json(self, status: int, payload: dict):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.endswith("/stats"):
+            with self.lock:
+                self._send_json(200, dict(self.stats))
+            return
+        self._send_json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if not self.path.endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+        with self.lock:
+            self.stats["requests"] += 1
+            limited = self.max_concurrent is not None and self.stats["active"] >= self.max_concurrent
+            if limited:
+                self.stats["rate_limited"] += 1
+            else:
+                self.stats["active"] += 1
+                self.stats["max_active"] = max(self.stats["max_active"], self.stats["active"])
+        if limited:
+            self._send_json(429, {"error": {"message": "Rate limit reached", "type": "requests"}})
+            return
+        try:
+            prompt = "\n".join(m.get("content", "") for m in request.get("messages", []))
+            content = _stub_content(prompt)
+            if request.get("stream"):
+                self._send_stream(content)
+                return
+            # Prefill: longer prompts take longer before the first token
+            time.sleep(self.latency + self.prefill_seconds_per_1k * len(prompt) / 4 / 1000)
+            self._send_json(200, _completion_payload(content, prompt))
+        finally:
+            with self.lock:
+                self.stats["active"] -= 1
+
+    def _send_stream(self, content: str):
+        """SSE chat.completion.chunk stream; first token after ~25% of the latency."""
+        tokens = re.findall(r"\S+\s*", content) or [content]
+        first_token_delay = self.latency * 0.25
+        token_delay = (self.latency - first_token_delay) / max(1, len(tokens))
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def write_event(payload):
+            data = f"data: {payload}\n\n".encode("utf-8")
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+        time.sleep(first_token_delay)
+        for i, token in enumerate(tokens):
+            if i:
+                time.sleep(token_delay)
+            write_event(json.dumps({
+                "id": "chatcmpl-stub",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": "gpt-4o-mini",
+                "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}],
+            }))
+        write_event("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+
+def _serve(port: int, latency: float, max_concurrent: int = None, prefill_seconds_per_1k: float = 0.0):
+    handler = type("Handler", (_StubHandler,), {"latency": latency, "max_concurrent": max_concurrent,
+                                                "prefill_seconds_per_1k": prefill_seconds_per_1k})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    server.request_queue_size = 1024
+    server.serve_forever()
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class StubOpenAIServer:
+    """OpenAI-compatible /v1/chat/completions server running in its own process."""
+
+    def __init__(self, latency: float = 0.3, port: int = None, max_concurrent: int = None,
+                 prefill_seconds_per_1k: float = 0.0):
+        self.latency = latency
+        self.prefill_seconds_per_1k = prefill_seconds_per_1k
+        self.port = port or _free_port()
+        self.max_concurrent = max_concurrent
+        self.process = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/v1"
+
+    def start(self):
+        self.process = multiprocessing.Process(target=_serve, args=(self.port, self.latency, self.max_concurrent,
+                                                                     self.prefill_seconds_per_1k),
+                                               daemon=True)
+        self.process.start()
+        deadline = time.time() + 10
+        while time.time() < deadline:
+            try:
+                with socket.create_connection(("127.0.0.1", self.port), timeout=0.2):
+                    return self
+            except OSError:
+                time.sleep(0.05)
+        raise RuntimeError("stub OpenAI server did not start")
+
+    def stats(self) -> dict:
+        """Completion calls received so far (and how many were answered with 429)."""
+        with urllib.request.urlopen(f"{self.base_url}/stats", timeout=5) as response:
+            return json.loads(response.read())
+
+    def stop(self):
+        if self.process is not None:
+            self.process.terminate()
+            self.process.join()
+            self.process = None
+
+
+# ---------------------------------------------------------------------------
+# Fake encoder / vector index
+# ---------------------------------------------------------------------------
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def hash_embed(text: str) -> np.ndarray:
+    """Deterministic bag-of-words embedding: similar wording -> similar vectors."""
+    vec = np.zeros(DIM, dtype=np.float32)
+    for token in _TOKEN_RE.findall(text.lower()):
+        h = int(hashlib.md5(token.encode()).hexdigest(), 16)
+        vec[h % DIM] += 1.0 if (h >> 16) & 1 else -1.0
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm else vec
+
+
+class FakeSentenceTransformer:
+    encode_seconds = 0.008
+    # CPU-bound variant (busy loop holding the GIL), for process-scaling benchmarks
+    encode_cpu_seconds = 0.0
+    # Stand-in for reading the weights (~1-3s for MiniLM on a cold container)
+    load_seconds = 0.0
+
+    def __init__(self, *args, **kwargs):
+        time.sleep(self.load_seconds)
+
+    def encode(self, sentences, batch_size=32, **kwargs):
+        single = isinstance(sentences, str)
+        batch = [sentences] if single else list(sentences)
+        # Model compute; torch releases the GIL, so sleep is a fair stand-in.
+        time.sleep(self.encode_seconds * max(1, len(batch) / batch_size))
+        if self.encode_cpu_seconds:
+            deadline = time.process_time() + self.encode_cpu_seconds * len(batch)
+            while time.process_time() < deadline:
+                pass
+        vectors = np.stack([hash_embed(s) for s in batch]) if batch else np.zeros((0, DIM), dtype=np.float32)
+        return vectors[0] if single else vectors
+
+
+class FakeCrossEncoder:
+    """Relevance logit from the share of query words found in the page; returns logits like activation=Identity."""
+    predict_seconds = 0.02
+    calls = 0
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def predict(self, sentences, batch_size=32, show_progress_bar=None, activation_fn=None, **kwargs):
+        FakeCrossEncoder.calls += 1
+        pairs = list(sentences)
+        # Per forward pass over a batch of (query, page) pairs
+        time.sleep(self.predict_seconds * max(1, -(-len(pairs) // batch_size)))
+        scores = []
+        for query, text in pairs:
+            query_words = set(_TOKEN_RE.findall(query.lower()))
+            overlap = len(query_words & set(_TOKEN_RE.findall(text.lower()))) / max(1, len(query_words))
+            scores.append(8.0 * overlap - 4.0)
+        return np.array(scores, dtype=np.float32)
+
+
+def seed_documents(urls_path: str = None, limit: int = None):
+    """Documents shaped like the Drupal loader output, one per data/urls.txt line."""
+    from app.url_mapper import url_mapper
+
+    urls_path = urls_path or os.path.join(REPO_ROOT, "data", "urls.txt")
+    with open(urls_path) as f:
+        urls = [line.strip() for line in f if line.strip()]
+    if limit:
+        urls = urls[:limit]
+    docs = []
+    for url in urls:
+        slug = url.split("/api/")[-1].split("?")[0]
+        words = re.sub(r"[^a-z0-9]+", " ", slug.lower()).strip()
+        text = f"{words}. Information from Pune Municipal Corporation about {words}."
+        docs.append({
+            "id": hashlib.md5(url.encode()).hexdigest(),
+            "text": text,
+            "metadata": {
+                "source": url,
+                "links": url_mapper.resolve_links([url]),
+                "text": text,
+            },
+        })
+    return docs
+
+
+class FakeIndex:
+    """Pinecone-like index answering cosine top-k from an in-memory matrix."""
+
+    latency = 0.05
+    queries = 0
+
+    def __init__(self, docs=None):
+        self.ids = []
+        self.metadata = []
+        self.matrix = np.zeros((0, DIM), dtype=np.float32)
+        if docs:
+            self.upsert([(d["id"], hash_embed(d["text"]), d["metadata"]) for d in docs])
+
+    def upsert(self, vectors, **kwargs):
+        # Overwrites by id like Pinecone (and LocalStore): duplicate URLs must not duplicate matches
+        positions = {vid: i for i, vid in enumerate(self.ids)}
+        existing = len(self.ids)
+        rows, count = [], 0
+        for vid, values, meta in vectors:
+            row = np.asarray(values, dtype=np.float32)
+            count += 1
+            if vid in positions:
+                pos = positions[vid]
+                if pos < existing:
+                    self.matrix[pos] = row
+                else:
+                    rows[pos - existing] = row
+                self.metadata[pos] = meta
+            else:
+                positions[vid] = len(self.ids)
+                self.ids.append(vid)
+                self.metadata.append(meta)
+                rows.append(row)
+        if rows:
+            self.matrix = np.vstack([self.matrix, np.stack(rows)])
+        return {"upserted_count": count}
+
+    def delete(self, ids=None, **kwargs):
+        drop = set(ids or [])
+        keep = [i for i, vid in enumerate(self.ids) if vid not in drop]
+        self.ids = [self.ids[i] for i in keep]
+        self.metadata = [self.metadata[i] for i in keep]
+        self.matrix = self.matrix[keep]
+
+    def query(self, vector, top_k=5, include_metadata=True, **kwargs):
+        FakeIndex.queries += 1
+        time.sleep(self.latency)
+        matches = []
+        if self.ids:
+            scores = self.matrix @ np.asarray(vector, dtype=np.float32)
+            matches = [
+                {"id": self.ids[i], "score": float(scores[i]), "metadata": self.metadata[i] if include_metadata else {}}
+                for i in np.argsort(-scores)[:top_k]
+            ]
+        if QueryResponse is None:
+            return {"matches": matches}
+        return QueryResponse(matches=[ScoredVector(**m) for m in matches], namespace="")
+
+
+class _IndexList(list):
+    def names(self):
+        return list(self)
+
+
+def _fake_pinecone_module(index: FakeIndex) -> types.ModuleType:
+    module = types.ModuleType("pinecone")
+    indexes = _IndexList()
+
+    class Pinecone:
+        def __init__(self, api_key=None, **kwargs):
+            pass
+
+        def list_indexes(self):
+            return indexes
+
+        def create_index(self, name, **kwargs):
+            indexes.append(name)
+
+        def delete_index(self, name):
+            if name in indexes:
+                indexes.remove(name)
+
+        def Index(self, name):
+            return index
+
+    class ServerlessSpec:
+        def __init__(self, **kwargs):
+            self.kwargs = kwargs
+
+    module.Pinecone = Pinecone
+    module.ServerlessSpec = ServerlessSpec
+    return module
+
+
+def install(openai_latency: float = 0.3, vector_latency: float = 0.05, encode_seconds: float = 0.008,
+            seed_limit: int = None, openai_max_concurrent: int = None,
+            openai_prefill_seconds_per_1k: float = 0.0) -> StubOpenAIServer:
+    """
+    Start the stub OpenAI server and register the fake pinecone /
+    sentence_transformers modules. Returns the running server (call .stop()).
+    """
+    if any(name == "app" or name.startswith("app.") for name in sys.modules):
+        raise RuntimeError("benchmarks.stubs.install() must run before importing app modules")
+
+    server = StubOpenAIServer(latency=openai_latency, max_concurrent=openai_max_concurrent,
+                              prefill_seconds_per_1k=openai_prefill_seconds_per_1k).start()
+    os.environ["OPENAI_BASE_URL"] = server.base_url
+    install_modules(vector_latency, encode_seconds, seed_limit=seed_limit)
+    return server
+
+
+def install_modules(vector_latency: float = 0.05, encode_seconds: float = 0.008, encode_cpu_seconds: float = 0.0,
+                    seed_limit: int = None, model_load_seconds: float = 0.0) -> None:
+    """
+    Only the fake pinecone / sentence_transformers modules, for processes
+    (e.g. server workers) pointed at a stub server started elsewhere via
+    OPENAI_BASE_URL.
+    """
+    os.environ["OPENAI_API_KEY"] = "stub-key"
+    os.environ["PINECONE_API_KEY"] = "stub-key"
+    os.environ.setdefault("PINECONE_INDEX_NAME", "pmc-stub")
+
+    FakeSentenceTransformer.encode_seconds = encode_seconds
+    FakeSentenceTransformer.encode_cpu_seconds = encode_cpu_seconds
+    FakeSentenceTransformer.load_seconds = model_load_seconds
+    st_module = types.ModuleType("sentence_transformers")
+    st_module.SentenceTransformer = FakeSentenceTransformer
+    st_module.CrossEncoder = FakeCrossEncoder
+    sys.modules["sentence_transformers"] = st_module
+
+    FakeIndex.latency = vector_latency
+    sys.modules["pinecone"] = _fake_pinecone_module(FakeIndex(seed_documents(limit=seed_limit)))
@@ -0,0 +1,370 @@
+"""
+End-to-end benchmark suite, fully offline: the real FastAPI app under uvicorn
+against the local OpenAI / Pinecone / model stubs (benchmarks/stubs.py), and
+the ingestion pipeline against a local Drupal stand-in (bench_crawler).
+
+Scenarios (all by default):
+- latency: the query corpus (benchmarks/data/chat_corpus.tsv, English and
+           Romanized Marathi, multi-turn) replayed one request at a time;
+           per-stage p50/p95 from the pipeline's own StageTimings
+- load:    the corpus replayed by concurrent clients over HTTP /chat, each
+           client playing whole sessions in order
+- ingest:  run_pipeline into a temporary local index, cold then unchanged
+- memory:  RSS of the server process sampled under sustained load
+- startup: import time of app.main and a fresh server's time to /livez and
+           /readyz (benchmarks/bench_startup.py)
+
+Results are one JSON document tagged with the git commit, so two runs can be
+compared:
+
+    python -m benchmarks.suite run --json before.json
+    python -m benchmarks.suite run --scenarios latency,load --json after.json
+    python -m benchmarks.suite compare before.json after.json --threshold 10
+
+`compare` exits with status 1 when a metric regressed by more than the
+threshold (percent).
+"""
+import argparse
+import asyncio
+import csv
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from benchmarks import stubs
+from benchmarks.bench_async_chat import percentile
+
+CORPUS_PATH = os.path.join(stubs.REPO_ROOT, "benchmarks", "data", "chat_corpus.tsv")
+SCENARIOS = ("latency", "load", "ingest", "memory", "startup")
+
+
+def load_corpus(path: str = CORPUS_PATH):
+    """[(session, language, query)] in file order."""
+    with open(path, newline="") as f:
+        rows = csv.reader((line for line in f if line.strip() and not line.startswith("#")), delimiter="\t")
+        return [(session, language, query) for session, language, query in rows]
+
+
+def sessions(corpus):
+    """{session: [query, ...]} keeping the turn order."""
+    grouped = OrderedDict()
+    for session, _, query in corpus:
+        grouped.setdefault(session, []).append(query)
+    return grouped
+
+
+def git_revision() -> dict:
+    def git(*args):
+        return subprocess.run(["git", *args], cwd=stubs.REPO_ROOT, capture_output=True, text=True).stdout.strip()
+
+    try:
+        return {"commit": git("rev-parse", "--short", "HEAD"), "dirty": bool(git("status", "--porcelain"))}
+    except OSError:
+        return {"commit": None, "dirty": None}
+
+
+def ms(values, pct):
+    return round(percentile(values, pct) * 1000, 1)
+
+
+# ---------------------------------------------------------------------------
+# Scenarios against the running server
+# ---------------------------------------------------------------------------
+
+def capture_stages():
+    """Collect every request's StageTimings (rag calls observe_timings once per request)."""
+    from app import rag
+
+    rows = []
+    observe = rag.observe_timings
+
+    def capture(stages, total):
+        rows.append(dict(stages, total=total))
+        observe(stages, total)
+
+    rag.observe_timings = capture
+    return rows
+
+
+async def chat(client, query, session_id):
+    start = time.perf_counter()
+    response = await client.post("/chat", json={"query": query, "session_id": session_id})
+    response.raise_for_status()
+    return time.perf_counter() - start
+
+
+async def scenario_latency(client, corpus, stage_rows, run_id):
+    del stage_rows[:]
+    latencies = [await chat(client, query, f"{run_id}-latency-{session}") for session, _, query in corpus]
+    result = {"requests": len(latencies), "p50_ms": ms(latencies, 50), "p95_ms": ms(latencies, 95)}
+    stages = sorted({stage for row in stage_rows for stage in row if stage != "total"})
+    for stage in stages:
+        values = [row[stage] for row in stage_rows if stage in row]
+        result[f"{stage}_p50_ms"] = ms(values, 50)
+        result[f"{stage}_p95_ms"] = ms(values, 95)
+    return result
+
+
+async def replay(client, corpus, concurrency, rounds, prefix, stop_at=None):
+    """Replay whole sessions with `concurrency` clients; returns (latencies, errors, wall seconds)."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+
+    async def play(session_id, queries):
+        nonlocal errors
+        async with semaphore:
+            for query in queries:
+                if stop_at is not None and time.perf_counter() >= stop_at:
+                    return
+                try:
+                    latencies.append(await chat(client, query, session_id))
+                except Exception as e:
+                    errors += 1
+                    print(f"⚠️ {session_id} request failed: {e}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(play(f"{prefix}-{session}-{r}", queries)
+                           for r in range(rounds) for session, queries in sessions(corpus).items()))
+    return latencies, errors, time.perf_counter() - start
+
+
+async def scenario_load(client, corpus, args, run_id):
+    latencies, errors, wall = await replay(client, corpus, args.concurrency, args.rounds, f"{run_id}-load")
+    return {"requests": len(latencies), "errors": errors, "concurrency": args.concurrency,
+            "p50_ms": ms(latencies, 50), "p95_ms": ms(latencies, 95), "p99_ms": ms(latencies, 99),
+            "rps": round(len(latencies) / wall, 1) if wall else 0.0}
+
+
+async def scenario_memory(client, corpus, args, run_id):
+    from benchmarks.soak_sessions import rss_mb
+
+    start = time.perf_counter()
+    samples = [{"elapsed_s": 0.0, "requests": 0, "rss_mb": rss_mb()}]
+    done = []
+
+    async def sample():
+        while True:
+            await asyncio.sleep(args.sample_interval)
+            samples.append({"elapsed_s": round(time.perf_counter() - start, 1), "requests": len(done),
+                            "rss_mb": rss_mb()})
+
+    sampler = asyncio.ensure_future(sample())
+    stop_at = start + args.memory_seconds
+    # New session ids every round, so history and session-store growth show up
+    rounds = 0
+    while time.perf_counter() < stop_at:
+        latencies, _, _ = await replay(client, corpus, args.concurrency, 1, f"{run_id}-memory-{rounds}", stop_at)
+        done.extend(latencies)
+        rounds += 1
+    sampler.cancel()
+    samples.append({"elapsed_s": round(time.perf_counter() - start, 1), "requests": len(done), "rss_mb": rss_mb()})
+    rss = [s["rss_mb"] for s in samples]
+    return {"requests": len(done), "rss_start_mb": rss[0], "rss_end_mb": rss[-1], "rss_peak_mb": max(rss),
+            "rss_growth_mb": round(rss[-1] - rss[0], 1), "samples": samples}
+
+
+async def run_server_scenarios(names, corpus, args):
+    import httpx
+
+    from benchmarks.bench_streaming_ttfb import start_server
+
+    stage_rows = capture_stages()
+    server, thread = start_server(args.port)
+    results = {}
+    run_id = f"suite-{os.getpid()}"
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", timeout=120) as client:
+            await chat(client, "warm up", f"{run_id}-warmup")
+            for name in names:
+                print(f"▶️  {name}")
+                if name == "latency":
+                    results[name] = await scenario_latency(client, corpus, stage_rows, run_id)
+                elif name == "load":
+                    results[name] = await scenario_load(client, corpus, args, run_id)
+                elif name == "memory":
+                    results[name] = await scenario_memory(client, corpus, args, run_id)
+    finally:
+        server.should_exit = True
+        thread.join()
+    return results
+
+
+# ---------------------------------------------------------------------------
+# Ingestion
+# ---------------------------------------------------------------------------
+
+def scenario_ingest(args):
+    from app import ingest
+    from app.fetcher import ConcurrentFetcher, ResponseCache
+    from app.vector_store import LocalStore
+    from benchmarks.bench_crawler import _serve, local_urls
+
+    port = stubs._free_port()
+    drupal = multiprocessing.Process(target=_serve, args=(port, args.drupal_latency), daemon=True)
+    drupal.start()
+    time.sleep(0.5)
+    workdir = tempfile.mkdtemp(prefix="pmcbot-ingest-")
+    store = LocalStore(path=os.path.join(workdir, "index"))
+    cache = ResponseCache(os.path.join(workdir, "http_cache"))
+    urls = local_urls(port, args.pages)
+    # The menu comes from the stand-in too (no menu items, but no DNS failure and retries either)
+    ingest.PMC_MENU_API = f"http://127.0.0.1:{port}/api/menu-data/pmc-services-citizen?lang=en"
+    result = {"pages": len(urls)}
+    try:
+        for run in ("cold", "unchanged"):
+            start = time.perf_counter()
+            report, _ = ingest.run_pipeline(store, os.path.join(workdir, "manifest.json"), urls=urls,
+                                            fetcher=ConcurrentFetcher(cache=cache, per_host_rate=0),
+                                            lexical_path=os.path.join(workdir, "lexical_index.json"))
+            seconds = time.perf_counter() - start
+            result[f"{run}_s"] = round(seconds, 2)
+            result[f"{run}_pages_per_s"] = round(len(urls) / seconds, 1)
+            for stage, stage_seconds, items in report.stages:
+                result[f"{run}_{stage}_s"] = round(stage_seconds, 3)
+                if run == "cold" and stage == "upsert":
+                    result["vectors"] = items
+    finally:
+        drupal.terminate()
+    return result
+
+
+def scenario_startup(args):
+    from benchmarks.bench_startup import import_profile, server_start
+
+    profile = import_profile()
+    server = server_start(args.model_load_seconds)
+    return {"import_ms": profile["total_ms"], "modules_imported": profile["modules_imported"],
+            "heavy_modules_loaded": profile["heavy_modules_loaded"], "livez_s": server["livez_s"],
+            "readyz_s": server["readyz_s"]}
+
+
+# ---------------------------------------------------------------------------
+# Output
+# ---------------------------------------------------------------------------
+
+def print_results(results):
+    for name, metrics in results["scenarios"].items():
+        print(f"\n{name}")
+        for key, value in metrics.items():
+            if not isinstance(value, (list, dict)):
+                print(f"  {key:<28}{value}")
+
+
+def direction(metric: str) -> int:
+    """+1 higher is better, -1 lower is better, 0 informational."""
+    if metric.endswith(("rps", "per_s")):
+        return 1
+    if metric.endswith(("_ms", "_s", "_mb")) and not metric.startswith("rss_start"):
+        return -1
+    return 0
+
+
+# Smaller absolute changes are noise, whatever the percentage
+NOISE_FLOOR = {"_ms": 1.0, "_s": 0.05, "_mb": 5.0}
+
+
+def compare(before_path, after_path, threshold):
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+
+    print(f"{before.get('commit')} -> {after.get('commit')}   (regression threshold {threshold}%)")
+    print(f"{'metric':<40}{'before':>12}{'after':>12}{'change':>10}")
+    regressions = []
+    for scenario, metrics in after["scenarios"].items():
+        old_metrics = before["scenarios"].get(scenario, {})
+        for metric, value in metrics.items():
+            old = old_metrics.get(metric)
+            if not isinstance(value, (int, float)) or not isinstance(old, (int, float)) or isinstance(value, bool):
+                continue
+            change = (value - old) / old * 100 if old else 0.0
+            sign = direction(metric)
+            flag = ""
+            floor = next((v for suffix, v in NOISE_FLOOR.items() if metric.endswith(suffix)), 0)
+            if sign and -sign * change > threshold and abs(value - old) >= floor:
+                flag = "  ❌"
+                regressions.append(f"{scenario}.{metric}")
+            print(f"{scenario + '.' + metric:<40}{old:>12}{value:>12}{change:>+9.1f}%{flag}")
+    if regressions:
+        print(f"\n❌ {len(regressions)} regression(s): {', '.join(regressions)}")
+    return 1 if regressions else 0
+
+
+def run(args):
+    names = [name for name in args.scenarios.split(",") if name]
+    unknown = set(names) - set(SCENARIOS)
+    if unknown:
+        raise SystemExit(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    corpus = load_corpus(args.corpus)
+
+    server = stubs.install(args.openai_latency, args.vector_latency, args.encode_ms / 1000)
+    results = {"benchmark": "suite", **git_revision(), "timestamp": datetime.now(timezone.utc).isoformat(),
+               "python": platform.python_version(), "platform": platform.platform(), "params": vars(args),
+               "scenarios": {}}
+    try:
+        import app.main  # noqa: F401  (imports run against the stubs)
+
+        # Keep the benchmark's request logs and indexes out of the working tree
+        os.chdir(tempfile.mkdtemp(prefix="pmcbot-bench-"))
+        server_names = [name for name in names if name not in ("ingest", "startup")]
+        if server_names:
+            results["scenarios"].update(asyncio.run(run_server_scenarios(server_names, corpus, args)))
+        if "ingest" in names:
+            print("▶️  ingest")
+            results["scenarios"]["ingest"] = scenario_ingest(args)
+        if "startup" in names:
+            print("▶️  startup")
+            results["scenarios"]["startup"] = scenario_startup(args)
+    finally:
+        server.stop()
+
+    # Scenario order as requested
+    results["scenarios"] = {name: results["scenarios"][name] for name in names}
+    print_results(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run scenarios and write one JSON result")
+    run_parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    run_parser.add_argument("--corpus", default=CORPUS_PATH)
+    run_parser.add_argument("--concurrency", type=int, default=16, help="concurrent clients (load, memory)")
+    run_parser.add_argument("--rounds", type=int, default=5, help="corpus replays in the load scenario")
+    run_parser.add_argument("--memory-seconds", type=float, default=30)
+    run_parser.add_argument("--sample-interval", type=float, default=1.0, help="RSS sampling interval (s)")
+    run_parser.add_argument("--pages", type=int, default=443, help="pages in the ingest scenario")
+    run_parser.add_argument("--drupal-latency", type=float, default=0.05, help="Drupal stand-in latency (s)")
+    run_parser.add_argument("--model-load-seconds", type=float, default=2.0,
+                            help="simulated model load in the startup scenario")
+    run_parser.add_argument("--openai-latency", type=float, default=0.3, help="stub completion latency (s)")
+    run_parser.add_argument("--vector-latency", type=float, default=0.05, help="stub vector query latency (s)")
+    run_parser.add_argument("--encode-ms", type=float, default=8.0, help="stub embedding time per call (ms)")
+    run_parser.add_argument("--port", type=int, default=stubs._free_port())
+    run_parser.add_argument("--json", help="write results to this file")
+
+    compare_parser = commands.add_parser("compare", help="compare two result files")
+    compare_parser.add_argument("before")
+    compare_parser.add_argument("after")
+    compare_parser.add_argument("--threshold", type=float, default=10.0, help="percent change flagged")
+
+    args = parser.parse_args()
+    if args.command == "compare":
+        sys.exit(compare(args.before, args.after, args.threshold))
+    run(args)
+
+
+if __name__ == "__main__":
+    main()
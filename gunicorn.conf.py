@@ -0,0 +1,61 @@
+"""
+Multi-worker production profile: gunicorn managing uvicorn workers.
+
+    gunicorn -c gunicorn.conf.py app.main:app
+
+The app is imported once in the master (preload_app) and the embedding
+model / lexical index are loaded there before forking, so workers share
+those pages instead of each loading its own copy. With more than one worker
+the session history and answer cache default to the shared SQLite backends,
+so a conversation can continue on any worker.
+"""
+import gc
+import glob
+import multiprocessing
+import os
+import tempfile
+
+bind = os.getenv("BIND", "0.0.0.0:5002")
+workers = int(os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count())))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = os.getenv("PRELOAD_APP", "1") != "0"
+timeout = int(os.getenv("WORKER_TIMEOUT", "120"))
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("KEEPALIVE", "5"))
+accesslog = os.getenv("ACCESS_LOG") or None
+
+if workers > 1:
+    # Per-process history / answer cache would split conversations across workers
+    os.environ.setdefault("SESSION_BACKEND", "sqlite")
+    os.environ.setdefault("ANSWER_CACHE_BACKEND", "sqlite")
+    # Workers share their metrics through files so /metrics covers all of them
+    os.environ.setdefault("METRICS_DIR", os.path.join(tempfile.gettempdir(), "pmcbot-metrics"))
+# Tokenizer threads started in the master do not survive fork
+os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+
+def on_starting(server):
+    # Samples of a previous run would otherwise be summed into this one
+    directory = os.getenv("METRICS_DIR")
+    if directory:
+        for path in glob.glob(os.path.join(directory, "*.json")):
+            os.remove(path)
+
+
+def when_ready(server):
+    if not preload_app:
+        return
+    from app.main import preload
+
+    preload()
+    # Keep the preloaded objects out of the GC's reach so collections in the
+    # workers don't touch (and copy) the shared pages
+    gc.freeze()
+    server.log.info("Preloaded model and indexes; forking %s workers", workers)
+
+
+def post_fork(server, worker):
+    if preload_app:
+        from app.main import after_fork
+
+        after_fork()
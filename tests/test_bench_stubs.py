@@ -0,0 +1,24 @@
+import numpy as np
+
+from benchmarks.stubs import DIM, FakeIndex, seed_documents
+
+
+def _vector(i):
+    return np.eye(DIM, dtype=np.float32)[i]
+
+
+def test_upsert_overwrites_by_id():
+    index = FakeIndex()
+    index.upsert([("a", _vector(0), {"v": 1}), ("b", _vector(1), {"v": 1}), ("a", _vector(2), {"v": 2})])
+    index.upsert([("b", _vector(3), {"v": 2})])
+    assert index.ids == ["a", "b"]
+    matches = index.query(_vector(3), top_k=5)["matches"]
+    assert [(m["id"], m["score"], m["metadata"]) for m in matches] == [("b", 1.0, {"v": 2}), ("a", 0.0, {"v": 2})]
+
+
+def test_seed_duplicate_urls_index_once(tmp_path):
+    urls = tmp_path / "urls.txt"
+    urls.write_text("https://webadmin.pmc.gov.in/api/basic-page/csr?lang=en\n" * 2)
+    docs = seed_documents(str(urls))
+    assert len(docs) == 2
+    assert FakeIndex(docs).ids == [docs[0]["id"]]
@@ -0,0 +1,51 @@
+import pytest
+
+from app import chunking
+from app.chunking import chunk_text, word_pieces
+
+ENGLISH = " ".join(["Property tax can be paid online through the PMC portal or at any ward office."] * 60)
+MARATHI = " ".join(["मालमत्ता कर भरण्यासाठी ऑनलाइन सुविधा उपलब्ध आहे. क्षेत्रीय कार्यालयातही कर भरता येतो."] * 60)
+
+
+@pytest.fixture
+def tokenizer(monkeypatch):
+    def use(value):
+        monkeypatch.setattr(chunking, "_tokenizer", value)
+        monkeypatch.setattr(chunking, "_tokenizer_loaded", True)
+        word_pieces.cache_clear()
+
+    yield use
+    word_pieces.cache_clear()
+
+
+class _CharTokenizer:
+    """One piece per character, like WordPiece on a script missing from the vocabulary."""
+
+    def tokenize(self, text):
+        return [c for c in text if not c.isspace()]
+
+
+def test_chunks_measured_with_model_tokenizer(tokenizer):
+    tokenizer(_CharTokenizer())
+    for text in (ENGLISH, MARATHI):
+        chunks = chunk_text(text, max_tokens=200, overlap=40)
+        assert len(chunks) > 1
+        assert all(len(_CharTokenizer().tokenize(chunk)) <= 200 for chunk in chunks)
+
+
+def test_approximation_counts_devanagari_per_character(tokenizer):
+    tokenizer(None)
+    assert word_pieces("मालमत्ता") >= len("मालमत्ता")
+    assert word_pieces("tax") == 1
+
+
+def test_chunks_fit_the_embedding_model(tokenizer):
+    st = pytest.importorskip("sentence_transformers")
+    try:
+        model = st.SentenceTransformer("all-MiniLM-L6-v2")
+    except Exception as e:
+        pytest.skip(f"model unavailable: {e}")
+    tokenizer(model.tokenizer)
+    for text in (ENGLISH, MARATHI):
+        for chunk in chunk_text(text):
+            assert len(model.tokenizer(chunk)["input_ids"]) <= model.max_seq_length
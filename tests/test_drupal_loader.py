@@ -0,0 +1,53 @@
+import glob
+import json
+import os
+
+import pytest
+from bs4 import BeautifulSoup
+
+from app.drupal_loader import clean_html, extract_pages, extract_text_and_links
+from benchmarks.bench_extract import reference_extract
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "drupal")
+PAGES = sorted(p for p in glob.glob(os.path.join(FIXTURES, "*.json")) if not p.endswith(".expected.json"))
+
+
+def _load(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _expected(path):
+    expected = _load(path.replace(".json", ".expected.json"))
+    return expected["text"], expected["links"]
+
+
+@pytest.mark.parametrize("path", PAGES, ids=os.path.basename)
+def test_extract_matches_golden(path):
+    assert extract_text_and_links(_load(path)) == _expected(path)
+
+
+@pytest.mark.parametrize("path", PAGES, ids=os.path.basename)
+def test_previous_extractor_matches_golden(path):
+    # The goldens were written by the recursive + BeautifulSoup implementation
+    assert reference_extract(_load(path)) == _expected(path)
+
+
+def test_extract_pages_in_order():
+    pages = {os.path.basename(p): _load(p) for p in PAGES}
+    extracted, failures = extract_pages(pages, workers=1)
+    assert not failures
+    assert list(extracted) == list(pages)
+    assert [extracted[name] for name in pages] == [_expected(p) for p in PAGES]
+
+
+@pytest.mark.parametrize("html", [
+    "<p>Fees &amp; charges&nbsp;&ndash; 5&#37;</p>",
+    "<p>citizen&#8217;s charter &#150; &#x27;A&#x27;</p>",
+    "<p>a<!-- note -->b</p><script>var x = '<b>';</script>",
+    "<p>See https://pmc.gov.in/page?id=4&section=tax&param=1</p>",
+    "<p>&copy2024 &copy; &notit; &ampx; &foo; &nbsp</p>",
+    "<p>&#0; &#1; &#xD800; &#99999999; &#12a; &#xFFFE; &#128;</p>",
+])
+def test_clean_html(html):
+    assert clean_html(html) == BeautifulSoup(html, "html.parser").get_text(separator=" ", strip=True)
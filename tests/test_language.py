@@ -0,0 +1,19 @@
+import pytest
+
+from app.language import detect_language, rule_based_language
+
+
+@pytest.mark.parametrize("query", ["hi", "thanks", "Sarasbaug", "Swachh Bharat", "Bhavani Peth", "Yerawada",
+                                   "Warje Karvenagar", "how to pay property tax",
+                                   # Short Marathi words that are also English or Pune names
+                                   "Ani Karu road water supply", "Karu Nagar ward office", "Ka Ka Kalelkar road",
+                                   "KA Hospital dya", "maza account"])
+def test_rule_verdict_english_is_final(query):
+    assert rule_based_language(query) == "english"
+    assert detect_language(query) == "english"
+
+
+@pytest.mark.parametrize("query", ["Property tax kasa bharaycha?", "mala janm dakhla pahije",
+                                   "जन्म दाखला कुठे मिळेल"])
+def test_marathi(query):
+    assert detect_language(query) == "marathi"
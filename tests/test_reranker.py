@@ -0,0 +1,61 @@
+import pytest
+
+pinecone = pytest.importorskip("pinecone")
+
+from app.chunking import merge_adjacent_chunks
+from app.reranker import Reranker
+from app.retrieval import fuse
+from app.vector_store import PineconeStore
+
+
+class _Index:
+    def __init__(self, matches):
+        self.matches = matches
+
+    def query(self, vector, top_k=5, include_metadata=True, **kwargs):
+        return pinecone.QueryResponse(matches=self.matches[:top_k], namespace="")
+
+
+class _Model:
+    """Logit +4 for pages mentioning the query's first word, -4 otherwise."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def predict(self, pairs, batch_size=32, show_progress_bar=None, **kwargs):
+        self.calls += 1
+        return [4.0 if query.split()[0] in text else -4.0 for query, text in pairs]
+
+
+def _reranker(**kwargs):
+    reranker = Reranker(enabled=True, **kwargs)
+    reranker.provider._value = _Model()
+    return reranker
+
+
+def _pinecone_pages(texts):
+    store = PineconeStore(api_key="test", index_name="test")
+    store._index = _Index([pinecone.ScoredVector(id=f"p{i}-0", score=1.0 - i / 10,
+                                                 metadata={"parent_id": f"p{i}", "chunk": 0, "text": text})
+                           for i, text in enumerate(texts)])
+    return merge_adjacent_chunks(fuse(store.query([0.0], top_k=10), [], top_k=10))
+
+
+def test_rerank_pinecone_matches():
+    pages = _pinecone_pages(["garbage", "water supply", "tax", "water tanker"])
+    kept = _reranker(max_docs=3, min_score=0.5).rerank("water complaint", pages)
+    assert [m["id"] for m in kept] == ["p1", "p3"]
+    assert all(m["rerank_score"] > 0.9 for m in kept)
+
+
+def test_rerank_keeps_min_docs():
+    pages = _pinecone_pages(["garbage", "tax"])
+    kept = _reranker(min_docs=1, min_score=0.5).rerank("water complaint", pages)
+    assert [m["id"] for m in kept] == ["p0"]
+
+
+def test_rerank_many_single_predict():
+    reranker = _reranker(max_docs=1, min_score=0.5)
+    kept = reranker.rerank_many(["water", "tax"], [_pinecone_pages(["tax", "water"]), _pinecone_pages(["tax"])])
+    assert [[m["id"] for m in pages] for pages in kept] == [["p1"], ["p0"]]
+    assert reranker.provider.get().calls == 1
@@ -0,0 +1,58 @@
+import pytest
+
+pinecone = pytest.importorskip("pinecone")
+
+from app.chunking import merge_adjacent_chunks
+from app.retrieval import fuse
+from app.vector_store import PineconeStore
+
+
+class _Index:
+    """Answers like the pinecone SDK: a QueryResponse of ScoredVector objects."""
+
+    def __init__(self, matches):
+        self.matches = matches
+
+    def query(self, vector, top_k=5, include_metadata=True, **kwargs):
+        return pinecone.QueryResponse(matches=self.matches[:top_k], namespace="")
+
+
+def _store(matches):
+    store = PineconeStore(api_key="test", index_name="test")
+    store._index = _Index(matches)
+    return store
+
+
+def _chunk(page, index, score, text):
+    return pinecone.ScoredVector(id=f"{page}-{index}", score=score,
+                                 metadata={"parent_id": page, "chunk": index, "source": page, "text": text})
+
+
+def test_query_returns_plain_dicts():
+    matches = _store([_chunk("a", 0, 0.9, "one two")]).query([0.0], top_k=5)
+    assert matches == [{"id": "a-0", "score": 0.9,
+                        "metadata": {"parent_id": "a", "chunk": 0, "source": "a", "text": "one two"}}]
+
+
+def test_query_without_metadata():
+    matches = _store([pinecone.ScoredVector(id="a", score=0.5)]).query([0.0])
+    assert matches == [{"id": "a", "score": 0.5, "metadata": {}}]
+
+
+def test_merge_dense_only_sdk_matches():
+    # No BM25 hits: fuse passes the dense matches through unchanged
+    dense = _store([_chunk("a", 0, 0.9, "one two three"), _chunk("b", 0, 0.8, "other page"),
+                    _chunk("a", 1, 0.7, "three four")]).query([0.0], top_k=5)
+    pages = merge_adjacent_chunks(fuse(dense, [], top_k=5))
+    assert [p["id"] for p in pages] == ["a", "b"]
+    assert pages[0]["score"] == 0.9
+    assert pages[0]["metadata"]["text"] == "one two three four"
+    assert pages[0]["metadata"]["chunk_ids"] == ["a-0", "a-1"]
+
+
+def test_merge_fused_sdk_matches():
+    dense = _store([_chunk("a", 0, 0.9, "one two"), _chunk("b", 0, 0.8, "other page")]).query([0.0])
+    lexical = [{"id": "b-0", "score": 3.2, "metadata": {"parent_id": "b", "chunk": 0, "text": "other page"}}]
+    pages = merge_adjacent_chunks(fuse(dense, lexical, top_k=5))
+    assert [p["id"] for p in pages] == ["b", "a"]
+    assert pages[0]["dense_score"] == 0.8 and pages[0]["lexical_score"] == 3.2
@@ -0,0 +1,50 @@
+import pytest
+
+from app.session_memory import MemorySessionStore
+
+
+def _fill(store, session_id, count, start=0):
+    for i in range(start, start + count):
+        store.add(session_id, "user" if i % 2 == 0 else "assistant", f"m{i}")
+
+
+def _sqlite_store(tmp_path):
+    pytest.importorskip("sqlalchemy")
+    from app.session_memory import SQLiteSessionStore
+
+    return SQLiteSessionStore(url=f"sqlite:///{tmp_path / 'sessions.db'}", max_turns=4)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    return MemorySessionStore(max_turns=4) if request.param == "memory" else _sqlite_store(tmp_path)
+
+
+def test_ids_increase(store):
+    _fill(store, "s", 10)
+    ids = [m["id"] for m in store.get("s")]
+    assert len(ids) == 8 and ids == sorted(ids)
+
+
+def test_compact_drops_summarized(store):
+    _fill(store, "s", 8)
+    older = store.get("s")[:-4]
+    store.compact("s", "summary", older[-1]["id"])
+    assert [m["content"] for m in store.get("s")] == ["m4", "m5", "m6", "m7"]
+    assert store.get_summary("s") == "summary"
+
+
+def test_compact_after_ring_buffer_drops(store):
+    # Summary of m0-m3 is in flight while two more messages push m0/m1 out of the ring buffer
+    _fill(store, "s", 8)
+    older = store.get("s")[:-4]
+    _fill(store, "s", 2, start=8)
+    store.compact("s", "summary", older[-1]["id"])
+    assert [m["content"] for m in store.get("s")] == ["m4", "m5", "m6", "m7", "m8", "m9"]
+
+
+def test_memory_compact_keeps_size():
+    store = MemorySessionStore(max_turns=4)
+    _fill(store, "s", 10)
+    store.compact("s", "summary", store.get("s")[3]["id"])
+    assert store._chars == sum(len(m["content"]) for m in store.get("s")) + len("summary")